@@ -0,0 +1,528 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from backend.db import BatchWriter, Database, Row
+from ml.metrics import REGISTRY
+from ml.predict import SolarInput
+from ml.utils import get_logger
+
+
+logger = get_logger(__name__)
+
+ALERT_EVENTS = REGISTRY.counter(
+    "solara_alert_events_total", "Alerts raised and resolved.", ("rule", "event")
+)
+
+# A batch of readings and their results, and the queues that carry them
+# to `AlertPipeline`'s thread (None stops it).
+_Batch = Tuple[List[SolarInput], List[Dict[str, Any]]]
+BatchQueue = Union[
+    "queue.Queue[Optional[_Batch]]", "multiprocessing.Queue[Optional[_Batch]]"
+]
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    """One condition on a model output, written to `alerts.sensor_type`.
+
+    `output` is the result key, with a dot for nested ones. With `above`,
+    readings breach above `threshold`, otherwise below it. An active alert
+    clears only once the value is back past the threshold by `hysteresis`,
+    so a value hovering at the threshold does not flap.
+    """
+
+    name: str
+    output: str
+    label: str
+    severity: str
+    threshold: float
+    hysteresis: float
+    above: bool
+
+    def value(self, result: Dict[str, Any]) -> float:
+        value: Any = result
+        for key in self.output.split("."):
+            value = value[key]
+        return float(value)
+
+    def breached(self, value: float, threshold: float) -> bool:
+        return value > threshold if self.above else value < threshold
+
+    def cleared(self, value: float, threshold: float) -> bool:
+        if self.above:
+            return value <= threshold - self.hysteresis
+        return value >= threshold + self.hysteresis
+
+    def message(self, source_key: str, value: float, threshold: float) -> str:
+        side = "above" if self.above else "below"
+        return f"Inverter {source_key}: {self.label} {value:.3f} {side} {threshold:.3f}"
+
+
+# The efficiency default matches the "High" risk boundary of
+# `efficiency_to_risk_label`; the IsolationForest labels anomaly scores
+# above 0.5 as outliers.
+DEFAULT_RULES = (
+    AlertRule(
+        "efficiency",
+        "efficiency_prediction",
+        "predicted efficiency",
+        "warning",
+        threshold=0.8,
+        hysteresis=0.05,
+        above=False,
+    ),
+    AlertRule(
+        "failure_risk",
+        "risk_probabilities.High",
+        "high failure risk probability",
+        "critical",
+        threshold=0.6,
+        hysteresis=0.1,
+        above=True,
+    ),
+    AlertRule(
+        "anomaly",
+        "anomaly_score",
+        "anomaly score",
+        "warning",
+        threshold=0.6,
+        hysteresis=0.05,
+        above=True,
+    ),
+)
+
+
+@dataclass
+class AlertEvent:
+    kind: str  # "raised" or "resolved"
+    alert_id: str
+    source_key: str
+    rule: AlertRule
+    value: float
+    threshold: float
+    at: datetime
+
+
+class _RuleState:
+    __slots__ = ("breaches", "clears", "alert_id")
+
+    def __init__(self) -> None:
+        self.breaches = 0
+        self.clears = 0
+        self.alert_id: Optional[str] = None
+
+
+class AlertEngine:
+    """Turn per-inverter model outputs into debounced alerts.
+
+    An alert is raised after `raise_after` consecutive readings of one
+    inverter breach a rule, and resolved after `clear_after` consecutive
+    readings are past the rule's hysteresis band; single outliers do
+    neither. Thresholds can be overridden per inverter (`overrides`:
+    SOURCE_KEY -> rule name -> threshold).
+
+    State is kept for up to `max_inverters` inverters; past that, the least
+    recently seen inverter's state is dropped, like `RollingFeatureStore`
+    does. Alerts still active in the database are put back with `restore`.
+    Not thread-safe: feed it from one thread.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[AlertRule] = DEFAULT_RULES,
+        overrides: Optional[Dict[str, Dict[str, float]]] = None,
+        raise_after: int = 3,
+        clear_after: int = 3,
+        max_inverters: int = 10_000,
+    ) -> None:
+        if raise_after < 1 or clear_after < 1:
+            raise ValueError("raise_after and clear_after must be >= 1")
+        if max_inverters < 1:
+            raise ValueError("max_inverters must be >= 1")
+        self.rules = tuple(rules)
+        self.overrides = overrides or {}
+        self.raise_after = raise_after
+        self.clear_after = clear_after
+        self.max_inverters = max_inverters
+        self._states: "OrderedDict[str, Dict[str, _RuleState]]" = OrderedDict()
+        self._active = 0
+
+    @classmethod
+    def from_env(cls) -> "AlertEngine":
+        """Build from `SOLARA_ALERT_RAISE_AFTER`, `SOLARA_ALERT_CLEAR_AFTER`,
+        `SOLARA_ALERT_MAX_INVERTERS` and the JSON file at
+        `SOLARA_ALERT_THRESHOLDS`, e.g.
+        ``{"defaults": {"efficiency": 0.75}, "inverters": {"KEY": {...}}}``."""
+        rules: Sequence[AlertRule] = DEFAULT_RULES
+        overrides: Dict[str, Dict[str, float]] = {}
+        path = os.environ.get("SOLARA_ALERT_THRESHOLDS")
+        if path:
+            config = json.loads(Path(path).read_text())
+            defaults = config.get("defaults", {})
+            rules = [
+                replace(rule, threshold=float(defaults.get(rule.name, rule.threshold)))
+                for rule in DEFAULT_RULES
+            ]
+            overrides = config.get("inverters", {})
+        return cls(
+            rules,
+            overrides,
+            raise_after=int(os.environ.get("SOLARA_ALERT_RAISE_AFTER", "3")),
+            clear_after=int(os.environ.get("SOLARA_ALERT_CLEAR_AFTER", "3")),
+            max_inverters=int(os.environ.get("SOLARA_ALERT_MAX_INVERTERS", "10000")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def threshold(self, source_key: str, rule: AlertRule) -> float:
+        return float(self.overrides.get(source_key, {}).get(rule.name, rule.threshold))
+
+    def active(self) -> int:
+        """Number of raised, unresolved alerts (safe from any thread)."""
+        return self._active
+
+    def _states_for(self, source_key: str) -> Dict[str, _RuleState]:
+        states = self._states.get(source_key)
+        if states is not None:
+            self._states.move_to_end(source_key)
+            return states
+        if len(self._states) >= self.max_inverters:
+            evicted, old = self._states.popitem(last=False)
+            active = [name for name, state in old.items() if state.alert_id]
+            self._active -= len(active)
+            if active:
+                logger.warning(
+                    "Dropping alert state of inverter %s with active alerts %s",
+                    evicted,
+                    active,
+                )
+        states = self._states[source_key] = {
+            rule.name: _RuleState() for rule in self.rules
+        }
+        return states
+
+    def restore(self, source_key: str, rule_name: str, alert_id: str) -> bool:
+        """Mark an alert raised earlier (e.g. before a restart) as active,
+        so it is resolved rather than raised again. False for unknown rules."""
+        if all(rule.name != rule_name for rule in self.rules):
+            return False
+        state = self._states_for(source_key)[rule_name]
+        if state.alert_id is None:
+            self._active += 1
+        state.alert_id = alert_id
+        return True
+
+    def observe(
+        self, source_key: str, result: Dict[str, Any], at: datetime
+    ) -> List[AlertEvent]:
+        """Update the inverter's rule states with one result."""
+        events: List[AlertEvent] = []
+        states = self._states_for(source_key)
+        for rule in self.rules:
+            state = states[rule.name]
+            value = rule.value(result)
+            threshold = self.threshold(source_key, rule)
+            if state.alert_id is None:
+                state.breaches = (
+                    state.breaches + 1 if rule.breached(value, threshold) else 0
+                )
+                if state.breaches >= self.raise_after:
+                    state.alert_id = str(uuid.uuid4())
+                    state.clears = 0
+                    self._active += 1
+                    events.append(
+                        AlertEvent(
+                            "raised",
+                            state.alert_id,
+                            source_key,
+                            rule,
+                            value,
+                            threshold,
+                            at,
+                        )
+                    )
+            else:
+                state.clears = state.clears + 1 if rule.cleared(value, threshold) else 0
+                if state.clears >= self.clear_after:
+                    events.append(
+                        AlertEvent(
+                            "resolved",
+                            state.alert_id,
+                            source_key,
+                            rule,
+                            value,
+                            threshold,
+                            at,
+                        )
+                    )
+                    state.alert_id = None
+                    state.breaches = 0
+                    self._active -= 1
+        return events
+
+
+class AlertPipeline:
+    """Evaluate served predictions for alerts and persist both in bulk.
+
+    `observe` only queues a batch of results; a background thread runs the
+    alert engine over it (readings with a `source_key` only) and hands new
+    alerts, resolutions and, with `persist_predictions`, one `predictions`
+    row per scored reading to the `BatchWriter`, which writes the database
+    from its own thread. So request handlers never spend time on alerting,
+    and the engine is fed from one thread. At most `max_queued` batches
+    wait; past that, batches are dropped and counted. `start` first
+    restores the engine's active alerts from the database.
+
+    Debouncing counts consecutive readings per inverter, so one pipeline
+    must see all of them. The app reports every result it serves,
+    including those scored by the process executor's workers;
+    `backend.serve` workers forward theirs to the supervisor's pipeline
+    (see `AlertForwarder`).
+    """
+
+    def __init__(
+        self,
+        engine: AlertEngine,
+        writer: BatchWriter,
+        user_id: str,
+        persist_predictions: bool = True,
+        max_queued: int = 10_000,
+    ) -> None:
+        self.engine = engine
+        self.writer = writer
+        self.user_id = user_id
+        self.persist_predictions = persist_predictions
+        self.records: "BatchQueue" = queue.Queue(max_queued)
+        self._thread: Optional[threading.Thread] = None
+        self._dropped = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["AlertPipeline"]:
+        """Build from `SOLARA_DATABASE_URL` (unset disables alerts) and
+        `SOLARA_ALERT_USER_ID`, the account the rows belong to;
+        `SOLARA_PERSIST_PREDICTIONS=0` writes alerts only, and
+        `SOLARA_ALERT_QUEUE_SIZE` bounds the queued batches."""
+        url = os.environ.get("SOLARA_DATABASE_URL")
+        if not url:
+            return None
+        user_id = os.environ.get("SOLARA_ALERT_USER_ID")
+        if not user_id:
+            raise ValueError("SOLARA_DATABASE_URL needs SOLARA_ALERT_USER_ID")
+        database = Database(
+            url, pool_size=int(os.environ.get("SOLARA_DB_POOL_SIZE", "2"))
+        )
+        return cls(
+            AlertEngine.from_env(),
+            BatchWriter.from_env(database),
+            user_id,
+            persist_predictions=os.environ.get("SOLARA_PERSIST_PREDICTIONS", "1")
+            != "0",
+            max_queued=_queue_size_from_env(),
+        )
+
+    def start(self, records: Optional["BatchQueue"] = None) -> None:
+        """Restore active alerts and start the evaluation and writer threads.
+
+        With `records` (see `alert_queue`), batches are taken from there,
+        where `AlertForwarder`s in other processes put them.
+        """
+        if self._thread is not None:
+            return
+        if records is not None:
+            self.records = records
+        self.restore()
+        self.writer.start()
+        self._thread = threading.Thread(
+            target=self._run, name="alert-pipeline", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            "Alert pipeline writing to %s every %.1f s",
+            self.writer.database.dialect,
+            self.writer.flush_interval,
+        )
+
+    def restore(self) -> int:
+        """Load the unresolved alerts from the database into the engine.
+
+        Without this, a restart would forget them: they would never be
+        resolved, and a still-failing inverter would get a second alert.
+        If an inverter has several for one rule, the newest wins. A failed
+        query is logged and the engine starts empty.
+        """
+        database = self.writer.database
+        try:
+            with database.connection() as conn:
+                rows = database.unresolved_alerts(conn, self.user_id)
+        except Exception as exc:  # noqa: BLE001
+            logger.error("Could not load unresolved alerts: %s", exc)
+            return 0
+        restored = sum(
+            self.engine.restore(str(source_key), str(rule_name), str(alert_id))
+            for alert_id, source_key, rule_name in rows
+        )
+        logger.info("Restored %d unresolved alerts", restored)
+        return restored
+
+    def stop(self) -> None:
+        """Evaluate what is queued, then write out everything buffered."""
+        if self._thread is not None:
+            self.records.put(None)
+            self._thread.join()
+            self._thread = None
+        self.writer.stop()
+
+    def observe(
+        self, solar_inputs: Sequence[SolarInput], results: Sequence[Dict[str, Any]]
+    ) -> None:
+        """Queue served results for evaluation; each carries the
+        `model_version` that scored it."""
+        self._dropped += _put(self.records, solar_inputs, results)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                batch = self.records.get()
+            except Exception as exc:  # noqa: BLE001
+                # E.g. a forwarding worker killed half-way through a write.
+                logger.error("Unreadable alert batch: %s", exc)
+                continue
+            if batch is None:
+                return
+            try:
+                self.evaluate(*batch)
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Alert evaluation failed: %s", exc, exc_info=True)
+
+    def evaluate(
+        self, solar_inputs: Sequence[SolarInput], results: Sequence[Dict[str, Any]]
+    ) -> None:
+        """Run the engine over one batch and queue the rows to write."""
+        at = datetime.now(timezone.utc)
+        alerts: List[Row] = []
+        resolutions: List[Row] = []
+        predictions: List[Row] = []
+        for solar_input, result in zip(solar_inputs, results):
+            if "error" in result:
+                continue
+            source_key = solar_input.source_key
+            if self.persist_predictions:
+                probabilities = result["risk_probabilities"]
+                predictions.append(
+                    (
+                        str(uuid.uuid4()),
+                        self.user_id,
+                        probabilities["High"],
+                        max(probabilities.values()),
+                        "solar",
+                        source_key,
+                        result["efficiency_prediction"],
+                        result["anomaly_score"],
+                        result["anomaly_label"],
+                        result["risk_level"],
+                        result.get("model_version"),
+                        at,
+                    )
+                )
+            if not source_key:
+                continue
+            for event in self.engine.observe(source_key, result, at):
+                ALERT_EVENTS.labels(event.rule.name, event.kind).inc()
+                if event.kind == "resolved":
+                    resolutions.append((event.alert_id, at))
+                    continue
+                alerts.append(
+                    (
+                        event.alert_id,
+                        self.user_id,
+                        event.rule.severity,
+                        event.rule.message(source_key, event.value, event.threshold),
+                        event.rule.name,
+                        event.value,
+                        event.threshold,
+                        False,
+                        source_key,
+                        at,
+                    )
+                )
+        if alerts or resolutions or predictions:
+            self.writer.add(alerts, resolutions, predictions)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_alerts": self.engine.active(),
+            "dropped_batches": self._dropped,
+            **self.writer.stats(),
+        }
+
+
+def _queue_size_from_env() -> int:
+    return int(os.environ.get("SOLARA_ALERT_QUEUE_SIZE", "10000"))
+
+
+def _put(
+    records: "BatchQueue",
+    solar_inputs: Sequence[SolarInput],
+    results: Sequence[Dict[str, Any]],
+) -> int:
+    """Queue one batch without blocking; the number of batches dropped."""
+    try:
+        records.put_nowait((list(solar_inputs), list(results)))
+    except queue.Full:
+        logger.warning(
+            "Alert queue full; %d results dropped from alerting", len(results)
+        )
+        return 1
+    return 0
+
+
+def alert_queue() -> "BatchQueue":
+    """Queue from `backend.serve` workers to the supervisor's pipeline.
+
+    Holds at most `SOLARA_ALERT_QUEUE_SIZE` batches. Create it before
+    forking.
+    """
+    return multiprocessing.get_context("fork").Queue(_queue_size_from_env())
+
+
+class AlertForwarder:
+    """Stand-in for `AlertPipeline` in `backend.serve` workers.
+
+    Pre-fork workers each see an arbitrary share of an inverter's readings,
+    so none of them can debounce its alerts. `observe` instead puts the
+    batch on `records`, a queue from `alert_queue` that the supervisor's
+    pipeline reads, so one engine sees them all. Pickling and writing
+    happen on the queue's feeder thread.
+    """
+
+    def __init__(self, records: "BatchQueue") -> None:
+        self.records = records
+        self._dropped = 0
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        """Wait until the forwarded batches are written to the queue."""
+        self.records.close()  # type: ignore[union-attr]
+        self.records.join_thread()  # type: ignore[union-attr]
+
+    def observe(
+        self, solar_inputs: Sequence[SolarInput], results: Sequence[Dict[str, Any]]
+    ) -> None:
+        self._dropped += _put(self.records, solar_inputs, results)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"forwarding": True, "dropped_batches": self._dropped}
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ml.predict import SolarInput
+from ml.utils import get_logger
+
+
+logger = get_logger(__name__)
+
+BatchRunner = Callable[[List[SolarInput]], Awaitable[List[Dict[str, Any]]]]
+
+
+class MicroBatcher:
+    """Coalesce concurrent single predictions into one batch call.
+
+    Each `submit` waits until either `max_batch_size` inputs are pending or
+    the oldest pending input has waited `max_wait_ms`, then all pending
+    inputs go through `run_batch` together and every caller gets its own
+    row back. A per-row ``{"error": ...}`` result becomes a `ValueError`
+    for that caller only; an exception from `run_batch` itself (e.g. a
+    saturated executor) is raised to every caller in the batch.
+
+    Must be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        run_batch: BatchRunner,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self._run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._pending: List[Tuple[SolarInput, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: "set[asyncio.Task]" = set()
+
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+
+    @classmethod
+    def from_env(cls, run_batch: BatchRunner) -> "MicroBatcher":
+        """Build from `SOLARA_MICROBATCH_MAX_SIZE` and
+        `SOLARA_MICROBATCH_MAX_WAIT_MS`."""
+        return cls(
+            run_batch,
+            max_batch_size=int(os.environ.get("SOLARA_MICROBATCH_MAX_SIZE", "64")),
+            max_wait_ms=float(os.environ.get("SOLARA_MICROBATCH_MAX_WAIT_MS", "2")),
+        )
+
+    async def submit(self, solar_input: SolarInput) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((solar_input, future))
+
+        if len(self._pending) >= self.max_batch_size or self.max_wait_ms <= 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000.0, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: self.max_batch_size]
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: List[Tuple[SolarInput, asyncio.Future]]) -> None:
+        self._batches += 1
+        self._items += len(batch)
+        self._max_seen = max(self._max_seen, len(batch))
+        try:
+            results = await self._run_batch([solar_input for solar_input, _ in batch])
+        except Exception as exc:  # noqa: BLE001
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():  # caller went away
+                continue
+            if "error" in result:
+                future.set_exception(ValueError(result["error"]))
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "pending": len(self._pending),
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+            "max_batch_seen": self._max_seen,
+        }
@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ml.metrics import LOAD_BUCKETS, REGISTRY
+from ml.utils import get_logger
+
+
+logger = get_logger(__name__)
+
+Row = Tuple[Any, ...]
+
+# Columns the backend writes; `supabase/migrations` holds the Postgres
+# schema. `SQLITE_SCHEMA` mirrors it for local runs and tests.
+ALERT_COLUMNS = (
+    "id",
+    "user_id",
+    "severity",
+    "message",
+    "sensor_type",
+    "value",
+    "threshold",
+    "resolved",
+    "source_key",
+    "created_at",
+)
+PREDICTION_COLUMNS = (
+    "id",
+    "user_id",
+    "failure_probability",
+    "confidence",
+    "prediction_type",
+    "source_key",
+    "efficiency_prediction",
+    "anomaly_score",
+    "anomaly_label",
+    "risk_level",
+    "model_version",
+    "created_at",
+)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    severity TEXT NOT NULL DEFAULT 'info',
+    message TEXT NOT NULL,
+    sensor_type TEXT,
+    value REAL,
+    threshold REAL,
+    resolved BOOLEAN NOT NULL DEFAULT 0,
+    source_key TEXT,
+    resolved_at TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    failure_probability REAL,
+    remaining_useful_life REAL,
+    confidence REAL,
+    feature_importance TEXT,
+    prediction_type TEXT DEFAULT 'sensor',
+    source_key TEXT,
+    efficiency_prediction REAL,
+    anomaly_score REAL,
+    anomaly_label INTEGER,
+    risk_level TEXT,
+    model_version TEXT,
+    created_at TEXT NOT NULL
+);
+"""
+
+ROWS_WRITTEN = REGISTRY.counter(
+    "solara_db_rows_written_total", "Rows written to the database.", ("table",)
+)
+_ALERTS_WRITTEN = ROWS_WRITTEN.labels("alerts")
+_PREDICTIONS_WRITTEN = ROWS_WRITTEN.labels("predictions")
+ROWS_DROPPED = REGISTRY.counter(
+    "solara_db_rows_dropped_total",
+    "Prediction rows dropped because the write buffer was full.",
+).labels()
+FLUSH_SECONDS = REGISTRY.histogram(
+    "solara_db_flush_seconds",
+    "Seconds per database flush.",
+    buckets=LOAD_BUCKETS,
+).labels()
+FLUSH_ERRORS = REGISTRY.counter(
+    "solara_db_flush_errors_total", "Database flushes that failed."
+).labels()
+
+
+class Database:
+    """Connections to Postgres or, for local runs and tests, SQLite.
+
+    `url` is ``postgresql://...`` (needs the optional `psycopg` package)
+    or ``sqlite:///path/to.db``. Up to `pool_size` idle connections are
+    kept and reused; a connection that raised is closed instead of
+    returned. SQLite databases get `SQLITE_SCHEMA`; the Postgres schema
+    comes from the Supabase migrations.
+    """
+
+    def __init__(self, url: str, pool_size: int = 2) -> None:
+        if pool_size < 1:
+            raise ValueError("pool_size must be >= 1")
+        self.url = url
+        if url.startswith(("postgresql://", "postgres://")):
+            self.dialect = "postgresql"
+            self.placeholder = "%s"
+            # Postgres binds at most 65535 parameters per statement.
+            self.max_params = 65535
+            self._connect: Callable[[], Any] = self._connect_postgresql
+        elif url.startswith("sqlite:///"):
+            self.dialect = "sqlite"
+            self.placeholder = "?"
+            # The default SQLITE_MAX_VARIABLE_NUMBER of older builds.
+            self.max_params = 999
+            self._connect = self._connect_sqlite
+        else:
+            raise ValueError(f"Unsupported database URL: {url!r}")
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect_postgresql(self) -> Any:
+        try:
+            import psycopg
+        except ImportError as exc:
+            raise ImportError(
+                "Postgres support needs psycopg: pip install 'psycopg[binary]'"
+            ) from exc
+        return psycopg.connect(self.url)
+
+    def _connect_sqlite(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.url[len("sqlite:///") :], check_same_thread=False)
+        conn.executescript(SQLITE_SCHEMA)
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """A pooled connection; commits on success, rolls back on error."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            finally:
+                conn.close()
+            raise
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _adapt(self, value: Any) -> Any:
+        if self.dialect == "sqlite" and isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def insert_many(
+        self, conn: Any, table: str, columns: Sequence[str], rows: Sequence[Row]
+    ) -> None:
+        """Insert `rows` with multi-row ``INSERT ... VALUES (...), (...)``
+        statements, as many rows per statement as the parameter limit
+        allows."""
+        per_statement = max(1, min(1000, self.max_params // len(columns)))
+        group = "(" + ", ".join([self.placeholder] * len(columns)) + ")"
+        cur = conn.cursor()
+        try:
+            for start in range(0, len(rows), per_statement):
+                chunk = rows[start : start + per_statement]
+                cur.execute(
+                    f"INSERT INTO {table} ({', '.join(columns)}) "
+                    f"VALUES {', '.join([group] * len(chunk))}",
+                    [self._adapt(value) for row in chunk for value in row],
+                )
+        finally:
+            cur.close()
+
+    def unresolved_alerts(self, conn: Any, user_id: str) -> List[Row]:
+        """``(id, source_key, sensor_type)`` of the unresolved alerts the
+        backend raised for `user_id`, oldest first."""
+        ph = self.placeholder
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT id, source_key, sensor_type FROM alerts "
+                f"WHERE user_id = {ph} AND resolved = {ph} "
+                "AND source_key IS NOT NULL ORDER BY created_at",
+                (user_id, False),
+            )
+            return [tuple(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+    def resolve_alerts(self, conn: Any, resolutions: Sequence[Row]) -> None:
+        """Mark alerts resolved from ``(alert_id, resolved_at)`` rows."""
+        ph = self.placeholder
+        cur = conn.cursor()
+        try:
+            cur.executemany(
+                f"UPDATE alerts SET resolved = {ph}, resolved_at = {ph} "
+                f"WHERE id = {ph}",
+                [(True, self._adapt(at), alert_id) for alert_id, at in resolutions],
+            )
+        finally:
+            cur.close()
+
+
+class BatchWriter:
+    """Buffers alert and prediction rows and writes them in bulk.
+
+    A background thread flushes every `flush_interval` seconds, or sooner
+    once `max_batch` rows are waiting, in one transaction: new alerts,
+    then resolutions, then predictions. Adding rows only takes a lock, so
+    request handlers never wait on the database. If a flush fails, its rows
+    are kept for the next one; past `max_pending` buffered predictions the
+    oldest are dropped (alerts are never dropped), so an unreachable
+    database costs bounded memory.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        flush_interval: float = 1.0,
+        max_batch: int = 1000,
+        max_pending: int = 100_000,
+    ) -> None:
+        self.database = database
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+
+        self._alerts: List[Row] = []
+        self._resolutions: List[Row] = []
+        self._predictions: List[Row] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._flushes = 0
+        self._failures = 0
+        self._written: Dict[str, int] = {"alerts": 0, "predictions": 0}
+        self._dropped = 0
+
+    @classmethod
+    def from_env(cls, database: Database) -> "BatchWriter":
+        """Build from `SOLARA_DB_FLUSH_INTERVAL` (seconds),
+        `SOLARA_DB_MAX_BATCH` and `SOLARA_DB_MAX_PENDING`."""
+        return cls(
+            database,
+            flush_interval=float(os.environ.get("SOLARA_DB_FLUSH_INTERVAL", "1")),
+            max_batch=int(os.environ.get("SOLARA_DB_MAX_BATCH", "1000")),
+            max_pending=int(os.environ.get("SOLARA_DB_MAX_PENDING", "100000")),
+        )
+
+    def add(
+        self,
+        alerts: Sequence[Row] = (),
+        resolutions: Sequence[Row] = (),
+        predictions: Sequence[Row] = (),
+    ) -> None:
+        """Queue rows for the next flush."""
+        with self._lock:
+            self._alerts.extend(alerts)
+            self._resolutions.extend(resolutions)
+            self._predictions.extend(predictions)
+            overflow = len(self._predictions) - self.max_pending
+            if overflow > 0:
+                del self._predictions[:overflow]
+                self._dropped += overflow
+                ROWS_DROPPED.inc(overflow)
+            pending = (
+                len(self._alerts) + len(self._resolutions) + len(self._predictions)
+            )
+        if pending >= self.max_batch:
+            self._wake.set()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the thread after writing what is buffered."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 30.0)
+            self._thread = None
+        self.database.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self) -> bool:
+        """Write the buffered rows now; False if the write failed."""
+        with self._flush_lock:
+            with self._lock:
+                alerts, self._alerts = self._alerts, []
+                resolutions, self._resolutions = self._resolutions, []
+                predictions, self._predictions = self._predictions, []
+            if not (alerts or resolutions or predictions):
+                return True
+            start = time.perf_counter()
+            try:
+                with self.database.connection() as conn:
+                    if alerts:
+                        self.database.insert_many(conn, "alerts", ALERT_COLUMNS, alerts)
+                    if resolutions:
+                        self.database.resolve_alerts(conn, resolutions)
+                    if predictions:
+                        self.database.insert_many(
+                            conn, "predictions", PREDICTION_COLUMNS, predictions
+                        )
+            except Exception as exc:  # noqa: BLE001
+                self._failures += 1
+                FLUSH_ERRORS.inc()
+                logger.error(
+                    "Database flush of %d rows failed: %s",
+                    len(alerts) + len(resolutions) + len(predictions),
+                    exc,
+                )
+                # Back in front of rows added meanwhile, keeping their order.
+                with self._lock:
+                    self._alerts[:0] = alerts
+                    self._resolutions[:0] = resolutions
+                    self._predictions[:0] = predictions
+                    overflow = len(self._predictions) - self.max_pending
+                    if overflow > 0:
+                        del self._predictions[:overflow]
+                        self._dropped += overflow
+                        ROWS_DROPPED.inc(overflow)
+                return False
+            FLUSH_SECONDS.observe(time.perf_counter() - start)
+            self._flushes += 1
+            self._written["alerts"] += len(alerts)
+            self._written["predictions"] += len(predictions)
+            _ALERTS_WRITTEN.inc(len(alerts))
+            _PREDICTIONS_WRITTEN.inc(len(predictions))
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = (
+                len(self._alerts) + len(self._resolutions) + len(self._predictions)
+            )
+        return {
+            "dialect": self.database.dialect,
+            "flush_interval": self.flush_interval,
+            "pending": pending,
+            "flushes": self._flushes,
+            "failed_flushes": self._failures,
+            "written": dict(self._written),
+            "dropped_predictions": self._dropped,
+        }
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ml.utils import get_logger
+
+
+logger = get_logger(__name__)
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when the inference queue is full and a call is rejected."""
+
+
+def _timed_call(
+    fn: Callable[..., Any], enqueued_at: float, *args: Any
+) -> Tuple[float, Any]:
+    # time.monotonic is system-wide on Linux, so this also holds in a child
+    # process of a process pool.
+    wait = time.monotonic() - enqueued_at
+    return wait, fn(*args)
+
+
+class InferenceExecutor:
+    """Bounded pool that runs blocking inference off the asyncio event loop.
+
+    At most `max_workers` calls run at once and at most `max_queue` more
+    wait for a worker; further calls fail fast with `ExecutorSaturatedError`
+    instead of queueing without limit. All bookkeeping happens on the event
+    loop thread, so no locking is needed.
+
+    With `kind="process"` each worker process holds its own models, loaded
+    by `initializer`, and callables must be picklable module-level
+    functions. State shared across calls, like the rolling feature store,
+    must stay in the parent and be passed in as arguments. `restart`
+    replaces the workers, e.g. to serve newly published models.
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: Optional[int] = None,
+        max_queue: int = 64,
+        initializer: Optional[Callable[[], None]] = None,
+    ) -> None:
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(
+                f"Unknown executor kind {kind!r}; expected one of {EXECUTOR_KINDS}"
+            )
+        if max_queue < 0:
+            raise ValueError("max_queue must be >= 0")
+        self.kind = kind
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue
+        self._initializer = initializer
+        self._executor: Optional[Executor] = None
+        self._restart_lock = asyncio.Lock()
+
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._waits: Deque[float] = deque(maxlen=1024)
+        self._max_wait = 0.0
+
+    @classmethod
+    def from_env(
+        cls, initializer: Optional[Callable[[], None]] = None
+    ) -> "InferenceExecutor":
+        """Build from `SOLARA_EXECUTOR`, `SOLARA_EXECUTOR_WORKERS` and
+        `SOLARA_EXECUTOR_QUEUE`."""
+        workers = os.environ.get("SOLARA_EXECUTOR_WORKERS")
+        return cls(
+            kind=os.environ.get("SOLARA_EXECUTOR", "thread"),
+            max_workers=int(workers) if workers else None,
+            max_queue=int(os.environ.get("SOLARA_EXECUTOR_QUEUE", "64")),
+            initializer=initializer,
+        )
+
+    def _new_executor(self) -> Executor:
+        if self.kind == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self._initializer,
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="inference",
+        )
+
+    def _ensure_started(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._new_executor()
+            logger.info(
+                "Started %s inference executor (workers=%d, queue=%d)",
+                self.kind,
+                self.max_workers,
+                self.max_queue,
+            )
+        return self._executor
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def check_capacity(self) -> None:
+        """Raise `ExecutorSaturatedError` if a call now would be rejected.
+
+        Lets callers reject a request before preparing its arguments; with
+        no await in between, the following `run` is then accepted.
+        """
+        if self._in_flight >= self.capacity:
+            self._rejected += 1
+            raise ExecutorSaturatedError(
+                f"Inference queue full ({self._in_flight} calls in flight)"
+            )
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run `fn(*args)` in the pool, or raise `ExecutorSaturatedError`."""
+        self.check_capacity()
+
+        executor = self._ensure_started()
+        loop = asyncio.get_running_loop()
+        self._in_flight += 1
+        self._submitted += 1
+        try:
+            wait, result = await loop.run_in_executor(
+                executor, _timed_call, fn, time.monotonic(), *args
+            )
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+        self._completed += 1
+        self._waits.append(wait)
+        self._max_wait = max(self._max_wait, wait)
+        return result
+
+    async def restart(self, probe: Callable[[], Any]) -> List[Any]:
+        """Start a new pool, switch calls to it and retire the old one.
+
+        `probe` is called `max_workers` times in the new pool before the
+        switch, so its workers have run `initializer` (and loaded models)
+        before they take requests; its results are returned. Calls already
+        submitted finish on the old workers, which then exit.
+        """
+        async with self._restart_lock:
+            executor = self._new_executor()
+            loop = asyncio.get_running_loop()
+            try:
+                results = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(executor, probe)
+                        for _ in range(self.max_workers)
+                    )
+                )
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            old, self._executor = self._executor, executor
+            if old is not None:
+                old.shutdown(wait=False)
+            logger.info("Restarted %s inference executor", self.kind)
+            return list(results)
+
+    def stats(self) -> Dict[str, Any]:
+        waits_ms = np.asarray(self._waits) * 1000.0
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": max(0, self._in_flight - self.max_workers),
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "wait_ms_mean": float(waits_ms.mean()) if waits_ms.size else 0.0,
+            "wait_ms_p95": float(np.percentile(waits_ms, 95)) if waits_ms.size else 0.0,
+            "wait_ms_max": self._max_wait * 1000.0,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -1,19 +1,60 @@
 from __future__ import annotations
 
+import asyncio
+import hmac
+import logging
+import os
 import time
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, validator
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field, ValidationError, validator
 
+from backend.alerts import AlertForwarder, AlertPipeline
+from backend.batching import MicroBatcher
+from backend.executor import ExecutorSaturatedError, InferenceExecutor
+from backend.reloader import ModelWatcher
+from backend.streaming import PredictionStream
+from ml.metrics import REGISTRY
 from ml.predict import SolarInput, prediction_service
-from ml.utils import get_logger
+from ml.utils import configure_logging, get_logger, log_event
 
 
 logger = get_logger(__name__)
 
+MAX_BATCH_SIZE = 10_000
+RETRY_AFTER_SECONDS = int(os.environ.get("SOLARA_RETRY_AFTER", "1"))
+MICROBATCH_ENABLED = os.environ.get("SOLARA_MICROBATCH", "1") != "0"
+ADMIN_TOKEN = os.environ.get("SOLARA_ADMIN_TOKEN")
+# One `prediction_served` event per request, off unless
+# SOLARA_LOG_REQUESTS=1; request latencies are always in /metrics.
+request_logger = get_logger("solara.requests")
+request_logger.setLevel(
+    logging.INFO
+    if os.environ.get("SOLARA_LOG_REQUESTS", "0") == "1"
+    else logging.WARNING
+)
+
+REQUESTS = REGISTRY.counter(
+    "solara_requests_total", "Prediction requests received.", ("endpoint",)
+)
+REQUEST_ERRORS = REGISTRY.counter(
+    "solara_request_errors_total",
+    "Prediction requests (or batch readings) that failed, by reason.",
+    ("endpoint", "reason"),
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "solara_request_seconds",
+    "Seconds to serve a successful prediction request.",
+    ("endpoint",),
+)
+BATCH_READINGS = REGISTRY.counter(
+    "solara_batch_readings_total", "Readings received in batch requests."
+).labels()
+
 app = FastAPI(title="Solara AI Backend", version="1.0.0")
 
 # Allow the existing React frontend (Vite dev + production) to call this API
@@ -32,6 +73,12 @@ class SolarRequest(BaseModel):
     ambient_temperature: float = Field(..., description="Ambient temperature (°C)")
     module_temperature: float = Field(..., description="Module temperature (°C)")
     irradiation: float = Field(..., gt=0, description="Solar irradiation (W/m²)")
+    source_key: Optional[str] = Field(
+        None,
+        min_length=1,
+        max_length=128,
+        description="Inverter ID (SOURCE_KEY); enables per-inverter rolling features",
+    )
 
     @validator("module_temperature")
     def module_temp_not_extreme(cls, v: float) -> float:  # noqa: N805
@@ -51,49 +98,377 @@ class SolarPredictionResponse(BaseModel):
     anomaly_score: float
     anomaly_label: int
     risk_level: str
+    risk_probabilities: Dict[str, float]
+    model_version: Optional[str] = None
+
+
+class SolarBatchRequest(BaseModel):
+    readings: List[Dict[str, Any]] = Field(
+        ..., description="Readings shaped like the /predict/solar request body"
+    )
+
+
+class SolarBatchItem(BaseModel):
+    index: int
+    result: Optional[SolarPredictionResponse] = None
+    error: Optional[str] = None
+
+
+class SolarBatchResponse(BaseModel):
+    results: List[SolarBatchItem]
+
+
+def _to_solar_input(payload: SolarRequest) -> SolarInput:
+    return SolarInput(
+        dc_power=payload.dc_power,
+        ac_power=payload.ac_power,
+        ambient_temperature=payload.ambient_temperature,
+        module_temperature=payload.module_temperature,
+        irradiation=payload.irradiation,
+        source_key=payload.source_key,
+    )
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+        for err in exc.errors()
+    )
+
+
+def _parse_reading(reading: Any) -> SolarInput:
+    if not isinstance(reading, dict):
+        raise ValueError("Reading must be a JSON object")
+    try:
+        return _to_solar_input(SolarRequest(**reading))
+    except ValidationError as exc:
+        raise ValueError(_format_validation_error(exc)) from exc
+
+
+def _predict(
+    solar_input: SolarInput, rolling: Optional[Tuple[float, float, float]] = None
+) -> Dict[str, Any]:
+    return prediction_service.predict(solar_input, rolling)
+
+
+def _predict_batch(
+    solar_inputs: List[SolarInput],
+    rolling: Optional[List[Optional[Tuple[float, float, float]]]] = None,
+) -> List[Dict[str, Any]]:
+    return prediction_service.predict_batch(solar_inputs, rolling)
+
+
+def _served_version() -> Optional[str]:
+    return prediction_service.loaded_version
+
+
+def _init_inference_process() -> None:
+    """Process-pool initializer: one inference thread, models loaded up front."""
+    configure_logging()
+    prediction_service.set_inference_threads(1)
+    try:
+        prediction_service.warm_up()
+    except Exception as exc:  # noqa: BLE001
+        logger.error("Inference worker warm-up failed: %s", exc)
+    watcher = ModelWatcher.from_env(prediction_service)
+    if watcher is not None:
+        watcher.start()
+
+
+inference_executor = InferenceExecutor.from_env(initializer=_init_inference_process)
+
+
+# Process-pool workers each have their own `prediction_service`, so the
+# rolling feature store is kept here, in the parent, and each call carries
+# its readings' rolling features.
+
+
+async def _run_single(solar_input: SolarInput) -> Dict[str, Any]:
+    if inference_executor.kind != "process":
+        return await inference_executor.run(_predict, solar_input)
+    inference_executor.check_capacity()
+    (rolling,) = prediction_service.rolling_features([solar_input])
+    return await inference_executor.run(_predict, solar_input, rolling)
+
+
+async def _run_micro_batch(solar_inputs: List[SolarInput]) -> List[Dict[str, Any]]:
+    if inference_executor.kind != "process":
+        return await inference_executor.run(_predict_batch, solar_inputs)
+    inference_executor.check_capacity()
+    rolling = prediction_service.rolling_features(solar_inputs)
+    return await inference_executor.run(_predict_batch, solar_inputs, rolling)
+
+
+async def _run_stream_batch(solar_inputs: List[SolarInput]) -> List[Dict[str, Any]]:
+    results = await _run_micro_batch(solar_inputs)
+    _record_predictions(solar_inputs, results)
+    return results
+
+
+micro_batcher = MicroBatcher.from_env(_run_micro_batch) if MICROBATCH_ENABLED else None
+prediction_stream = PredictionStream.from_env(_run_stream_batch, _parse_reading)
+model_watcher = ModelWatcher.from_env(prediction_service)
+# `backend.serve` workers replace this with an `AlertForwarder`.
+alert_pipeline: Optional[Union[AlertPipeline, AlertForwarder]] = (
+    AlertPipeline.from_env()
+)
+# Keeps fire-and-forget startup tasks referenced until they finish.
+_background_tasks: Set["asyncio.Task[None]"] = set()
+
+
+def _record_predictions(
+    solar_inputs: List[SolarInput], results: List[Dict[str, Any]]
+) -> None:
+    """Queue served predictions for the alert pipeline, if one is configured;
+    it evaluates them on its own thread."""
+    if alert_pipeline is not None:
+        alert_pipeline.observe(solar_inputs, results)
+
+
+def _busy_response(exc: ExecutorSaturatedError) -> HTTPException:
+    log_event(request_logger, logging.WARNING, "request_rejected", reason=exc)
+    return HTTPException(
+        status_code=503,
+        detail="Server busy, retry later",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
 
 
 @app.on_event("startup")
 async def startup_event() -> None:
-    """Eagerly load models once at startup for low-latency inference."""
+    """Start loading models for low-latency inference.
+
+    Warm-up runs in the background so the server starts listening (and
+    answering /health) right away; /ready turns 200 once it is done.
+    """
+    configure_logging()
+    task = asyncio.create_task(asyncio.to_thread(_warm_up))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    if model_watcher is not None:
+        model_watcher.start()
+    if alert_pipeline is not None:
+        # Restores active alerts from the database before serving.
+        await asyncio.to_thread(alert_pipeline.start)
+
+
+def _warm_up() -> None:
+    start = time.perf_counter()
     try:
         logger.info("Warm-up: loading prediction assets")
-        _ = prediction_service.predict(
-            SolarInput(
-                dc_power=1.0,
-                ac_power=1.0,
-                ambient_temperature=25.0,
-                module_temperature=35.0,
-                irradiation=1.0,
-            )
+        prediction_service.warm_up()
+        logger.info(
+            "Warm-up completed in %.2f s; ready", time.perf_counter() - start
         )
-        logger.info("Warm-up completed successfully")
     except Exception as exc:  # noqa: BLE001
         logger.error("Warm-up failed (models may not be trained yet): %s", exc)
 
 
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    if model_watcher is not None:
+        model_watcher.stop()
+    if alert_pipeline is not None:
+        # Writes out buffered alerts and predictions.
+        await asyncio.to_thread(alert_pipeline.stop)
+    inference_executor.shutdown()
+
+
+_SINGLE_REQUESTS = REQUESTS.labels("/predict/solar")
+_SINGLE_SECONDS = REQUEST_SECONDS.labels("/predict/solar")
+_BATCH_REQUESTS = REQUESTS.labels("/predict/solar/batch")
+_BATCH_SECONDS = REQUEST_SECONDS.labels("/predict/solar/batch")
+_STREAM_REQUESTS = REQUESTS.labels("/ws/predict")
+
+
 @app.post("/predict/solar", response_model=SolarPredictionResponse)
 async def predict_solar(payload: SolarRequest) -> Dict[str, Any]:
     """Predict solar panel efficiency, anomaly score, and failure risk level."""
     start_time = time.perf_counter()
+    _SINGLE_REQUESTS.inc()
     try:
-        solar_input = SolarInput(
-            dc_power=payload.dc_power,
-            ac_power=payload.ac_power,
-            ambient_temperature=payload.ambient_temperature,
-            module_temperature=payload.module_temperature,
-            irradiation=payload.irradiation,
+        solar_input = _to_solar_input(payload)
+        if micro_batcher is not None:
+            result = await micro_batcher.submit(solar_input)
+        else:
+            result = await _run_single(solar_input)
+        _record_predictions([solar_input], [result])
+        elapsed = time.perf_counter() - start_time
+        _SINGLE_SECONDS.observe(elapsed)
+        log_event(
+            request_logger,
+            logging.INFO,
+            "prediction_served",
+            endpoint="/predict/solar",
+            ms=round(elapsed * 1000.0, 3),
         )
-        result = prediction_service.predict(solar_input)
-        elapsed_ms = (time.perf_counter() - start_time) * 1000.0
-        logger.info("Prediction served in %.2f ms", elapsed_ms)
         return result
+    except ExecutorSaturatedError as exc:
+        REQUEST_ERRORS.labels("/predict/solar", "busy").inc()
+        raise _busy_response(exc) from exc
     except Exception as exc:  # noqa: BLE001
+        REQUEST_ERRORS.labels("/predict/solar", "internal").inc()
         logger.error("Prediction API failed: %s", exc, exc_info=True)
         raise HTTPException(status_code=500, detail="Internal model error") from exc
 
 
+@app.post("/predict/solar/batch", response_model=SolarBatchResponse)
+async def predict_solar_batch(payload: SolarBatchRequest) -> Dict[str, Any]:
+    """Score many readings in one vectorized pass, reporting errors per row."""
+    if len(payload.readings) > MAX_BATCH_SIZE:
+        REQUEST_ERRORS.labels("/predict/solar/batch", "too_large").inc()
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(payload.readings)} > {MAX_BATCH_SIZE} readings",
+        )
+
+    start_time = time.perf_counter()
+    _BATCH_REQUESTS.inc()
+    BATCH_READINGS.inc(len(payload.readings))
+    items: List[Dict[str, Any]] = [{"index": i} for i in range(len(payload.readings))]
+    solar_inputs: List[SolarInput] = []
+    positions: List[int] = []
+    for i, reading in enumerate(payload.readings):
+        try:
+            solar_inputs.append(_to_solar_input(SolarRequest(**reading)))
+            positions.append(i)
+        except ValidationError as exc:
+            items[i]["error"] = _format_validation_error(exc)
+
+    try:
+        results = await _run_micro_batch(solar_inputs)
+    except ExecutorSaturatedError as exc:
+        REQUEST_ERRORS.labels("/predict/solar/batch", "busy").inc()
+        raise _busy_response(exc) from exc
+    except Exception as exc:  # noqa: BLE001
+        REQUEST_ERRORS.labels("/predict/solar/batch", "internal").inc()
+        logger.error("Batch prediction API failed: %s", exc, exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal model error") from exc
+
+    _record_predictions(solar_inputs, results)
+    for i, result in zip(positions, results):
+        if "error" in result:
+            items[i]["error"] = result["error"]
+        else:
+            items[i]["result"] = result
+    rejected = sum(1 for item in items if "error" in item)
+    if rejected:
+        REQUEST_ERRORS.labels("/predict/solar/batch", "rejected_reading").inc(rejected)
+
+    elapsed = time.perf_counter() - start_time
+    _BATCH_SECONDS.observe(elapsed)
+    log_event(
+        request_logger,
+        logging.INFO,
+        "prediction_served",
+        endpoint="/predict/solar/batch",
+        readings=len(items),
+        rejected=rejected,
+        ms=round(elapsed * 1000.0, 3),
+    )
+    return {"results": items}
+
+
+@app.websocket("/ws/predict")
+async def predict_solar_stream(websocket: WebSocket) -> None:
+    """Score an unbounded stream of readings, replying per reading in order.
+
+    Send readings shaped like the /predict/solar body, one JSON object (or
+    an array of them) per message; see `PredictionStream` for the reply
+    format and flow control.
+    """
+    _STREAM_REQUESTS.inc()
+    await prediction_stream.serve(websocket)
+
+
+@app.post("/admin/reload")
+async def reload_models(
+    force: bool = False,
+    x_admin_token: Optional[str] = Header(default=None),
+) -> Dict[str, Any]:
+    """Load the published model bundle in the background and swap it in.
+
+    In-flight and concurrent requests keep using the previous bundle until
+    the new one is loaded and warmed up. Only this server process is
+    reloaded; other `backend.serve` workers pick the bundle up through their
+    model watcher. With the process executor, its worker processes are
+    replaced by new ones serving the new bundle.
+
+    Disabled (404) unless `SOLARA_ADMIN_TOKEN` is set; requests must send
+    it in the `X-Admin-Token` header.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(
+        x_admin_token.encode(), ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    previous = prediction_service.loaded_version
+    try:
+        reloaded = await asyncio.to_thread(prediction_service.reload, force)
+        version = prediction_service.loaded_version
+        if reloaded and inference_executor.kind == "process":
+            served = await inference_executor.restart(_served_version)
+            if any(worker_version != version for worker_version in served):
+                raise RuntimeError(
+                    f"Inference workers serve {sorted(map(str, set(served)))}, "
+                    f"expected {version}"
+                )
+    except Exception as exc:  # noqa: BLE001
+        logger.error("Model reload failed: %s", exc, exc_info=True)
+        raise HTTPException(status_code=500, detail="Model reload failed") from exc
+    return {
+        "reloaded": reloaded,
+        "previous_version": previous,
+        "version": version,
+    }
+
+
 @app.get("/health")
 async def health() -> Dict[str, str]:
+    """Liveness: the process is up, whether or not models are loaded."""
     return {"status": "ok"}
 
+
+@app.get("/ready")
+async def ready() -> Dict[str, Any]:
+    """Readiness: 200 once models are loaded and warmed, 503 before.
+
+    Stays 503 after a failed warm-up (e.g. no trained models) until a
+    reload succeeds.
+    """
+    if not prediction_service.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Models not loaded yet",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    return {"status": "ready", "model_version": prediction_service.loaded_version}
+
+
+@app.get("/stats")
+async def stats() -> Dict[str, Any]:
+    """Runtime counters for tuning: queue depth, wait times, batch sizes and
+    result cache hits (of this process; process-pool workers keep their own)."""
+    cache = prediction_service.result_cache
+    return {
+        "executor": inference_executor.stats(),
+        "batcher": micro_batcher.stats() if micro_batcher is not None else None,
+        "streams": prediction_stream.stats(),
+        "alerts": alert_pipeline.stats() if alert_pipeline is not None else None,
+        "result_cache": cache.stats() if cache is not None else None,
+        "model_version": prediction_service.loaded_version,
+        "shards": prediction_service.shard_stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Request counters and stage/model-load latency histograms, in the
+    Prometheus text format. Per process: with the process executor, stage
+    timings are recorded in the workers and only request metrics show here."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
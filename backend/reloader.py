@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Optional
+
+from ml.predict import PredictionService
+from ml.utils import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class ModelWatcher:
+    """Background thread that hot-reloads models when they change on disk.
+
+    Polls `service.model_version()` every `interval` seconds and calls
+    `service.reload()` once the version differs from the one being served
+    and has been the same for two polls in a row, so files still being
+    written (e.g. overwritten in place rather than published as a bundle)
+    are not loaded half-way. A failed reload is logged and retried on a
+    later change; the old models keep serving meanwhile.
+
+    Each process (pre-fork worker or process-pool worker) serves its own
+    copy of the models and so needs its own watcher.
+    """
+
+    def __init__(self, service: PredictionService, interval: float = 10.0) -> None:
+        if interval <= 0:
+            raise ValueError("interval must be > 0")
+        self.service = service
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._failed_version: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, service: PredictionService) -> Optional["ModelWatcher"]:
+        """Build from `SOLARA_MODEL_WATCH_INTERVAL` (seconds; 0 disables)."""
+        interval = float(os.environ.get("SOLARA_MODEL_WATCH_INTERVAL", "10"))
+        return cls(service, interval) if interval > 0 else None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="model-watcher", daemon=True
+        )
+        self._thread.start()
+        logger.info("Watching model files every %.1f s", self.interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1.0)
+            self._thread = None
+
+    def _run(self) -> None:
+        seen = self.service.model_version()
+        while not self._stop.wait(self.interval):
+            try:
+                version = self.service.model_version()
+                stable = version == seen
+                seen = version
+                if (
+                    not stable
+                    or version == self.service.loaded_version
+                    or version == self._failed_version
+                ):
+                    continue
+                self.service.reload()
+                self._failed_version = None
+            except Exception as exc:  # noqa: BLE001
+                self._failed_version = seen
+                logger.error("Model reload failed: %s", exc, exc_info=True)
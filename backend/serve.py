@@ -0,0 +1,266 @@
+"""Pre-fork server: load models once, then fork workers that share them.
+
+Running `uvicorn --workers N` imports the app (and loads every model) in
+each worker. This entry point instead loads and warms the models in the
+parent, freezes the heap, binds the listening socket and forks N workers
+that accept on it. Model memory is shared copy-on-write; with
+`SOLARA_MODEL_BACKEND=compiled` the arrays are memory-mapped and shared
+through the page cache. Each worker runs inference on a single thread, so
+N workers use N cores without oversubscribing them.
+
+    python -m backend.serve --workers 4 --port 8000
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 32
+
+Reference throughput per core (`--concurrency 16`, synthetic models, one
+vCPU shared by the load generator and the server, so a dedicated core
+serves more):
+
+    backend   workers  req/s  req/s per core  p50
+    compiled  1        ~720   ~720            ~21 ms
+    joblib    1        ~73    ~73             ~206 ms
+
+Re-run the benchmark on the target hardware with `--workers` set to the
+server's worker count to get per-core numbers there.
+
+With `SOLARA_DATABASE_URL` set, alerts are evaluated in the supervisor:
+workers forward their results to it (see `AlertForwarder`), so each
+inverter's readings are debounced together whichever worker served them.
+"""
+
+from __future__ import annotations
+
+import os
+
+# Must be set before numpy/xgboost/scikit-learn create their thread pools.
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+import argparse
+import gc
+import multiprocessing
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+import uvicorn
+
+import backend.main
+from backend.alerts import AlertForwarder, alert_queue
+from backend.main import app
+from ml.predict import prediction_service
+from ml.utils import configure_logging, get_logger, shutdown_logging
+
+
+logger = get_logger(__name__)
+
+# A worker that exits sooner than this after starting failed "fast"
+# (e.g. a bad config or an import error): it is restarted after a doubling
+# delay, and the server gives up after MAX_FAST_FAILURES in a row.
+MIN_WORKER_UPTIME_SECONDS = 10.0
+RESTART_BACKOFF_SECONDS = 0.5
+MAX_RESTART_BACKOFF_SECONDS = 30.0
+MAX_FAST_FAILURES = 5
+
+
+class _RestartPolicy:
+    """Restart delays for crashed workers, tracked per worker index."""
+
+    def __init__(
+        self,
+        min_uptime: float = MIN_WORKER_UPTIME_SECONDS,
+        backoff: float = RESTART_BACKOFF_SECONDS,
+        max_backoff: float = MAX_RESTART_BACKOFF_SECONDS,
+        max_fast_failures: int = MAX_FAST_FAILURES,
+    ) -> None:
+        self.min_uptime = min_uptime
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_fast_failures = max_fast_failures
+        self._fast_failures: Dict[int, int] = {}
+
+    def delay(self, index: int, uptime: float) -> Optional[float]:
+        """Seconds to wait before restarting worker `index`, which ran for
+        `uptime` seconds; `None` once it has failed fast too often."""
+        if uptime >= self.min_uptime:
+            self._fast_failures[index] = 0
+            return 0.0
+        failures = self._fast_failures.get(index, 0) + 1
+        self._fast_failures[index] = failures
+        if failures >= self.max_fast_failures:
+            return None
+        return min(self.max_backoff, self.backoff * 2 ** (failures - 1))
+
+
+def _warm_up() -> None:
+    prediction_service.set_inference_threads(1)
+    prediction_service.warm_up()
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(
+    sock: socket.socket,
+    index: int,
+    pin_cpu: bool,
+    alert_records: Optional["multiprocessing.Queue"],
+) -> None:
+    if alert_records is not None:
+        backend.main.alert_pipeline = AlertForwarder(alert_records)
+    if pin_cpu and hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cpus[index % len(cpus)]})
+    config = uvicorn.Config(app, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def _spawn(
+    sock: socket.socket,
+    index: int,
+    pin_cpu: bool,
+    alert_records: Optional["multiprocessing.Queue"] = None,
+) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            _run_worker(sock, index, pin_cpu, alert_records)
+        except BaseException:  # noqa: BLE001
+            logger.exception("Worker %d crashed", index)
+            code = 1
+        finally:
+            shutdown_logging()
+            os._exit(code)
+    logger.info("Started worker %d (pid %d)", index, pid)
+    return pid
+
+
+def serve(host: str, port: int, workers: int, pin_cpu: bool = False) -> int:
+    """Load models, bind, fork `workers` processes and supervise them.
+
+    Crashed workers are restarted, with a backoff if they keep failing
+    right after starting (see `_RestartPolicy`). Returns the exit status:
+    0 after a signal stopped the workers, 1 if a worker failed too often.
+    """
+    start = time.perf_counter()
+    _warm_up()
+    logger.info("Models loaded and warmed in %.2f s", time.perf_counter() - start)
+
+    # Objects created so far are never freed; keep the collector from
+    # touching (and so un-sharing) their pages in every worker.
+    gc.collect()
+    gc.freeze()
+
+    alert_pipeline = backend.main.alert_pipeline
+    alert_records = None
+    if alert_pipeline is not None:
+        alert_records = alert_queue()
+        alert_pipeline.start(alert_records)
+
+    sock = _bind(host, port)
+    logger.info("Listening on http://%s:%d with %d workers", host, port, workers)
+
+    children: Dict[int, int] = {}
+    started: Dict[int, float] = {}
+    for index in range(workers):
+        children[_spawn(sock, index, pin_cpu, alert_records)] = index
+        started[index] = time.monotonic()
+
+    stopping = False
+    exit_code = 0
+    policy = _RestartPolicy()
+
+    def _stop(signum: int, _frame: Optional[object]) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        delay = policy.delay(index, time.monotonic() - started[index])
+        if delay is None:
+            logger.error(
+                "Worker %d (pid %d) exited with %d within %.0f s of starting "
+                "%d times in a row; shutting down",
+                index,
+                pid,
+                status,
+                policy.min_uptime,
+                policy.max_fast_failures,
+            )
+            exit_code = 1
+            _stop(signal.SIGTERM, None)
+            continue
+        logger.warning(
+            "Worker %d (pid %d) exited with %d; restarting in %.1f s",
+            index,
+            pid,
+            status,
+            delay,
+        )
+        # Sleep in steps so a signal during the backoff stops promptly.
+        deadline = time.monotonic() + delay
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if not stopping:
+            children[_spawn(sock, index, pin_cpu, alert_records)] = index
+            started[index] = time.monotonic()
+
+    sock.close()
+    logger.info("All workers stopped")
+    if alert_pipeline is not None:
+        alert_pipeline.stop()
+    return exit_code
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve the prediction API from pre-forked workers sharing one model copy.",
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes (default: CPU count).",
+    )
+    parser.add_argument(
+        "--pin-cpu",
+        action="store_true",
+        help="Pin each worker to its own CPU core.",
+    )
+    args = parser.parse_args()
+    configure_logging()
+
+    if not hasattr(os, "fork"):
+        sys.exit("backend.serve requires a platform with os.fork")
+    sys.exit(serve(args.host, args.port, args.workers, args.pin_cpu))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from starlette.websockets import WebSocket, WebSocketDisconnect, WebSocketState
+
+from backend.executor import ExecutorSaturatedError
+from ml.metrics import REGISTRY
+from ml.predict import SolarInput
+from ml.utils import get_logger
+
+
+logger = get_logger(__name__)
+
+BatchRunner = Callable[[List[SolarInput]], Awaitable[List[Dict[str, Any]]]]
+# A parsed reading, or the error message for one that could not be parsed.
+_Item = Tuple[int, Union[SolarInput, str]]
+
+STREAM_READINGS = REGISTRY.counter(
+    "solara_stream_readings_total", "Readings received on prediction streams."
+).labels()
+STREAM_BATCHES = REGISTRY.counter(
+    "solara_stream_batches_total", "Batches scored for prediction streams."
+).labels()
+
+
+class PredictionStream:
+    """Score unbounded WebSocket streams of readings in micro-batches.
+
+    Each text message is one reading, shaped like the /predict/solar body
+    (with `source_key` for rolling features), or a JSON array of them.
+    Readings are numbered in arrival order, and each gets exactly one
+    reply, in that order: ``{"seq": n, "source_key": ..., "result": {...}}``
+    or ``{"seq": n, "error": "..."}``.
+
+    Readings that arrive while a batch is being scored are scored together
+    next, up to `max_batch_size`, so batches grow with the input rate
+    without a timer adding latency when the stream is slow.
+
+    Flow control: at most `max_pending` readings wait to be scored. When
+    that many are waiting, the socket is not read, so a client that sends
+    faster than it is served is pushed back by TCP. Replies are sent one at
+    a time and each send waits for the socket's write buffer, so a slow
+    reader stalls scoring rather than growing a buffer in the server.
+    A saturated executor is retried after `retry_delay` seconds, since
+    dropping readings from a stream is worse than slowing it down.
+    """
+
+    def __init__(
+        self,
+        run_batch: BatchRunner,
+        parse: Callable[[Any], SolarInput],
+        max_batch_size: int = 256,
+        max_pending: int = 1024,
+        retry_delay: float = 0.05,
+    ) -> None:
+        if max_batch_size < 1 or max_pending < 1:
+            raise ValueError("max_batch_size and max_pending must be >= 1")
+        self._run_batch = run_batch
+        self._parse = parse
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self.retry_delay = retry_delay
+
+        self._active = 0
+        self._sessions = 0
+        self._readings = 0
+        self._batches = 0
+        self._retries = 0
+
+    @classmethod
+    def from_env(
+        cls, run_batch: BatchRunner, parse: Callable[[Any], SolarInput]
+    ) -> "PredictionStream":
+        """Build from `SOLARA_STREAM_MAX_BATCH_SIZE` and
+        `SOLARA_STREAM_MAX_PENDING`."""
+        return cls(
+            run_batch,
+            parse,
+            max_batch_size=int(os.environ.get("SOLARA_STREAM_MAX_BATCH_SIZE", "256")),
+            max_pending=int(os.environ.get("SOLARA_STREAM_MAX_PENDING", "1024")),
+        )
+
+    async def serve(self, websocket: WebSocket) -> None:
+        """Accept `websocket` and serve it until the client disconnects.
+
+        If reading the socket fails, the readings received so far are still
+        answered and the socket is then closed with code 1011.
+        """
+        await websocket.accept()
+        self._active += 1
+        self._sessions += 1
+        pending: "asyncio.Queue[Optional[_Item]]" = asyncio.Queue(self.max_pending)
+        receiver = asyncio.create_task(self._receive(websocket, pending))
+        try:
+            await self._score(websocket, pending)
+            if websocket.client_state == WebSocketState.CONNECTED:
+                # The receiver failed rather than seeing the client leave.
+                await websocket.close(code=1011)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._active -= 1
+            receiver.cancel()
+            try:
+                await receiver
+            except asyncio.CancelledError:
+                pass
+
+    async def _receive(
+        self, websocket: WebSocket, pending: "asyncio.Queue[Optional[_Item]]"
+    ) -> None:
+        # However reading ends, the scorer must see the end-of-stream marker,
+        # or it would wait on `pending` forever.
+        try:
+            await self._read(websocket, pending)
+        except Exception as exc:  # noqa: BLE001
+            logger.error("Stream receive failed: %s", exc, exc_info=True)
+        await pending.put(None)
+
+    async def _read(
+        self, websocket: WebSocket, pending: "asyncio.Queue[Optional[_Item]]"
+    ) -> None:
+        seq = 0
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            try:
+                payload = json.loads(message.get("text") or message.get("bytes") or "")
+            except (ValueError, RecursionError) as exc:
+                # RecursionError: arrays or objects nested too deeply.
+                await pending.put((seq, f"Invalid JSON: {exc}"))
+                seq += 1
+                continue
+            for reading in payload if isinstance(payload, list) else [payload]:
+                try:
+                    item: Union[SolarInput, str] = self._parse(reading)
+                except (TypeError, ValueError) as exc:
+                    item = str(exc)
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("Unparseable stream reading: %r", exc)
+                    item = "Invalid reading"
+                await pending.put((seq, item))
+                seq += 1
+                STREAM_READINGS.inc()
+
+    async def _score(
+        self, websocket: WebSocket, pending: "asyncio.Queue[Optional[_Item]]"
+    ) -> None:
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch_size and not pending.empty():
+                item = pending.get_nowait()
+                if item is None:
+                    await self._reply(websocket, batch)
+                    return
+                batch.append(item)
+            await self._reply(websocket, batch)
+
+    async def _run(self, solar_inputs: List[SolarInput]) -> List[Dict[str, Any]]:
+        while True:
+            try:
+                return await self._run_batch(solar_inputs)
+            except ExecutorSaturatedError:
+                self._retries += 1
+                await asyncio.sleep(self.retry_delay)
+
+    async def _reply(self, websocket: WebSocket, batch: List[_Item]) -> None:
+        inputs = [item for _, item in batch if isinstance(item, SolarInput)]
+        results: List[Dict[str, Any]] = []
+        if inputs:
+            self._batches += 1
+            self._readings += len(inputs)
+            STREAM_BATCHES.inc()
+            try:
+                results = await self._run(inputs)
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Stream prediction failed: %s", exc, exc_info=True)
+                results = [{"error": "Internal model error"}] * len(inputs)
+
+        scored = iter(results)
+        for seq, item in batch:
+            reply: Dict[str, Any] = {"seq": seq}
+            if isinstance(item, str):
+                reply["error"] = item
+            else:
+                result = next(scored)
+                if item.source_key is not None:
+                    reply["source_key"] = item.source_key
+                if "error" in result:
+                    reply["error"] = result["error"]
+                else:
+                    reply["result"] = result
+            if websocket.application_state != WebSocketState.CONNECTED:
+                raise WebSocketDisconnect()
+            await websocket.send_text(json.dumps(reply))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_pending": self.max_pending,
+            "active": self._active,
+            "sessions": self._sessions,
+            "readings": self._readings,
+            "batches": self._batches,
+            "mean_batch_size": (
+                self._readings / self._batches if self._batches else 0.0
+            ),
+            "saturated_retries": self._retries,
+        }
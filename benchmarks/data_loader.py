@@ -0,0 +1,216 @@
+"""Parity check and memory benchmark for the chunked CSV loader.
+
+Writes synthetic, time-ordered generation and weather CSVs (with gaps,
+leading missing values and an inverter whose temperature is never
+reported), loads them with the in-memory loader, the previous
+``groupby(...).apply(ffill/bfill)`` implementation and the chunked loader,
+and checks that all three produce the same rows and values. Then reports
+wall time and peak RSS of each loader in a fresh process.
+
+    python -m benchmarks.data_loader --rows 2000000 --chunksize 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from ml.data_loader import load_generation_and_weather
+
+
+def _write_csvs(
+    rows: int, inverters: int, directory: Path, seed: int
+) -> Tuple[Path, Path]:
+    rng = np.random.default_rng(seed)
+    steps = -(-rows // inverters)
+    times = np.repeat(
+        pd.date_range("2020-01-01", periods=steps, freq="15min").to_numpy(), inverters
+    )[:rows]
+    keys = np.tile(np.array([f"INV{i:05d}" for i in range(inverters)]), steps)[:rows]
+    irradiation = np.clip(rng.normal(0.4, 0.4, rows), 0.0, None)
+    ac_power = irradiation * rng.uniform(500.0, 1500.0, rows)
+    ambient = rng.uniform(-5.0, 40.0, rows)
+    module = ambient + 25.0 * irradiation
+
+    gen = pd.DataFrame(
+        {
+            "DATE_TIME": times,
+            "SOURCE_KEY": keys,
+            "DC_POWER": ac_power * 1.05,
+            "AC_POWER": ac_power,
+        }
+    )
+    weather = pd.DataFrame(
+        {
+            "DATE_TIME": times,
+            "SOURCE_KEY": keys,
+            "AMBIENT_TEMPERATURE": ambient,
+            "MODULE_TEMPERATURE": module,
+            "IRRADIATION": irradiation,
+        }
+    )
+    for frame, column in ((gen, "AC_POWER"), (weather, "AMBIENT_TEMPERATURE")):
+        frame.loc[rng.random(rows) < 0.01, column] = np.nan
+    # Leading gap for one inverter, and one inverter never reporting.
+    weather.loc[
+        (weather["SOURCE_KEY"] == "INV00001") & (np.arange(rows) < 50 * inverters),
+        "MODULE_TEMPERATURE",
+    ] = np.nan
+    weather.loc[weather["SOURCE_KEY"] == "INV00002", "MODULE_TEMPERATURE"] = np.nan
+    # Drop some readings from each file so the inner merge matters.
+    gen = gen[rng.random(rows) > 0.005]
+    weather = weather[rng.random(rows) > 0.005]
+
+    gen_path, weather_path = directory / "generation.csv", directory / "weather.csv"
+    gen.to_csv(gen_path, index=False)
+    weather.to_csv(weather_path, index=False)
+    return gen_path, weather_path
+
+
+def _reference(generation_csv: Path, weather_csv: Path) -> pd.DataFrame:
+    """The previous in-memory fill, kept for comparison."""
+    gen_df = pd.read_csv(generation_csv, parse_dates=["DATE_TIME"])
+    weather_df = pd.read_csv(weather_csv, parse_dates=["DATE_TIME"])
+    gen_df["SOURCE_KEY"] = gen_df["SOURCE_KEY"].astype(str)
+    weather_df["SOURCE_KEY"] = weather_df["SOURCE_KEY"].astype(str)
+    df = pd.merge(
+        gen_df,
+        weather_df,
+        on=["DATE_TIME", "SOURCE_KEY"],
+        how="inner",
+        suffixes=("_gen", "_weather"),
+    )
+    df = df.sort_values(["SOURCE_KEY", "DATE_TIME"]).reset_index(drop=True)
+    with warnings.catch_warnings():
+        # pandas 2.x warns that apply() sees the grouping column; it is kept.
+        warnings.simplefilter("ignore", FutureWarning)
+        df = (
+            df.groupby("SOURCE_KEY")
+            .apply(lambda g: g.ffill().bfill())
+            .reset_index(drop=True)
+        )
+    return df.dropna().reset_index(drop=True)
+
+
+def _same(a: pd.DataFrame, b: pd.DataFrame, float32: bool) -> bool:
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        print(f"  shape/columns differ: {a.shape} vs {b.shape}")
+        return False
+    ok = True
+    for column in a.columns:
+        x, y = a[column], b[column]
+        if column == "SOURCE_KEY":
+            equal = (x.astype(str).to_numpy() == y.astype(str).to_numpy()).all()
+        elif column == "DATE_TIME":
+            equal = x.equals(y)
+        else:
+            y = y.astype(np.float32) if float32 else y
+            equal = np.array_equal(x.to_numpy(), y.to_numpy())
+        if not equal:
+            print(f"  {column} differs")
+            ok = False
+    return ok
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss survives fork+exec, so a child would report the parent's
+    # peak; VmHWM belongs to the new address space.
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(mode: str, gen: Path, weather: Path, chunksize: int) -> dict:
+    start = time.perf_counter()
+    if mode == "reference":
+        df = _reference(gen, weather)
+    else:
+        df = load_generation_and_weather(
+            gen, weather, chunksize=chunksize if mode == "chunked" else None
+        )
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "rows": len(df),
+        "seconds": elapsed,
+        "peak_rss_mb": _peak_rss_mb(),
+        "result_mb": df.memory_usage(deep=True).sum() / 2**20,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--inverters", type=int, default=200)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--measure", choices=["reference", "memory", "chunked"])
+    parser.add_argument("--files", nargs=2, type=Path)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    if args.measure:
+        gen, weather = args.files
+        print(json.dumps(_measure(args.measure, gen, weather, args.chunksize)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gen, weather = _write_csvs(args.rows, args.inverters, Path(tmp), args.seed)
+        print(
+            f"{args.rows:,} rows, {args.inverters} inverters, "
+            f"{(gen.stat().st_size + weather.stat().st_size) / 2**20:.0f} MB of CSV"
+        )
+
+        reference = _reference(gen, weather)
+        in_memory = load_generation_and_weather(gen, weather)
+        chunked = load_generation_and_weather(gen, weather, chunksize=args.chunksize)
+        ok = _same(in_memory, reference, float32=False)
+        ok &= _same(chunked, reference, float32=True)
+        print(f"parity: {'ok' if ok else 'MISMATCH'}")
+        if not ok:
+            raise SystemExit(1)
+
+        for mode in ("reference", "memory", "chunked"):
+            out = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.data_loader",
+                    "--measure",
+                    mode,
+                    "--files",
+                    str(gen),
+                    str(weather),
+                    "--chunksize",
+                    str(args.chunksize),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            stats = json.loads(out.stdout.strip().splitlines()[-1])
+            print(
+                f"{mode:<10} {stats['seconds']:7.2f} s  "
+                f"peak RSS {stats['peak_rss_mb']:7.0f} MB  "
+                f"result {stats['result_mb']:6.0f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Closed-loop HTTP load generator for the prediction API.
+
+Each of `--concurrency` client threads keeps one keep-alive connection open
+and sends `POST /predict/solar` back to back for `--duration` seconds.
+Reports requests per second, latency percentiles and, given `--workers`,
+throughput per server worker.
+
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 32 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from typing import Dict, List
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+def _payload(i: int) -> bytes:
+    rng = np.random.default_rng(i)
+    irradiation = float(rng.uniform(0.1, 1.0))
+    ac_power = float(irradiation * rng.uniform(0.7, 1.0))
+    ambient = float(rng.uniform(15.0, 35.0))
+    return json.dumps(
+        {
+            "dc_power": ac_power * 1.05,
+            "ac_power": ac_power,
+            "ambient_temperature": ambient,
+            "module_temperature": ambient + 20.0 * irradiation,
+            "irradiation": irradiation,
+        }
+    ).encode()
+
+
+def _client(
+    host: str,
+    port: int,
+    path: str,
+    deadline: float,
+    seed: int,
+    latencies: List[float],
+    errors: List[int],
+) -> None:
+    payloads = [_payload(seed * 1000 + i) for i in range(64)]
+    headers = {"Content-Type": "application/json"}
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request(
+                "POST", path, body=payloads[i % len(payloads)], headers=headers
+            )
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException):
+            errors.append(0)
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    conn.close()
+
+
+def run(
+    url: str, concurrency: int, duration: float, path: str = "/predict/solar"
+) -> Dict[str, float]:
+    parsed = urlparse(url)
+    host, port = parsed.hostname or "127.0.0.1", parsed.port or 80
+
+    latencies: List[List[float]] = [[] for _ in range(concurrency)]
+    errors: List[int] = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(host, port, path, deadline, n, latencies[n], errors),
+            daemon=True,
+        )
+        for n in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = np.concatenate([np.asarray(l) for l in latencies]) * 1000.0
+    if all_latencies.size == 0:
+        raise SystemExit(f"No successful requests ({len(errors)} errors)")
+    return {
+        "requests": int(all_latencies.size),
+        "errors": len(errors),
+        "rps": all_latencies.size / elapsed,
+        "p50_ms": float(np.percentile(all_latencies, 50)),
+        "p95_ms": float(np.percentile(all_latencies, 95)),
+        "p99_ms": float(np.percentile(all_latencies, 99)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/predict/solar")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Server worker count, to report throughput per worker/core.",
+    )
+    args = parser.parse_args()
+
+    stats = run(args.url, args.concurrency, args.duration, args.path)
+    if args.workers:
+        stats["rps_per_worker"] = stats["rps"] / args.workers
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Load time and memory of the joblib-backend models against the compiled arrays.
+
+Starts `--workers` fresh processes per backend, like `uvicorn --workers`,
+each loading the bundle independently and scoring one batch. Reports per
+backend:
+
+- load_s: seconds to load the bundle (median over workers);
+- rss_mb: resident memory added by loading (after importing numpy and
+  `ml.model_bundle`), median over workers; for "joblib" this includes
+  importing scikit-learn and xgboost, which loading the models needs;
+- pss_total_mb: proportional set size summed over all workers while they
+  are all alive. Memory-mapped `.npy` pages come from the page cache and are
+  shared, so they count once in total; the joblib backend's models (native
+  XGBoost boosters, pickled IsolationForest and scaler) are private copies
+  in every worker;
+- disk_mb: size of the artifacts on disk.
+
+    python -m benchmarks.model_load --workers 4
+    python -m benchmarks.model_load --bundle models/bundles/<name>
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ml.model_bundle import COMPILED_SUBDIR, current_bundle_dir
+
+_WORKER = """
+import json, sys, time
+from pathlib import Path
+
+import numpy as np
+
+from ml.model_bundle import ModelBundle
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+
+
+before = rss_mb()
+start = time.perf_counter()
+bundle = ModelBundle.load(sys.argv[1], Path(sys.argv[2]))
+load_s = time.perf_counter() - start
+X = np.random.default_rng(0).normal(size=(256, len(bundle.scaler_mean))).astype(np.float32)
+bundle.score(bundle.scale(X))
+print(json.dumps({"load_s": load_s, "rss_mb": rss_mb() - before}), flush=True)
+sys.stdin.read()
+"""
+
+
+def _pss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def _disk_mb(bundle_dir: Path, backend: str) -> float:
+    if backend == "compiled":
+        paths = list((bundle_dir / COMPILED_SUBDIR).rglob("*"))
+    else:
+        paths = list(bundle_dir.glob("*.pkl")) + list(bundle_dir.glob("*.ubj"))
+    return sum(p.stat().st_size for p in paths if p.is_file()) / 1e6
+
+
+def measure(bundle_dir: Path, backend: str, workers: int) -> Dict[str, object]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (os.getcwd(), env.get("PYTHONPATH")) if p
+    )
+    env.setdefault("OMP_NUM_THREADS", "1")
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", _WORKER, backend, str(bundle_dir)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            env=env,
+        )
+        for _ in range(workers)
+    ]
+    try:
+        reports = [json.loads(proc.stdout.readline()) for proc in procs]
+        pss = [_pss_mb(proc.pid) for proc in procs]
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait(timeout=60)
+    loads: List[float] = [r["load_s"] for r in reports]
+    return {
+        "load_s": statistics.median(loads),
+        "load_s_max": max(loads),
+        "rss_mb": statistics.median(r["rss_mb"] for r in reports),
+        "pss_total_mb": sum(pss) if None not in pss else None,
+        "disk_mb": _disk_mb(bundle_dir, backend),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bundle", type=Path, default=None)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    bundle_dir = (args.bundle or current_bundle_dir()).resolve()
+    results = {
+        backend: measure(bundle_dir, backend, args.workers)
+        for backend in ("joblib", "compiled")
+    }
+    print(
+        json.dumps(
+            {"bundle": str(bundle_dir), "workers": args.workers, **results}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Parity check and latency benchmark for the DataFrame-free online path.
+
+Compares `PredictionService.online_features` against the pandas pipeline
+(`basic_cleaning` -> `add_engineered_features` -> `apply_scaler`) on random
+readings, and the vectorized batch features against both, failing if any
+scaled feature differs in a single bit. Then times both paths and a full
+single-reading `predict`.
+
+Requires trained models under `models/`:
+
+    python -m benchmarks.online_features --samples 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from ml.feature_engineering import (
+    FEATURE_COLUMNS,
+    add_engineered_features,
+    compute_online_features_batch,
+)
+from ml.predict import SolarInput, prediction_service
+from ml.preprocessing import apply_scaler, basic_cleaning
+
+
+def _random_inputs(n: int, seed: int) -> List[SolarInput]:
+    rng = np.random.default_rng(seed)
+    ac = rng.uniform(0.0, 1500.0, n)
+    # Include tiny values so the epsilon clipping branches are exercised.
+    ac[rng.random(n) < 0.05] = 1e-8
+    irr = rng.uniform(1e-7, 1.2, n)
+    ambient = rng.uniform(-10.0, 45.0, n)
+    return [
+        SolarInput(
+            dc_power=float(ac[i] * rng.uniform(1.0, 1.2)),
+            ac_power=float(ac[i]),
+            ambient_temperature=float(ambient[i]),
+            module_temperature=float(ambient[i] + rng.uniform(0.0, 35.0)),
+            irradiation=float(irr[i]),
+        )
+        for i in range(n)
+    ]
+
+
+def _pandas_features(solar_input: SolarInput) -> np.ndarray:
+    df = basic_cleaning(solar_input.to_dataframe())
+    df = add_engineered_features(df)
+    scaled = apply_scaler(df, FEATURE_COLUMNS, prediction_service.bundle.scaler)
+    return scaled[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+
+
+def _time_per_call(
+    fn: Callable[[SolarInput], object], inputs: List[SolarInput]
+) -> float:
+    start = time.perf_counter()
+    for solar_input in inputs:
+        fn(solar_input)
+    return (time.perf_counter() - start) / len(inputs) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    inputs = _random_inputs(args.samples, args.seed)
+    prediction_service.predict(inputs[0])  # load + warm up
+
+    mismatches = 0
+    for solar_input in inputs:
+        fast = prediction_service.online_features(solar_input).copy()
+        slow = _pandas_features(solar_input)
+        if not np.array_equal(fast.view(np.uint32), slow.view(np.uint32)):
+            mismatches += 1
+    print(f"parity: {args.samples - mismatches}/{args.samples} bit-identical")
+
+    batch = compute_online_features_batch(
+        [
+            (
+                i.dc_power,
+                i.ac_power,
+                i.ambient_temperature,
+                i.module_temperature,
+                i.irradiation,
+            )
+            for i in inputs
+        ]
+    )
+    prediction_service.bundle.scale(batch)
+    single = np.vstack([prediction_service.online_features(i).copy() for i in inputs])
+    batch_ok = np.array_equal(batch.view(np.uint32), single.view(np.uint32))
+    print(f"batch parity: {'bit-identical' if batch_ok else 'MISMATCH'}")
+    mismatches += 0 if batch_ok else 1
+
+    timed = inputs[: min(len(inputs), 1000)]
+    pandas_us = _time_per_call(_pandas_features, timed)
+    fast_us = _time_per_call(prediction_service.online_features, timed)
+    predict_us = _time_per_call(prediction_service.predict, timed)
+    print(f"features (pandas): {pandas_us:10.1f} us/reading")
+    print(f"features (numpy):  {fast_us:10.1f} us/reading ({pandas_us / fast_us:.0f}x)")
+    print(f"predict (total):   {predict_us:10.1f} us/reading")
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
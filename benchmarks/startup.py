@@ -0,0 +1,144 @@
+"""Cold-start benchmark for the API: import time, time to listen, time to ready.
+
+Each run starts a fresh interpreter, so nothing is cached in-process:
+
+- import: seconds to `import backend.main`, and which heavy libraries
+  (pandas, scikit-learn, xgboost, joblib, scipy) that import pulled in;
+- server: starts `uvicorn backend.main:app` and polls it, reporting the
+  seconds from process start until `/health` answers (listening) and until
+  `/ready` returns 200 (models loaded and warmed).
+
+Reports the median and max over `--runs`. Uses the published models.
+
+    python -m benchmarks.startup --runs 5 --backend compiled
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+HEAVY_MODULES = ("pandas", "sklearn", "xgboost", "joblib", "scipy")
+
+_IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import backend.main
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "heavy_modules": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _status(port: int, path: str) -> Optional[int]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+    try:
+        conn.request("GET", path)
+        return conn.getresponse().status
+    except OSError:
+        return None
+    finally:
+        conn.close()
+
+
+def measure_import(env: Dict[str, str]) -> Dict[str, object]:
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure_server(env: Dict[str, str], timeout: float) -> Dict[str, float]:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "backend.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    listening = ready = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise SystemExit(f"Server exited with {proc.returncode}")
+            if listening is None and _status(port, "/health") == 200:
+                listening = time.perf_counter() - start
+            if listening is not None and _status(port, "/ready") == 200:
+                ready = time.perf_counter() - start
+                break
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    if ready is None:
+        raise SystemExit(f"Server not ready within {timeout:.0f} s")
+    return {"listening_s": listening, "ready_s": ready}
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {"median": statistics.median(values), "max": max(values)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", choices=("joblib", "compiled"), default=None)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (os.getcwd(), env.get("PYTHONPATH")) if p
+    )
+    if args.backend:
+        env["SOLARA_MODEL_BACKEND"] = args.backend
+
+    imports = [measure_import(env) for _ in range(args.runs)]
+    servers = [measure_server(env, args.timeout) for _ in range(args.runs)]
+    print(
+        json.dumps(
+            {
+                "runs": args.runs,
+                "backend": env.get("SOLARA_MODEL_BACKEND", "joblib"),
+                "import_s": _summary([r["seconds"] for r in imports]),
+                "heavy_modules_on_import": imports[-1]["heavy_modules"],
+                "listening_s": _summary([r["listening_s"] for r in servers]),
+                "ready_s": _summary([r["ready_s"] for r in servers]),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""End-to-end benchmark suite for the ML pipeline and the API.
+
+For each `--sizes` row count, writes synthetic plant CSVs (see
+`benchmarks.synthetic`) and times loading (in memory and chunked),
+`basic_cleaning`, `add_engineered_features` and `train_models` (into an
+unpublished bundle that is deleted afterwards). Then times single-reading
+`predict` against `predict_batch` at several batch sizes for each model
+backend, and finally serves `backend.main:app` with uvicorn in a background
+thread and drives `POST /predict/solar` with `benchmarks.load_test` at each
+`--concurrency`. Predict and API runs use the published models.
+
+The load clients share the server's process (and GIL), so API numbers are
+for comparing commits on one machine, not for capacity planning; use
+`benchmarks.load_test` against `backend.serve` for that.
+
+Results are written as JSON: `meta` (commit, versions, CPU count, args) and
+one record per measurement, keyed by a stable `name`. `--compare OLD.json`
+prints each metric of this run as a ratio of the old one.
+
+    python -m benchmarks.suite --sizes 50000 200000 --out bench_results/run.json
+    python -m benchmarks.suite --skip train api --compare bench_results/base.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import load_test
+from benchmarks.synthetic import write_plant_csvs
+from ml.data_loader import load_generation_and_weather
+from ml.feature_engineering import add_engineered_features
+from ml.predict import MODEL_BACKENDS, PredictionService, SolarInput
+from ml.preprocessing import basic_cleaning
+from ml.train import train_models
+
+OPTIONAL_STAGES = ("train", "predict", "api")
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = ROOT / "bench_results"
+
+Record = Dict[str, Any]
+
+
+def _record(name: str, params: Dict[str, Any], **metrics: float) -> Record:
+    print(f"  {name}: " + ", ".join(f"{k}={v:.4g}" for k, v in metrics.items()))
+    return {"name": name, "params": params, "metrics": metrics}
+
+
+def _timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bench_pipeline(
+    rows: int, inverters: int, directory: Path, chunksize: int
+) -> Tuple[List[Record], pd.DataFrame]:
+    """Load, clean and feature records, and the resulting feature frame."""
+    gen_csv, weather_csv = write_plant_csvs(directory, rows, inverters)
+    params = {"rows": rows, "inverters": inverters}
+    records = []
+
+    raw, seconds = _timed(lambda: load_generation_and_weather(gen_csv, weather_csv))
+    records.append(
+        _record(
+            f"load/rows={rows}", params, seconds=seconds, rows_per_s=len(raw) / seconds
+        )
+    )
+    _, seconds = _timed(
+        lambda: load_generation_and_weather(gen_csv, weather_csv, chunksize=chunksize)
+    )
+    records.append(
+        _record(
+            f"load_chunked/rows={rows}",
+            {**params, "chunksize": chunksize},
+            seconds=seconds,
+            rows_per_s=len(raw) / seconds,
+        )
+    )
+    cleaned, seconds = _timed(lambda: basic_cleaning(raw))
+    records.append(
+        _record(
+            f"clean/rows={rows}", params, seconds=seconds, rows_per_s=len(raw) / seconds
+        )
+    )
+    features, seconds = _timed(lambda: add_engineered_features(cleaned))
+    records.append(
+        _record(
+            f"features/rows={rows}",
+            params,
+            seconds=seconds,
+            rows_per_s=len(cleaned) / seconds,
+        )
+    )
+    return records, features
+
+
+def bench_train(features: pd.DataFrame, rows: int) -> Record:
+    bundle_dir, seconds = _timed(lambda: train_models(features, publish=False))
+    shutil.rmtree(bundle_dir, ignore_errors=True)
+    return _record(
+        f"train/rows={rows}",
+        {"rows": rows, "train_rows": len(features)},
+        seconds=seconds,
+        rows_per_s=len(features) / seconds,
+    )
+
+
+def _inputs(features: pd.DataFrame, n: int, seed: int = 0) -> List[SolarInput]:
+    sample = features.sample(n=n, replace=len(features) < n, random_state=seed)
+    return [
+        SolarInput(
+            dc_power=float(row.DC_POWER),
+            ac_power=float(row.AC_POWER),
+            ambient_temperature=float(row.AMBIENT_TEMPERATURE),
+            module_temperature=float(row.MODULE_TEMPERATURE),
+            irradiation=float(row.IRRADIATION),
+            source_key=str(row.SOURCE_KEY),
+        )
+        for row in sample.itertuples(index=False)
+    ]
+
+
+def bench_predict(
+    features: pd.DataFrame, readings: int, batch_sizes: List[int]
+) -> List[Record]:
+    inputs = _inputs(features, readings)
+    records = []
+    for backend in MODEL_BACKENDS:
+        try:
+            service = PredictionService(backend=backend)
+            service.warm_up()
+        except Exception as exc:  # noqa: BLE001
+            print(f"  predict/{backend}: skipped ({exc})")
+            continue
+        service.result_cache = None  # measure the models, not the cache
+
+        latencies = []
+        for solar_input in inputs:
+            start = time.perf_counter()
+            service.predict(solar_input)
+            latencies.append(time.perf_counter() - start)
+        ms = np.asarray(latencies) * 1000.0
+        records.append(
+            _record(
+                f"predict/{backend}/single",
+                {"backend": backend, "readings": readings},
+                rows_per_s=len(ms) / (ms.sum() / 1000.0),
+                p50_ms=float(np.percentile(ms, 50)),
+                p99_ms=float(np.percentile(ms, 99)),
+            )
+        )
+        for size in batch_sizes:
+            batches = [inputs[i : i + size] for i in range(0, len(inputs), size)]
+            start = time.perf_counter()
+            for batch in batches:
+                service.predict_batch(batch)
+            seconds = time.perf_counter() - start
+            records.append(
+                _record(
+                    f"predict/{backend}/batch={size}",
+                    {"backend": backend, "readings": readings, "batch": size},
+                    rows_per_s=len(inputs) / seconds,
+                    ms_per_batch=seconds * 1000.0 / len(batches),
+                )
+            )
+    return records
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _status(port: int, path: str) -> Optional[int]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", path)
+        return conn.getresponse().status
+    except OSError:
+        return None
+    finally:
+        conn.close()
+
+
+def bench_api(concurrencies: List[int], duration: float) -> List[Record]:
+    import uvicorn
+
+    from backend.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 60.0
+    while not server.started or _status(port, "/ready") != 200:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise SystemExit("API server failed to start or load models")
+        time.sleep(0.05)
+
+    records = []
+    try:
+        url = f"http://127.0.0.1:{port}"
+        load_test.run(url, 1, min(duration, 1.0))  # warm-up
+        for concurrency in concurrencies:
+            stats = load_test.run(url, concurrency, duration)
+            records.append(
+                _record(
+                    f"api/predict_solar/concurrency={concurrency}",
+                    {"concurrency": concurrency, "duration": duration},
+                    **{k: float(v) for k, v in stats.items()},
+                )
+            )
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30.0)
+    return records
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _meta(args: argparse.Namespace) -> Dict[str, Any]:
+    import sklearn
+    import xgboost
+
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "xgboost": xgboost.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+    }
+
+
+def compare(new: Dict[str, Any], old: Dict[str, Any]) -> None:
+    """Print each metric of `new` as a ratio of the same metric in `old`."""
+    old_records = {r["name"]: r["metrics"] for r in old["records"]}
+    print(
+        f"\nCompared with {old['meta'].get('commit', '?')[:12]} "
+        "(ratio new/old; higher rows_per_s/rps or lower seconds/ms is better):"
+    )
+    for record in new["records"]:
+        before = old_records.get(record["name"])
+        if before is None:
+            print(f"  {record['name']}: new")
+            continue
+        ratios = [
+            f"{k}={v / before[k]:.2f}x"
+            for k, v in record["metrics"].items()
+            if before.get(k)
+        ]
+        print(f"  {record['name']}: " + ", ".join(ratios))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50_000, 200_000])
+    parser.add_argument("--inverters", type=int, default=22)
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument(
+        "--train-max-rows",
+        type=int,
+        default=200_000,
+        help="Skip training for sizes above this many rows.",
+    )
+    parser.add_argument("--readings", type=int, default=2048)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 256, 1024])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--skip", nargs="*", default=[], choices=OPTIONAL_STAGES)
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.disable(logging.INFO)
+
+    records: List[Record] = []
+    features: Optional[pd.DataFrame] = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.sizes:
+            print(f"Pipeline, {rows} rows:")
+            size_records, features = bench_pipeline(
+                rows, args.inverters, Path(tmp) / str(rows), args.chunksize
+            )
+            records += size_records
+            if "train" not in args.skip and rows <= args.train_max_rows:
+                records.append(bench_train(features, rows))
+
+    if "predict" not in args.skip and features is not None:
+        print("Predict:")
+        records += bench_predict(features, args.readings, args.batch_sizes)
+    if "api" not in args.skip:
+        print("API:")
+        records += bench_api(args.concurrency, args.duration)
+
+    result = {"meta": _meta(args), "records": records}
+    out = args.out
+    if out is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        out = RESULTS_DIR / f"{stamp}-{result['meta']['commit'][:12] or 'nogit'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2) + "\n")
+    print(f"\nWrote {out}")
+
+    if args.compare is not None:
+        compare(result, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Synthetic plant data shaped like the Kaggle solar generation dataset.
+
+Writes a generation CSV (DATE_TIME, PLANT_ID, SOURCE_KEY, DC_POWER,
+AC_POWER, DAILY_YIELD, TOTAL_YIELD) and a weather CSV (DATE_TIME, PLANT_ID,
+SOURCE_KEY, AMBIENT_TEMPERATURE, MODULE_TEMPERATURE, IRRADIATION) at
+15-minute resolution, sorted by DATE_TIME like the originals. Irradiation
+follows a day curve with passing clouds, so about half the rows are night
+readings that `basic_cleaning` drops. Inverters differ in size and
+efficiency, some degrade over time, and both files have gaps and missing
+values. Power is in per-unit of irradiation (not kW), so the efficiency
+feature spans the classifier's risk thresholds.
+
+Unlike the Kaggle weather file, whose SOURCE_KEY is a sensor ID, weather
+rows carry the inverter keys, since the pipeline joins the files on
+(DATE_TIME, SOURCE_KEY).
+
+    python -m benchmarks.synthetic --rows 1000000 --out /tmp/plant
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+PLANT_ID = 4135001
+STEP = pd.Timedelta(minutes=15)
+STEPS_PER_DAY = 96
+
+
+def plant_frames(
+    rows: int, inverters: int = 22, seed: int = 0
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """About `rows` generation and weather rows for `inverters` inverters."""
+    rng = np.random.default_rng(seed)
+    steps = -(-rows // inverters)
+    times = pd.date_range("2020-05-15", periods=steps, freq=STEP)
+    hour = (times.hour + times.minute / 60.0).to_numpy()
+    day = ((times - times[0]) // pd.Timedelta(days=1)).to_numpy()
+
+    # Clear-sky day curve between 6:00 and 18:30, dimmed by clouds that
+    # drift over the whole plant.
+    sun = np.clip(np.sin(np.pi * (hour - 6.0) / 12.5), 0.0, None)
+    clouds = np.clip(
+        1.0 - np.abs(np.cumsum(rng.normal(0.0, 0.05, steps))) % 1.0 * 0.6, 0.2, 1.0
+    )
+    irradiation_t = sun * clouds * rng.uniform(0.9, 1.1, steps)
+    ambient_t = (
+        24.0
+        + 6.0 * np.sin(np.pi * (hour - 9.0) / 12.0)
+        + np.cumsum(rng.normal(0.0, 0.02, steps))
+    )
+
+    capacity = rng.uniform(0.9, 1.1, inverters)
+    efficiency = rng.uniform(0.85, 0.99, inverters)
+    # A few inverters lose efficiency over the period.
+    degradation = np.where(rng.random(inverters) < 0.2, rng.uniform(0.001, 0.01), 0.0)
+
+    time_idx = np.repeat(np.arange(steps), inverters)
+    inv_idx = np.tile(np.arange(inverters), steps)
+    keep = slice(0, rows)
+    time_idx, inv_idx = time_idx[keep], inv_idx[keep]
+    n = len(time_idx)
+
+    irradiation = np.clip(irradiation_t[time_idx] + rng.normal(0.0, 0.01, n), 0.0, None)
+    irradiation[sun[time_idx] == 0.0] = 0.0
+    ambient = ambient_t[time_idx] + rng.normal(0.0, 0.3, n)
+    module = ambient + 28.0 * irradiation + rng.normal(0.0, 0.5, n)
+    derate = 1.0 - 0.004 * np.clip(module - 25.0, 0.0, None)
+    dc_power = capacity[inv_idx] * irradiation * derate
+    ac_power = (
+        dc_power
+        * np.clip(efficiency[inv_idx] - degradation[inv_idx] * day[time_idx], 0.3, 1)
+        * rng.uniform(0.98, 1.0, n)
+    )
+
+    keys = np.array([f"INV{i:04d}{seed:02d}" for i in range(inverters)])
+    yield_step = ac_power * 0.25
+    daily = pd.Series(yield_step).groupby([inv_idx, day[time_idx]]).cumsum().to_numpy()
+    total = pd.Series(yield_step).groupby(inv_idx).cumsum().to_numpy() + 6_000.0 * (
+        1.0 + inv_idx / inverters
+    )
+    gen = pd.DataFrame(
+        {
+            "DATE_TIME": times[time_idx],
+            "PLANT_ID": PLANT_ID,
+            "SOURCE_KEY": keys[inv_idx],
+            "DC_POWER": dc_power,
+            "AC_POWER": ac_power,
+            "DAILY_YIELD": daily,
+            "TOTAL_YIELD": total,
+        }
+    )
+    weather = pd.DataFrame(
+        {
+            "DATE_TIME": times[time_idx],
+            "PLANT_ID": PLANT_ID,
+            "SOURCE_KEY": keys[inv_idx],
+            "AMBIENT_TEMPERATURE": ambient,
+            "MODULE_TEMPERATURE": module,
+            "IRRADIATION": irradiation,
+        }
+    )
+    # Missing values and readings that only one of the files has.
+    gen.loc[rng.random(n) < 0.002, "AC_POWER"] = np.nan
+    weather.loc[rng.random(n) < 0.002, "MODULE_TEMPERATURE"] = np.nan
+    gen = gen[rng.random(n) > 0.003].reset_index(drop=True)
+    weather = weather[rng.random(n) > 0.003].reset_index(drop=True)
+    return gen, weather
+
+
+def write_plant_csvs(
+    directory: Path, rows: int, inverters: int = 22, seed: int = 0
+) -> Tuple[Path, Path]:
+    """Write `generation.csv` and `weather.csv` into `directory`."""
+    directory.mkdir(parents=True, exist_ok=True)
+    gen, weather = plant_frames(rows, inverters, seed)
+    gen_path, weather_path = directory / "generation.csv", directory / "weather.csv"
+    gen.to_csv(gen_path, index=False)
+    weather.to_csv(weather_path, index=False)
+    return gen_path, weather_path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--inverters", type=int, default=22)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, required=True)
+    args = parser.parse_args()
+    gen, weather = write_plant_csvs(args.out, args.rows, args.inverters, args.seed)
+    print(gen, weather)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterable, Tuple
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
 
 import joblib
 import numpy as np
@@ -21,25 +21,38 @@ class AnomalyDetector:
         self,
         contamination: float = 0.05,
         random_state: int = 42,
+        params: Optional[Dict[str, Any]] = None,
     ) -> None:
         self.model = IsolationForest(
             contamination=contamination,
             random_state=random_state,
             n_jobs=-1,
         )
+        if params:
+            # Overrides, e.g. chosen with `python -m ml.tune`.
+            self.model.set_params(**params)
 
     def fit(self, X: pd.DataFrame) -> None:
         logger.info("Fitting IsolationForest on shape %s", X.shape)
         self.model.fit(X.values)
 
     def predict(
-        self, X: pd.DataFrame
+        self, X: Union[pd.DataFrame, np.ndarray]
     ) -> Tuple[np.ndarray, np.ndarray]:
-        """Return anomaly_score and anomaly_label (0 normal, 1 anomaly)."""
-        scores = -self.model.score_samples(X.values)  # higher = more anomalous
-        labels = (self.model.predict(X.values) == -1).astype(int)
+        """Return anomaly_score and anomaly_label (0 normal, 1 anomaly).
+
+        Both come from one `score_samples` pass: IsolationForest flags a
+        sample as an outlier exactly when its score is below `offset_`.
+        """
+        raw_scores = self.model.score_samples(np.asarray(X))
+        scores = -raw_scores  # higher = more anomalous
+        labels = (raw_scores < self.model.offset_).astype(int)
         return scores, labels
 
+    def set_n_jobs(self, n_jobs: int) -> None:
+        """Limit the threads used by `fit`/`predict` (-1 uses every core)."""
+        self.model.set_params(n_jobs=n_jobs)
+
     def save(self, path: Path) -> None:
         path = path.resolve()
         path.parent.mkdir(parents=True, exist_ok=True)
@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import joblib
 import numpy as np
 import pandas as pd
 from xgboost import XGBClassifier
 
+from .native_models import load_native, save_native
 from .utils import get_logger
 
 
@@ -15,6 +16,7 @@ logger = get_logger(__name__)
 
 
 RISK_LEVELS = {0: "Low", 1: "Medium", 2: "High"}
+RISK_LEVEL_NAMES = np.array([RISK_LEVELS[label] for label in sorted(RISK_LEVELS)])
 
 
 def efficiency_to_risk_label(efficiency: float) -> int:
@@ -32,6 +34,7 @@ class FailureRiskClassifier:
     def __init__(
         self,
         random_state: int = 42,
+        params: Optional[Dict[str, Any]] = None,
     ) -> None:
         self.model = XGBClassifier(
             n_estimators=200,
@@ -43,36 +46,76 @@ class FailureRiskClassifier:
             random_state=random_state,
             n_jobs=-1,
         )
+        if params:
+            # Overrides, e.g. chosen with `python -m ml.tune`.
+            self.model.set_params(**params)
 
     def fit(self, X: pd.DataFrame, y: pd.Series) -> None:
         logger.info("Training FailureRiskClassifier on X=%s, y=%s", X.shape, y.shape)
-        self.model.fit(X.values, y.values)
+        if set(np.unique(y.values)) == set(RISK_LEVELS):
+            self.model.fit(X.values, y.values)
+            return
+        # XGBClassifier infers the classes from `y`, which fails (or yields
+        # fewer probability columns) when a risk level never occurs, e.g.
+        # in a single inverter's data. Train the booster with every class.
+        import xgboost as xgb
+
+        params = {
+            k: v for k, v in self.model.get_xgb_params().items() if v is not None
+        }
+        params.update(objective="multi:softprob", num_class=len(RISK_LEVELS))
+        booster = xgb.train(
+            params,
+            xgb.DMatrix(X.values, label=y.values),
+            num_boost_round=self.model.get_params()["n_estimators"],
+        )
+        self.model.load_model(bytearray(booster.save_raw("ubj")))
+
+    @property
+    def class_names(self) -> List[str]:
+        return [str(name) for name in RISK_LEVEL_NAMES]
+
+    def predict_proba(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        return self.model.predict_proba(np.asarray(X))
+
+    def predict_with_proba(
+        self, X: Union[pd.DataFrame, np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (labels, probabilities) from a single pass over the trees."""
+        proba = self.predict_proba(X)
+        return np.argmax(proba, axis=1), proba
 
-    def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
-        return self.model.predict_proba(X.values)
+    def predict_label(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        return self.predict_with_proba(X)[0]
 
-    def predict_label(self, X: pd.DataFrame) -> np.ndarray:
-        return self.model.predict(X.values)
+    def predict_risk_level(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        return RISK_LEVEL_NAMES[self.predict_label(X)]
 
-    def predict_risk_level(self, X: pd.DataFrame) -> np.ndarray:
-        labels = self.predict_label(X)
-        vec_map = np.vectorize(lambda idx: RISK_LEVELS.get(int(idx), "Low"))
-        return vec_map(labels)
+    def set_n_jobs(self, n_jobs: int) -> None:
+        """Limit the threads used by `fit`/`predict` (-1 uses every core)."""
+        self.model.set_params(n_jobs=n_jobs)
 
     def save(self, path: Path) -> None:
+        """Write the native XGBoost model (see `ml.native_models`)."""
         path = path.resolve()
         path.parent.mkdir(parents=True, exist_ok=True)
-        joblib.dump(self.model, path)
+        save_native(self.model, path)
         logger.info("Saved classifier model to %s", path)
 
     @classmethod
     def load(cls, path: Path) -> "FailureRiskClassifier":
+        """Load a model written by `save`, or the pickle of the same name
+        that bundles from before the native format hold."""
         path = path.resolve()
+        if not path.exists() and path.with_suffix(".pkl").exists():
+            path = path.with_suffix(".pkl")
         if not path.exists():
             logger.error("Classifier model file not found at %s", path)
             raise FileNotFoundError(f"Classifier model not found: {path}")
-        model = joblib.load(path)
         clf = cls()
-        clf.model = model
+        if path.suffix == ".pkl":
+            clf.model = joblib.load(path)
+        else:
+            load_native(clf.model, path)
         return clf
 
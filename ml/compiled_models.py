@@ -0,0 +1,647 @@
+"""Array-backed tree ensembles for NumPy-only inference.
+
+`ml.train` exports the fitted XGBoost and IsolationForest models (and the
+scaler) into plain arrays: per node a feature index, a threshold, the index
+of its first child, a default direction for missing values and a leaf value.
+This module evaluates those arrays for a whole batch at once by advancing
+every (sample, tree) pair one level per step, so serving needs neither
+xgboost nor scikit-learn.
+
+Each compiled artifact is a directory holding `meta.json` and one `.npy` file
+per array. The arrays are written in the dtypes and form the traversal reads,
+so when loaded with `mmap_mode="r"` inference indexes the mapped pages
+directly: workers share them through the page cache instead of each holding
+a copy.
+A bundle's compiled directory also holds `manifest.json`, which describes
+every array and the feature columns the models expect; loading checks the
+arrays against it. The manifest is written last, so its presence marks a
+complete export.
+
+Tolerances against the original estimators (float32 features):
+- efficiency predictions: abs diff <= 1e-5 (leaf sums are accumulated in
+  float64 here, in float32 by XGBoost)
+- risk probabilities: abs diff <= 1e-6; labels identical except for exact
+  probability ties
+- anomaly scores: abs diff <= 1e-12; labels identical except for scores
+  within that distance of the contamination threshold
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .utils import get_logger
+
+
+logger = get_logger(__name__)
+
+SPLIT_LT = "lt"  # go left when x < threshold (XGBoost)
+SPLIT_LE = "le"  # go left when x <= threshold (scikit-learn)
+
+_ARRAY_NAMES = (
+    "feature",
+    "threshold",
+    "first_child",
+    "default_left",
+    "value",
+    "roots",
+    "group_matrix",
+)
+_CHUNK_ROWS = 1024
+
+MANIFEST_FILE = "manifest.json"
+# Bump when the layout of compiled artifacts changes incompatibly.
+FORMAT_VERSION = 2
+
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """Expected isolation path length of a node holding `n_samples` points."""
+    n = np.asarray(n_samples, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = (
+        2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    )
+    return out
+
+
+class TreeEnsemble:
+    """Flat traversal tables for a set of trees plus the traversal loop.
+
+    Samples at node `i` compare feature `feature[i]` against `threshold[i]`
+    with `split_rule` and go to `first_child[i]` (a global node index) or,
+    going right, the node after it: siblings are stored next to each other,
+    which lets the traversal pick a child with arithmetic instead of a
+    lookup. Missing values go left when `default_left[i]`. Leaves point back
+    to themselves (`first_child[i] == i`), read feature 0 against +inf and
+    have `default_left` set, so every sample at a leaf goes left and stays
+    put. `value[i]` is the leaf value, `roots[t]` the root node of tree `t`
+    and `group_matrix[t, g]` is 1 when tree `t` adds to output column `g`.
+
+    The arrays are used as given, so memory-mapped ones are never copied.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        first_child: np.ndarray,
+        default_left: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        group_matrix: np.ndarray,
+        n_groups: int,
+        max_depth: int,
+        split_rule: str,
+    ) -> None:
+        if split_rule not in (SPLIT_LT, SPLIT_LE):
+            raise ValueError(f"Unknown split rule: {split_rule}")
+        self.feature = feature
+        self.threshold = threshold
+        self.first_child = first_child
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.group_matrix = group_matrix
+        self.n_groups = n_groups
+        self.max_depth = max_depth
+        self.split_rule = split_rule
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_trees(
+        cls,
+        trees: Sequence[Dict[str, np.ndarray]],
+        tree_group: Sequence[int],
+        n_groups: int,
+        split_rule: str,
+    ) -> "TreeEnsemble":
+        """Build the traversal tables from per-tree arrays (local child
+        indices, -1 for leaves).
+
+        Nodes are renumbered breadth-first so siblings are adjacent.
+        """
+        layouts = [_breadth_first(t["left"], t["right"]) for t in trees]
+        offsets = np.cumsum([0] + [len(order) for order, _ in layouts[:-1]])
+        max_depth = 0
+        parts: Dict[str, List[np.ndarray]] = {
+            k: []
+            for k in ("feature", "threshold", "first_child", "default_left", "value")
+        }
+        for offset, tree, (order, depth) in zip(offsets, trees, layouts):
+            left = np.asarray(tree["left"], dtype=np.int64)
+            right = np.asarray(tree["right"], dtype=np.int64)
+            position = np.zeros(len(left), dtype=np.int64)
+            position[order] = np.arange(len(order))
+
+            feature = np.asarray(tree["feature"], dtype=np.int32)[order]
+            is_leaf = feature < 0
+            left = position[np.maximum(left[order], 0)] + offset
+            right = position[np.maximum(right[order], 0)] + offset
+            if not np.array_equal(right[~is_leaf], left[~is_leaf] + 1):
+                raise ValueError("Sibling nodes must be stored consecutively")
+            node = np.arange(len(order)) + offset
+            parts["feature"].append(np.where(is_leaf, 0, feature).astype(np.int32))
+            parts["threshold"].append(
+                np.where(
+                    is_leaf,
+                    np.inf,
+                    np.asarray(tree["threshold"], dtype=np.float64)[order],
+                )
+            )
+            parts["first_child"].append(np.where(is_leaf, node, left))
+            parts["default_left"].append(
+                np.asarray(tree["default_left"], dtype=bool)[order] | is_leaf
+            )
+            parts["value"].append(np.asarray(tree["value"], dtype=np.float64)[order])
+            max_depth = max(max_depth, int(depth[order].max()))
+
+        group_matrix = np.zeros((len(trees), n_groups), dtype=np.float64)
+        group_matrix[np.arange(len(trees)), np.asarray(tree_group)] = 1.0
+        return cls(
+            feature=np.concatenate(parts["feature"]),
+            threshold=np.concatenate(parts["threshold"]),
+            first_child=np.concatenate(parts["first_child"]).astype(np.int32),
+            default_left=np.concatenate(parts["default_left"]),
+            value=np.concatenate(parts["value"]),
+            roots=offsets.astype(np.int32),
+            group_matrix=group_matrix,
+            n_groups=n_groups,
+            max_depth=max_depth,
+            split_rule=split_rule,
+        )
+
+    def leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Return the leaf value reached by every sample in every tree.
+
+        Shape `(n_samples, n_trees)`. All (sample, tree) pairs advance one
+        level per iteration; leaves point back to themselves, so pairs that
+        already reached one stay put.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        flat_x = X.ravel()
+        row_base = (np.arange(n_samples, dtype=np.int64) * n_features)[:, None]
+        has_missing = bool(np.isnan(flat_x).any())
+        node = np.broadcast_to(self.roots, (n_samples, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = flat_x[row_base + self.feature[node]]
+            if self.split_rule == SPLIT_LT:
+                go_right = x >= self.threshold[node]
+            else:
+                go_right = x > self.threshold[node]
+            if has_missing:
+                go_right = np.where(np.isnan(x), ~self.default_left[node], go_right)
+            node = self.first_child[node] + go_right
+        return self.value[node]
+
+    def predict_raw(self, X: np.ndarray) -> np.ndarray:
+        """Sum leaf values per output group: shape `(n_samples, n_groups)`."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f"Expected a 2-D feature matrix, got shape {X.shape}")
+        out = np.empty((X.shape[0], self.n_groups), dtype=np.float64)
+        for start in range(0, X.shape[0], _CHUNK_ROWS):
+            chunk = X[start : start + _CHUNK_ROWS]
+            out[start : start + len(chunk)] = (
+                self.leaf_values(chunk) @ self.group_matrix
+            )
+        return out
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in _ARRAY_NAMES}
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "n_groups": self.n_groups,
+            "max_depth": self.max_depth,
+            "split_rule": self.split_rule,
+        }
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]
+    ) -> "TreeEnsemble":
+        return cls(**{name: arrays[name] for name in _ARRAY_NAMES}, **meta)
+
+
+def _breadth_first(
+    left: np.ndarray, right: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Breadth-first order of the nodes reachable from root 0, and depths."""
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    order = [0]
+    depth = np.zeros(len(left), dtype=np.int64)
+    for node in order:
+        if left[node] >= 0:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+            order.extend((left[node], right[node]))
+    return np.asarray(order, dtype=np.int64), depth
+
+
+# ---------------------------------------------------------------------------
+# Compiled models (duck-type the estimator wrappers used by PredictionService)
+# ---------------------------------------------------------------------------
+
+
+class CompiledScaler:
+    """StandardScaler statistics without scikit-learn."""
+
+    kind = "scaler"
+
+    def __init__(self, mean: Optional[np.ndarray], scale: Optional[np.ndarray]) -> None:
+        self.with_mean = mean is not None
+        self.with_std = scale is not None
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Same arithmetic as `StandardScaler.transform` on float32 input."""
+        X = np.array(X, dtype=np.float32)
+        if self.with_mean:
+            X -= self.mean_.astype(np.float32)
+        if self.with_std:
+            X /= self.scale_.astype(np.float32)
+        return X
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {}
+        if self.with_mean:
+            arrays["mean"] = self.mean_
+        if self.with_std:
+            arrays["scale"] = self.scale_
+        return arrays
+
+    def meta(self) -> Dict[str, Any]:
+        return {}
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]
+    ) -> "CompiledScaler":
+        return cls(arrays.get("mean"), arrays.get("scale"))
+
+
+class CompiledRegressor:
+    """Compiled `EfficiencyRegressor` (XGBoost `reg:squarederror`)."""
+
+    kind = "regressor"
+
+    def __init__(self, ensemble: TreeEnsemble, base_score: np.ndarray) -> None:
+        self.ensemble = ensemble
+        self.base_score = np.asarray(base_score, dtype=np.float64)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return (self.ensemble.predict_raw(X)[:, 0] + self.base_score[0]).astype(
+            np.float32
+        )
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {**self.ensemble.arrays(), "base_score": self.base_score}
+
+    def meta(self) -> Dict[str, Any]:
+        return self.ensemble.meta()
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]
+    ) -> "CompiledRegressor":
+        return cls(TreeEnsemble.from_arrays(arrays, meta), arrays["base_score"])
+
+
+class CompiledClassifier:
+    """Compiled `FailureRiskClassifier` (XGBoost `multi:softprob`)."""
+
+    kind = "classifier"
+
+    def __init__(
+        self,
+        ensemble: TreeEnsemble,
+        base_score: np.ndarray,
+        class_names: Sequence[str],
+    ) -> None:
+        self.ensemble = ensemble
+        self.base_score = np.asarray(base_score, dtype=np.float64)
+        self.class_names = list(class_names)
+        self._class_names = np.asarray(self.class_names)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        margin = self.ensemble.predict_raw(X) + self.base_score
+        margin -= margin.max(axis=1, keepdims=True)
+        proba = np.exp(margin)
+        proba /= proba.sum(axis=1, keepdims=True)
+        return proba.astype(np.float32)
+
+    def predict_with_proba(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (labels, probabilities) from a single pass over the trees."""
+        proba = self.predict_proba(X)
+        return np.argmax(proba, axis=1), proba
+
+    def predict_label(self, X: np.ndarray) -> np.ndarray:
+        return self.predict_with_proba(X)[0]
+
+    def predict_risk_level(self, X: np.ndarray) -> np.ndarray:
+        return self._class_names[self.predict_label(X)]
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {**self.ensemble.arrays(), "base_score": self.base_score}
+
+    def meta(self) -> Dict[str, Any]:
+        return {**self.ensemble.meta(), "class_names": self.class_names}
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]
+    ) -> "CompiledClassifier":
+        meta = dict(meta)
+        class_names = meta.pop("class_names")
+        return cls(
+            TreeEnsemble.from_arrays(arrays, meta), arrays["base_score"], class_names
+        )
+
+
+class CompiledAnomalyDetector:
+    """Compiled `AnomalyDetector` (IsolationForest).
+
+    Leaf values hold the path length credited to a sample ending there
+    (depth plus the expected remaining depth of the leaf's training points),
+    so the per-tree sum is exactly the quantity IsolationForest averages.
+    """
+
+    kind = "anomaly"
+
+    def __init__(
+        self, ensemble: TreeEnsemble, denominator: float, offset: float
+    ) -> None:
+        self.ensemble = ensemble
+        self.denominator = float(denominator)
+        self.offset = float(offset)
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Same as `IsolationForest.score_samples` (lower = more anomalous)."""
+        depths = self.ensemble.predict_raw(X)[:, 0]
+        if self.denominator == 0:
+            return -np.ones_like(depths)
+        return -(2.0 ** (-depths / self.denominator))
+
+    def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return anomaly_score and anomaly_label (0 normal, 1 anomaly)."""
+        raw = self.score_samples(X)
+        return -raw, (raw < self.offset).astype(int)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return self.ensemble.arrays()
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            **self.ensemble.meta(),
+            "denominator": self.denominator,
+            "offset": self.offset,
+        }
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]
+    ) -> "CompiledAnomalyDetector":
+        meta = dict(meta)
+        denominator = meta.pop("denominator")
+        offset = meta.pop("offset")
+        return cls(TreeEnsemble.from_arrays(arrays, meta), denominator, offset)
+
+
+CompiledModel = Union[
+    CompiledScaler, CompiledRegressor, CompiledClassifier, CompiledAnomalyDetector
+]
+
+_KINDS = {
+    cls.kind: cls
+    for cls in (
+        CompiledScaler,
+        CompiledRegressor,
+        CompiledClassifier,
+        CompiledAnomalyDetector,
+    )
+}
+
+
+# ---------------------------------------------------------------------------
+# Export from fitted estimators
+# ---------------------------------------------------------------------------
+
+
+def _parse_base_score(raw: str, n_groups: int) -> np.ndarray:
+    values = [float(v) for v in raw.strip("[]").split(",") if v.strip()]
+    if len(values) == 1 and n_groups > 1:
+        values = values * n_groups
+    return np.asarray(values, dtype=np.float64)
+
+
+def _xgboost_ensemble(xgb_model: Any) -> Tuple[TreeEnsemble, np.ndarray, str]:
+    booster = (
+        xgb_model.get_booster() if hasattr(xgb_model, "get_booster") else xgb_model
+    )
+    learner = json.loads(bytes(booster.save_raw("json")))["learner"]
+    objective = learner["objective"]["name"]
+    params = learner["learner_model_param"]
+    model = learner["gradient_booster"]["model"]
+
+    n_groups = max(int(params.get("num_class", "0")), 1)
+    trees = []
+    for tree in model["trees"]:
+        left = np.asarray(tree["left_children"], dtype=np.int64)
+        trees.append(
+            {
+                "feature": np.where(left < 0, -1, np.asarray(tree["split_indices"])),
+                "threshold": np.asarray(tree["split_conditions"], dtype=np.float32),
+                "left": left,
+                "right": np.asarray(tree["right_children"], dtype=np.int64),
+                "default_left": np.asarray(tree["default_left"], dtype=bool),
+                # XGBoost keeps leaf values in split_conditions.
+                "value": np.where(
+                    left < 0,
+                    np.asarray(tree["split_conditions"], dtype=np.float32),
+                    0.0,
+                ),
+            }
+        )
+    ensemble = TreeEnsemble.from_trees(trees, model["tree_info"], n_groups, SPLIT_LT)
+    return ensemble, _parse_base_score(params["base_score"], n_groups), objective
+
+
+def compile_xgboost_regressor(xgb_model: Any) -> CompiledRegressor:
+    ensemble, base_score, objective = _xgboost_ensemble(xgb_model)
+    if objective != "reg:squarederror":
+        raise ValueError(f"Unsupported regression objective: {objective}")
+    return CompiledRegressor(ensemble, base_score)
+
+
+def compile_xgboost_classifier(
+    xgb_model: Any, class_names: Sequence[str]
+) -> CompiledClassifier:
+    ensemble, base_score, objective = _xgboost_ensemble(xgb_model)
+    if objective != "multi:softprob":
+        raise ValueError(f"Unsupported classification objective: {objective}")
+    return CompiledClassifier(ensemble, base_score, class_names)
+
+
+def compile_isolation_forest(iforest: Any) -> CompiledAnomalyDetector:
+    trees = []
+    for estimator, features in zip(iforest.estimators_, iforest.estimators_features_):
+        tree = estimator.tree_
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        is_leaf = left < 0
+        _, depth = _breadth_first(left, right)
+        # Nodes on the path (depth + 1) plus the expected remaining path
+        # length of the leaf's training points, minus one.
+        path_length = depth + _average_path_length(tree.n_node_samples)
+        features = np.asarray(features)
+        trees.append(
+            {
+                "feature": np.where(is_leaf, -1, features[np.maximum(tree.feature, 0)]),
+                "threshold": tree.threshold,
+                "left": left,
+                "right": right,
+                "default_left": np.zeros(tree.node_count, dtype=bool),
+                "value": np.where(is_leaf, path_length, 0.0),
+            }
+        )
+    ensemble = TreeEnsemble.from_trees(trees, [0] * len(trees), 1, SPLIT_LE)
+    denominator = len(trees) * float(_average_path_length([iforest.max_samples_])[0])
+    return CompiledAnomalyDetector(ensemble, denominator, iforest.offset_)
+
+
+def compile_scaler(scaler: Any) -> CompiledScaler:
+    return CompiledScaler(
+        np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else None,
+        np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else None,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Persistence
+# ---------------------------------------------------------------------------
+
+
+def save_compiled(model: CompiledModel, path: Path) -> None:
+    """Write `meta.json` plus one `.npy` per array into directory `path`.
+
+    Arrays of an earlier export to `path` that this model does not have are
+    removed.
+    """
+    path = path.resolve()
+    path.mkdir(parents=True, exist_ok=True)
+    arrays = model.arrays()
+    for stale in path.glob("*.npy"):
+        if stale.stem not in arrays:
+            stale.unlink()
+    for name, array in arrays.items():
+        np.save(path / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+    meta = {"kind": model.kind, "arrays": sorted(arrays), **model.meta()}
+    (path / "meta.json").write_text(json.dumps(meta, indent=2))
+    logger.info("Saved compiled %s model to %s", model.kind, path)
+
+
+def write_compiled_manifest(directory: Path, feature_columns: Sequence[str]) -> None:
+    """Describe the compiled models saved under `directory`.
+
+    Lists each model's kind and the dtype and shape of its arrays, and the
+    feature columns in the order the models expect. Call after every model
+    is saved.
+    """
+    import xgboost
+
+    models: Dict[str, Any] = {}
+    for meta_path in sorted(directory.glob("*/meta.json")):
+        meta = json.loads(meta_path.read_text())
+        arrays = {}
+        for name in meta["arrays"]:
+            array = np.load(meta_path.parent / f"{name}.npy", mmap_mode="r")
+            arrays[name] = {"dtype": str(array.dtype), "shape": list(array.shape)}
+        models[meta_path.parent.name] = {"kind": meta["kind"], "arrays": arrays}
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "feature_columns": list(feature_columns),
+        "models": models,
+        "numpy_version": np.__version__,
+        "xgboost_version": xgboost.__version__,
+    }
+    (directory / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+
+
+def read_compiled_manifest(
+    directory: Path, feature_columns: Sequence[str]
+) -> Dict[str, Any]:
+    """The manifest under `directory`.
+
+    Raises ValueError if there is none (an export older than the manifest),
+    if it was written in another format version, or for different feature
+    columns than `feature_columns`. Older exports are rewritten with
+    `python -m ml.train --compile-only`.
+    """
+    path = directory / MANIFEST_FILE
+    if not path.exists():
+        raise ValueError(
+            f"Compiled models in {directory} have no {MANIFEST_FILE}; "
+            "re-export them with `python -m ml.train --compile-only`"
+        )
+    manifest = json.loads(path.read_text())
+    if manifest["format_version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Compiled models in {directory} use format "
+            f"{manifest['format_version']}; this version reads {FORMAT_VERSION} "
+            "(re-export them with `python -m ml.train --compile-only`)"
+        )
+    if manifest["feature_columns"] != list(feature_columns):
+        raise ValueError(
+            f"Compiled models in {directory} expect features "
+            f"{manifest['feature_columns']}, not {list(feature_columns)}"
+        )
+    return manifest
+
+
+def load_compiled(
+    path: Path,
+    mmap_mode: Optional[str] = None,
+    expected: Optional[Dict[str, Any]] = None,
+) -> CompiledModel:
+    """Load a directory written by `save_compiled`.
+
+    `expected` is the model's entry in the manifest; the model kind and
+    every array's dtype and shape must match it, or ValueError is raised
+    (e.g. for an array rewritten after the export).
+    """
+    path = path.resolve()
+    meta_path = path / "meta.json"
+    if not meta_path.exists():
+        logger.error("Compiled model not found at %s", path)
+        raise FileNotFoundError(f"Compiled model not found: {path}")
+    meta = json.loads(meta_path.read_text())
+    kind = meta.pop("kind")
+    arrays = {
+        name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+        for name in meta.pop("arrays")
+    }
+    if expected is not None:
+        found = {
+            "kind": kind,
+            "arrays": {
+                name: {"dtype": str(array.dtype), "shape": list(array.shape)}
+                for name, array in arrays.items()
+            },
+        }
+        if found != {"kind": expected["kind"], "arrays": expected["arrays"]}:
+            raise ValueError(
+                f"Compiled model at {path} does not match its manifest: "
+                f"expected {expected}, found {found}"
+            )
+    return _KINDS[kind].from_arrays(arrays, meta)
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import csv
 from pathlib import Path
-from typing import Union
+from typing import IO, Dict, Iterator, List, Optional, Tuple, Union
 
 import pandas as pd
+from pandas.api.types import union_categoricals
 
 from .utils import get_logger
 
@@ -12,6 +14,22 @@ logger = get_logger(__name__)
 
 PathLike = Union[str, Path]
 
+KEY_COLUMNS = ["DATE_TIME", "SOURCE_KEY"]
+# Explicit narrow dtypes for chunked loading; other columns are inferred.
+CSV_DTYPES: Dict[str, str] = {
+    "SOURCE_KEY": "str",
+    "DC_POWER": "float32",
+    "AC_POWER": "float32",
+    "AMBIENT_TEMPERATURE": "float32",
+    "MODULE_TEMPERATURE": "float32",
+    "IRRADIATION": "float32",
+}
+# Rows the streaming loader holds back while their inverter has had no valid
+# value in some column yet (see `_GroupFillState`).
+MAX_PENDING_ROWS = 1_000_000
+# Bytes read per step when scanning a CSV backwards for a timestamp.
+_SCAN_BLOCK = 1 << 16
+
 
 def _validate_path(path: PathLike) -> Path:
     p = Path(path).expanduser().resolve()
@@ -24,9 +42,26 @@ def _validate_path(path: PathLike) -> Path:
     return p
 
 
+def _fill_by_source_key(df: pd.DataFrame) -> pd.DataFrame:
+    """Forward- then backward-fill every column within each `SOURCE_KEY`.
+
+    Same result as ``groupby("SOURCE_KEY").apply(lambda g: g.ffill().bfill())``
+    on a frame sorted by `SOURCE_KEY`, without a Python call and a copy per
+    inverter.
+    """
+    columns = [column for column in df.columns if column != "SOURCE_KEY"]
+    keys = df["SOURCE_KEY"]
+    filled = df.groupby(keys, sort=False, observed=True)[columns].ffill()
+    filled = filled.groupby(keys, sort=False, observed=True).bfill()
+    filled.insert(df.columns.get_loc("SOURCE_KEY"), "SOURCE_KEY", keys)
+    return filled
+
+
 def load_generation_and_weather(
     generation_csv: PathLike,
     weather_csv: PathLike,
+    chunksize: Optional[int] = None,
+    offsets: Optional[Tuple[int, int]] = None,
 ) -> pd.DataFrame:
     """Load and merge generation + weather CSVs.
 
@@ -35,7 +70,23 @@ def load_generation_and_weather(
     - Merges on [`DATE_TIME`, `SOURCE_KEY`]
     - Sorts chronologically within each `SOURCE_KEY`
     - Handles missing values with forward/backward fill and final dropna
+
+    With `chunksize`, both files are streamed instead (see
+    `iter_generation_and_weather`) and the result uses narrow dtypes:
+    categorical `SOURCE_KEY` and float32 measurements. Only the compact
+    result and one chunk of each file are in memory at a time. Both files
+    must then be sorted by `DATE_TIME`, and `offsets` may resume both
+    from a previous run (see `csv_resume_offsets`).
     """
+    if chunksize is not None:
+        return _collect_chunks(
+            iter_generation_and_weather(
+                generation_csv, weather_csv, chunksize, offsets=offsets
+            )
+        )
+    if offsets is not None:
+        raise ValueError("offsets require chunked loading (chunksize)")
+
     gen_path = _validate_path(generation_csv)
     weather_path = _validate_path(weather_csv)
 
@@ -69,13 +120,332 @@ def load_generation_and_weather(
 
     # Handle missing values conservatively
     logger.info("Handling missing values with group-wise forward/backward fill")
-    df = (
-        df.groupby("SOURCE_KEY")
-        .apply(lambda g: g.ffill().bfill())
-        .reset_index(drop=True)
-    )
+    df = _fill_by_source_key(df)
     df = df.dropna().reset_index(drop=True)
 
     logger.info("Data loading completed with %d rows and %d columns", df.shape[0], df.shape[1])
     return df
 
+
+class _TimeOrderedCsv:
+    """Buffered chunk reader for a CSV sorted by `DATE_TIME`.
+
+    With `offset` (the start of a row, see `csv_resume_offsets`) only the
+    rows from there on are read.
+    """
+
+    def __init__(self, path: Path, chunksize: int, offset: int = 0) -> None:
+        self.path = path
+        self._handle: Optional[IO[bytes]] = None
+        if offset:
+            self._handle = open(path, "rb")
+            names = next(csv.reader([self._handle.readline().decode()]))
+            self._handle.seek(offset)
+            source: Union[Path, IO[bytes]] = self._handle
+        else:
+            names = None
+            source = path
+        self._reader = pd.read_csv(
+            source,
+            header=None if offset else "infer",
+            names=names,
+            parse_dates=["DATE_TIME"],
+            dtype=CSV_DTYPES,
+            chunksize=chunksize,
+        )
+        self.buffer: Optional[pd.DataFrame] = None
+        self.last_time: Optional[pd.Timestamp] = None
+        self.exhausted = False
+
+    def read(self) -> None:
+        try:
+            chunk = next(self._reader)
+        except StopIteration:
+            self.exhausted = True
+            if self._handle is not None:
+                self._handle.close()
+            return
+        if "SOURCE_KEY" not in chunk.columns:
+            logger.error("SOURCE_KEY column missing from %s", self.path)
+            raise KeyError("Both CSVs must contain SOURCE_KEY column")
+        if chunk.empty:
+            return
+        times = chunk["DATE_TIME"]
+        if not times.is_monotonic_increasing or (
+            self.last_time is not None and times.iloc[0] < self.last_time
+        ):
+            logger.error("%s is not sorted by DATE_TIME", self.path)
+            raise ValueError(
+                f"Chunked loading requires CSVs sorted by DATE_TIME: {self.path}"
+            )
+        self.last_time = times.iloc[-1]
+        self.buffer = (
+            chunk if self.buffer is None else pd.concat([self.buffer, chunk])
+        )
+
+    def take_before(self, boundary: Optional[pd.Timestamp]) -> Optional[pd.DataFrame]:
+        """Remove and return buffered rows with `DATE_TIME < boundary`
+        (all rows if `boundary` is None)."""
+        if self.buffer is None:
+            return None
+        if boundary is None:
+            taken, self.buffer = self.buffer, None
+            return taken
+        split = int(self.buffer["DATE_TIME"].searchsorted(boundary, side="left"))
+        taken = self.buffer.iloc[:split]
+        self.buffer = self.buffer.iloc[split:]
+        return taken
+
+
+class _GroupFillState:
+    """Per-inverter ffill/bfill state carried between merged windows.
+
+    `carry` holds each inverter's last valid value per column, so the next
+    window is forward-filled as if the whole history were present. Rows
+    that still have a missing value after filling belong to an inverter
+    that has had no valid value in some column yet; such an inverter's rows
+    are all held back in `pending` until a later window back-fills them,
+    or dropped at the end, as the in-memory `dropna` would.
+
+    An inverter whose column never gets a valid value would be held back
+    for the whole file, so `pending` keeps at most `max_pending` rows; past
+    that the oldest held rows are dropped early and counted in `dropped`.
+    The newer rows they were held with still back-fill from the same value.
+    """
+
+    _CARRY = "__carry__"
+
+    def __init__(self, max_pending: int = MAX_PENDING_ROWS) -> None:
+        if max_pending < 0:
+            raise ValueError("max_pending must be >= 0")
+        self.max_pending = max_pending
+        self.carry: Optional[pd.DataFrame] = None
+        self.pending: Optional[pd.DataFrame] = None
+        self.dropped = 0
+
+    def fill(self, window: Optional[pd.DataFrame], final: bool) -> pd.DataFrame:
+        if window is None and not final:
+            return pd.DataFrame()
+        parts: List[pd.DataFrame] = []
+        keys_in_window = (
+            pd.Index(window["SOURCE_KEY"].unique()) if window is not None else None
+        )
+        if self.carry is not None and keys_in_window is not None:
+            carried = self.carry[self.carry["SOURCE_KEY"].isin(keys_in_window)]
+            if self.pending is not None:
+                pending_keys = self.pending["SOURCE_KEY"]
+                carried = carried[~carried["SOURCE_KEY"].isin(pending_keys)]
+            parts.append(carried.assign(**{self._CARRY: True}))
+        if self.pending is not None:
+            parts.append(self.pending.assign(**{self._CARRY: False}))
+        if window is not None:
+            parts.append(window.assign(**{self._CARRY: False}))
+        if not parts:
+            return pd.DataFrame()
+
+        frame = pd.concat(parts, ignore_index=True)
+        is_carry = frame.pop(self._CARRY).to_numpy(dtype=bool)
+        keys = frame["SOURCE_KEY"]
+        columns = [column for column in frame.columns if column != "SOURCE_KEY"]
+
+        forward = frame.groupby(keys, sort=False)[columns].ffill()
+        forward.insert(frame.columns.get_loc("SOURCE_KEY"), "SOURCE_KEY", keys)
+        last = forward[~is_carry].drop_duplicates("SOURCE_KEY", keep="last")
+        if self.carry is None:
+            self.carry = last.reset_index(drop=True)
+        else:
+            self.carry = (
+                pd.concat([self.carry, last], ignore_index=True)
+                .drop_duplicates("SOURCE_KEY", keep="last")
+                .reset_index(drop=True)
+            )
+
+        filled = forward.groupby(keys, sort=False)[columns].bfill()
+        filled.insert(frame.columns.get_loc("SOURCE_KEY"), "SOURCE_KEY", keys)
+        complete = filled.notna().all(axis=1).to_numpy()
+        self.pending = None
+        if not final:
+            held = ~is_carry & ~complete
+            if held.any():
+                self.pending = self._bounded(frame[held])
+        return filled[~is_carry & complete]
+
+    def _bounded(self, held: pd.DataFrame) -> pd.DataFrame:
+        excess = len(held) - self.max_pending
+        if excess > 0:
+            if not self.dropped:
+                logger.warning(
+                    "More than %d rows are waiting for a first valid value; "
+                    "dropping the oldest",
+                    self.max_pending,
+                )
+            self.dropped += excess
+            # Rows are in time order: pending first, then the new window.
+            held = held.iloc[excess:]
+        return held.reset_index(drop=True)
+
+
+def iter_generation_and_weather(
+    generation_csv: PathLike,
+    weather_csv: PathLike,
+    chunksize: int = 1_000_000,
+    max_pending_rows: int = MAX_PENDING_ROWS,
+    offsets: Optional[Tuple[int, int]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Stream the merged, gap-filled rows of `load_generation_and_weather`.
+
+    Both CSVs must be sorted by `DATE_TIME`. They are read `chunksize` rows
+    at a time with the narrow `CSV_DTYPES`; rows are merged once every
+    reading of their timestamp has been read from both files, and
+    forward/backward-filled per `SOURCE_KEY` across chunk boundaries.
+    Yields frames in time order with a categorical `SOURCE_KEY`; together
+    they hold the same rows and values as the in-memory loader (before its
+    final sort by `SOURCE_KEY`), except that at most `max_pending_rows`
+    rows waiting for an inverter's first valid value are held back; older
+    ones are dropped and counted in a warning.
+
+    `offsets` (from `csv_resume_offsets`) skips the rows of each file
+    before them, so only readings appended since are loaded.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be >= 1")
+    gen_offset, weather_offset = offsets or (0, 0)
+    gen = _TimeOrderedCsv(_validate_path(generation_csv), chunksize, gen_offset)
+    weather = _TimeOrderedCsv(_validate_path(weather_csv), chunksize, weather_offset)
+    logger.info(
+        "Streaming %s and %s in chunks of %d rows",
+        gen.path,
+        weather.path,
+        chunksize,
+    )
+    state = _GroupFillState(max_pending_rows)
+    gen.read()
+    weather.read()
+    while True:
+        open_streams = [s for s in (gen, weather) if not s.exhausted]
+        final = not open_streams
+        # Rows strictly before the earliest last-read timestamp of any
+        # unfinished stream can no longer gain merge partners.
+        last_times = [s.last_time for s in open_streams]
+        boundary = None if final or None in last_times else min(last_times)
+        if final or boundary is not None:
+            gen_rows = gen.take_before(boundary)
+            weather_rows = weather.take_before(boundary)
+            window = None
+            if gen_rows is not None and weather_rows is not None:
+                window = pd.merge(
+                    gen_rows,
+                    weather_rows,
+                    on=KEY_COLUMNS,
+                    how="inner",
+                    suffixes=("_gen", "_weather"),
+                )
+                if window.empty:
+                    window = None
+            filled = state.fill(window, final)
+            if not filled.empty:
+                filled = filled.reset_index(drop=True)
+                filled["SOURCE_KEY"] = filled["SOURCE_KEY"].astype("category")
+                yield filled
+        if final:
+            if state.dropped:
+                logger.warning(
+                    "Dropped %d rows of inverters with no valid value in some "
+                    "column (limit %d pending rows)",
+                    state.dropped,
+                    max_pending_rows,
+                )
+            return
+        # Advance whichever stream limits the boundary.
+        for stream in open_streams:
+            if stream.last_time is None or stream.last_time == boundary:
+                stream.read()
+
+
+def _collect_chunks(chunks: Iterator[pd.DataFrame]) -> pd.DataFrame:
+    frames: List[pd.DataFrame] = []
+    keys = []
+    key_position = 0
+    for chunk in chunks:
+        key_position = chunk.columns.get_loc("SOURCE_KEY")
+        keys.append(chunk.pop("SOURCE_KEY"))
+        frames.append(chunk)
+    if not frames:
+        logger.error("Merged dataframe is empty after join on DATE_TIME and SOURCE_KEY")
+        raise ValueError("Merged dataframe is empty. Check DATE_TIME and SOURCE_KEY alignment.")
+
+    df = pd.concat(frames, ignore_index=True)
+    df.insert(
+        key_position, "SOURCE_KEY", union_categoricals(keys, sort_categories=True)
+    )
+    # Sorted categories make the sort lexicographic, as for string keys.
+    df = df.sort_values(["SOURCE_KEY", "DATE_TIME"]).reset_index(drop=True)
+    logger.info(
+        "Data loading completed with %d rows and %d columns (%.1f MB)",
+        df.shape[0],
+        df.shape[1],
+        df.memory_usage(deep=True).sum() / 2**20,
+    )
+    return df
+
+
+def _rows_backwards(path: Path, end: int) -> Iterator[Tuple[int, pd.Timestamp]]:
+    """Yield `(offset, DATE_TIME)` of the complete rows in the first `end`
+    bytes of a CSV, last row first. A row not ended by a newline at `end`
+    may still be being written and is skipped."""
+    with open(path, "rb") as handle:
+        header = handle.readline()
+        column = next(csv.reader([header.decode()])).index("DATE_TIME")
+        data_start = handle.tell()
+        position = end
+        carry = b""  # start of the row that ends the previous block
+        skip_last = True
+        while position > data_start:
+            block_start = max(data_start, position - _SCAN_BLOCK)
+            handle.seek(block_start)
+            data = handle.read(position - block_start) + carry
+            rows = data.split(b"\n")
+            # The first piece may be the end of a row that starts earlier.
+            carry = rows.pop(0) if block_start > data_start else b""
+            row_end = block_start + len(data)
+            for row in reversed(rows):
+                row_start = row_end - len(row)
+                row_end = row_start - 1
+                if skip_last:
+                    skip_last = False
+                elif row.strip():
+                    fields = next(csv.reader([row.decode()]))
+                    yield row_start, pd.Timestamp(fields[column])
+            position = block_start
+
+
+def csv_resume_offsets(
+    generation_csv: PathLike,
+    weather_csv: PathLike,
+    sizes: Tuple[int, int],
+) -> Tuple[int, int]:
+    """Where a later chunked load of both CSVs can resume after reading
+    their first `sizes` bytes (see `iter_generation_and_weather`).
+
+    Both files must be sorted by `DATE_TIME` and only ever appended to.
+    The offsets are the first rows at or after the last timestamp both
+    files had reached, so no row that can still gain a merge partner is
+    skipped; rows read again must be dropped by the caller.
+    """
+    paths = (_validate_path(generation_csv), _validate_path(weather_csv))
+    last_times = []
+    for path, size in zip(paths, sizes):
+        last = next(_rows_backwards(path, size), None)
+        if last is None:
+            return (0, 0)
+        last_times.append(last[1])
+    resume = min(last_times)
+    offsets = []
+    for path, size in zip(paths, sizes):
+        offset = 0
+        for start, time in _rows_backwards(path, size):
+            if time < resume:
+                break
+            offset = start
+        offsets.append(offset)
+    return offsets[0], offsets[1]
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .feature_engineering import FEATURE_VERSION, ROLLING_WINDOW
+from .utils import get_logger
+
+
+logger = get_logger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+CACHE_DIR = Path(os.environ.get("SOLARA_DATASET_CACHE_DIR", ROOT / ".dataset_cache"))
+MANIFEST = "manifest.json"
+# (path, size, mtime) -> content digest, so unchanged inputs are not re-read.
+DIGEST_MEMO = "file_digests.json"
+KEEP_DATASETS = 3
+
+_memo_lock = threading.Lock()
+
+
+def file_digest(path: Path, cache_dir: Path = CACHE_DIR) -> str:
+    """Content hash of `path`, memoized by its size and mtime."""
+    path = Path(path).resolve()
+    st = path.stat()
+    memo_key = f"{path}:{st.st_size}:{st.st_mtime_ns}"
+    memo_path = cache_dir / DIGEST_MEMO
+    with _memo_lock:
+        try:
+            memo = json.loads(memo_path.read_text())
+        except (FileNotFoundError, ValueError):
+            memo = {}
+        if memo_key in memo:
+            return memo[memo_key]
+
+    start = time.perf_counter()
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(8 * 1024 * 1024), b""):
+            digest.update(block)
+    value = digest.hexdigest()
+    logger.info(
+        "Hashed %s (%.1f MB) in %.2f s",
+        path,
+        st.st_size / 2**20,
+        time.perf_counter() - start,
+    )
+
+    with _memo_lock:
+        try:
+            memo = json.loads(memo_path.read_text())
+        except (FileNotFoundError, ValueError):
+            memo = {}
+        memo = {k: v for k, v in memo.items() if not k.startswith(f"{path}:")}
+        memo[memo_key] = value
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = memo_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(memo, indent=2))
+        os.replace(tmp, memo_path)
+    return value
+
+
+def dataset_key(
+    generation_csv: Path,
+    weather_csv: Path,
+    chunksize: Optional[int] = None,
+    cache_dir: Path = CACHE_DIR,
+) -> str:
+    """Cache key for `build_dataset` on these inputs.
+
+    Covers the content of both CSVs, `FEATURE_VERSION`, the rolling window
+    and whether the chunked (float32) loader is used.
+    """
+    parts = {
+        "generation": file_digest(generation_csv, cache_dir),
+        "weather": file_digest(weather_csv, cache_dir),
+        "feature_version": FEATURE_VERSION,
+        "rolling_window": ROLLING_WINDOW,
+        "chunked": chunksize is not None,
+    }
+    return hashlib.blake2b(
+        json.dumps(parts, sort_keys=True).encode(), digest_size=12
+    ).hexdigest()
+
+
+def save_dataset(df: pd.DataFrame, path: Path, meta: Optional[Dict] = None) -> None:
+    """Write `df` as one `.npy` per column plus `manifest.json`.
+
+    String columns are stored as integer codes with their categories in the
+    manifest; categorical columns stay categorical on load. The directory
+    appears atomically, so a crashed write is never picked up.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    columns: List[Dict[str, Any]] = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        entry: Dict[str, Any] = {"name": name, "file": f"{i:03d}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.cat.codes.to_numpy()
+            entry.update(kind="categorical", categories=series.cat.categories.tolist())
+        elif series.dtype == object:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            values = codes.astype(np.int32)
+            entry.update(kind="object", categories=[str(u) for u in uniques])
+        else:
+            values = series.to_numpy()
+            entry.update(kind="array")
+        np.save(tmp / entry["file"], np.ascontiguousarray(values), allow_pickle=False)
+        columns.append(entry)
+
+    manifest = {"rows": len(df), "columns": columns, **(meta or {})}
+    (tmp / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    try:
+        os.replace(tmp, path)
+    except OSError:  # another run wrote it first
+        shutil.rmtree(tmp, ignore_errors=True)
+    logger.info("Cached dataset (%d rows) to %s", len(df), path)
+
+
+def load_dataset(path: Path, mmap: bool = True) -> pd.DataFrame:
+    """Load a directory written by `save_dataset`."""
+    path = Path(path)
+    manifest = json.loads((path / MANIFEST).read_text())
+    data: Dict[str, Any] = {}
+    for entry in manifest["columns"]:
+        values = np.load(
+            path / entry["file"], mmap_mode="r" if mmap else None, allow_pickle=False
+        )
+        kind = entry["kind"]
+        if kind == "categorical":
+            data[entry["name"]] = pd.Categorical.from_codes(
+                values, categories=entry["categories"]
+            )
+        elif kind == "object":
+            lookup = np.asarray(entry["categories"] + [np.nan], dtype=object)
+            data[entry["name"]] = lookup[values]
+        else:
+            data[entry["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _prune(cache_dir: Path, keep: int) -> None:
+    entries = sorted(
+        (p for p in cache_dir.iterdir() if (p / MANIFEST).exists()),
+        key=lambda p: (p / MANIFEST).stat().st_mtime,
+    )
+    for stale in entries[: max(0, len(entries) - keep)]:
+        shutil.rmtree(stale, ignore_errors=True)
+        logger.info("Removed stale cached dataset %s", stale)
+
+
+def cached_dataset(
+    build: Callable[[], pd.DataFrame],
+    generation_csv: Path,
+    weather_csv: Path,
+    chunksize: Optional[int] = None,
+    cache_dir: Path = CACHE_DIR,
+    refresh: bool = False,
+) -> pd.DataFrame:
+    """Return `build()`'s dataset from the cache, building and caching it on
+    a miss (or when `refresh`)."""
+    key = dataset_key(generation_csv, weather_csv, chunksize, cache_dir)
+    path = cache_dir / key
+    if not refresh and (path / MANIFEST).exists():
+        start = time.perf_counter()
+        df = load_dataset(path)
+        (path / MANIFEST).touch()  # keep recently used entries on prune
+        logger.info(
+            "Loaded cached dataset %s (%d rows) in %.2f s",
+            key,
+            len(df),
+            time.perf_counter() - start,
+        )
+        return df
+
+    logger.info("Dataset cache miss for %s; building", key)
+    df = build()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    if refresh:
+        shutil.rmtree(path, ignore_errors=True)
+    save_dataset(
+        df,
+        path,
+        meta={
+            "feature_version": FEATURE_VERSION,
+            "generation_csv": str(generation_csv),
+            "weather_csv": str(weather_csv),
+            "chunksize": chunksize,
+        },
+    )
+    _prune(cache_dir, KEEP_DATASETS)
+    return df
@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import joblib
 import numpy as np
 import pandas as pd
 from xgboost import XGBRegressor
 
+from .native_models import load_native, save_native
 from .utils import get_logger
 
 
@@ -23,6 +24,7 @@ class EfficiencyRegressor:
         learning_rate: float = 0.05,
         max_depth: int = 6,
         random_state: int = 42,
+        params: Optional[Dict[str, Any]] = None,
     ) -> None:
         self.model = XGBRegressor(
             n_estimators=n_estimators,
@@ -32,6 +34,9 @@ class EfficiencyRegressor:
             objective="reg:squarederror",
             n_jobs=-1,
         )
+        if params:
+            # Overrides, e.g. chosen with `python -m ml.tune`.
+            self.model.set_params(**params)
 
     def fit(
         self,
@@ -41,23 +46,34 @@ class EfficiencyRegressor:
         logger.info("Training EfficiencyRegressor on X=%s, y=%s", X.shape, y.shape)
         self.model.fit(X.values, y.values)
 
-    def predict(self, X: pd.DataFrame) -> np.ndarray:
-        return self.model.predict(X.values)
+    def predict(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        return self.model.predict(np.asarray(X))
+
+    def set_n_jobs(self, n_jobs: int) -> None:
+        """Limit the threads used by `fit`/`predict` (-1 uses every core)."""
+        self.model.set_params(n_jobs=n_jobs)
 
     def save(self, path: Path) -> None:
+        """Write the native XGBoost model (see `ml.native_models`)."""
         path = path.resolve()
         path.parent.mkdir(parents=True, exist_ok=True)
-        joblib.dump(self.model, path)
+        save_native(self.model, path)
         logger.info("Saved efficiency model to %s", path)
 
     @classmethod
     def load(cls, path: Path) -> "EfficiencyRegressor":
+        """Load a model written by `save`, or the pickle of the same name
+        that bundles from before the native format hold."""
         path = path.resolve()
+        if not path.exists() and path.with_suffix(".pkl").exists():
+            path = path.with_suffix(".pkl")
         if not path.exists():
             logger.error("Efficiency model file not found at %s", path)
             raise FileNotFoundError(f"Efficiency model not found: {path}")
-        model = joblib.load(path)
         reg = cls()
-        reg.model = model
+        if path.suffix == ".pkl":
+            reg.model = joblib.load(path)
+        else:
+            load_native(reg.model, path)
         return reg
 
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
-from typing import List
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 import numpy as np
-import pandas as pd
 
 from .utils import get_logger
 
 
+if TYPE_CHECKING:  # only the DataFrame pipeline needs pandas; serving doesn't
+    import pandas as pd
+
+
 logger = get_logger(__name__)
 
 
@@ -25,14 +28,88 @@ FEATURE_COLUMNS: List[str] = [
     "rolling_temp_mean",
 ]
 
+EPS = 1e-6
+ROLLING_WINDOW = 4
+# Bump whenever loading, cleaning or feature engineering changes its output,
+# so cached training datasets (see `ml.dataset_cache`) are rebuilt.
+FEATURE_VERSION = 1
+
+
+def _group_positions(keys: pd.Series) -> np.ndarray:
+    """Position of each row within its run of equal `keys` (0, 1, 2, ...).
 
-def add_engineered_features(df: pd.DataFrame) -> pd.DataFrame:
+    `keys` must be sorted so that each group is contiguous.
+    """
+    import pandas as pd
+
+    codes = pd.factorize(keys, sort=False)[0]
+    n = len(codes)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    return np.arange(n, dtype=np.int64) - np.repeat(starts, lengths)
+
+
+def rolling_mean_std(
+    values: np.ndarray,
+    group_pos: np.ndarray,
+    window: int,
+    with_std: bool = True,
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Trailing rolling mean and sample std within contiguous groups.
+
+    Matches ``groupby(...).rolling(window, min_periods=1)`` followed by
+    ``.mean()`` and ``.std().fillna(0.0)``: NaNs are skipped, a window with no
+    values has mean NaN, and the std of fewer than two values is 0.
+    `group_pos` is each row's position within its group (see
+    `_group_positions`), so windows never cross a group boundary.
+
+    Each window is summed directly from its `window` shifted neighbours
+    (O(n * window), no running sums), so there is no error accumulation
+    along long series; results agree with pandas to ~1e-12 relative.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(x)
+    x0 = np.where(valid, x, 0.0)
+
+    total = x0.copy()
+    count = valid.astype(np.int64)
+    for k in range(1, window):
+        in_window = (group_pos[k:] >= k) & valid[:-k]
+        total[k:] += np.where(in_window, x0[:-k], 0.0)
+        count[k:] += in_window
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+    if not with_std:
+        return mean, None
+
+    # Two-pass: squared deviations from each window's own mean.
+    sq_dev = np.where(valid, (x0 - mean) ** 2, 0.0)
+    for k in range(1, window):
+        in_window = (group_pos[k:] >= k) & valid[:-k]
+        sq_dev[k:] += np.where(in_window, (x0[:-k] - mean[k:]) ** 2, 0.0)
+    std = np.zeros_like(mean)
+    enough = count >= 2
+    std[enough] = np.sqrt(sq_dev[enough] / (count[enough] - 1))
+    return mean, std
+
+
+def add_engineered_features(
+    df: pd.DataFrame,
+    window: int = ROLLING_WINDOW,
+) -> pd.DataFrame:
     """Add domain-specific and rolling features.
 
+    Rolling features are computed over the last `window` readings of each
+    inverter (`min_periods=1`). Models are trained and served with
+    `ROLLING_WINDOW`; pass the same `window` to `RollingFeatureStore` if you
+    change it.
+
     Assumes:
     - Columns: DC_POWER, AC_POWER, AMBIENT_TEMPERATURE,
       MODULE_TEMPERATURE, IRRADIATION, SOURCE_KEY, DATE_TIME
     """
+    if window < 1:
+        raise ValueError("window must be >= 1")
     required_cols = {
         "DC_POWER",
         "AC_POWER",
@@ -47,11 +124,11 @@ def add_engineered_features(df: pd.DataFrame) -> pd.DataFrame:
         logger.error("Missing required columns for feature engineering: %s", missing)
         raise KeyError(f"Missing required columns for feature engineering: {missing}")
 
-    df = df.copy()
-    df = df.sort_values(["SOURCE_KEY", "DATE_TIME"]).reset_index(drop=True)
+    # sort_values returns a new frame, so the caller's frame is untouched.
+    df = df.sort_values(["SOURCE_KEY", "DATE_TIME"], ignore_index=True)
 
     # Basic engineered features
-    eps = 1e-6
+    eps = EPS
     # Efficiency: AC output per unit irradiation (avoid division by zero)
     df["efficiency"] = df["AC_POWER"] / np.clip(df["IRRADIATION"], eps, None)
 
@@ -61,23 +138,28 @@ def add_engineered_features(df: pd.DataFrame) -> pd.DataFrame:
     # DC/AC ratio: DC input relative to AC output
     df["dc_ac_ratio"] = df["DC_POWER"] / np.clip(df["AC_POWER"], eps, None)
 
-    # Rolling statistics per inverter (SOURCE_KEY)
-    logger.info("Computing rolling features with window=4, min_periods=1")
-    group = df.groupby("SOURCE_KEY", group_keys=False)
-
-    df["rolling_mean_power"] = group["AC_POWER"].apply(
-        lambda s: s.rolling(window=4, min_periods=1).mean()
-    )
-    df["rolling_std_power"] = group["AC_POWER"].apply(
-        lambda s: s.rolling(window=4, min_periods=1).std().fillna(0.0)
+    # Rolling statistics per inverter (SOURCE_KEY); rows are sorted by
+    # inverter, so each inverter is one contiguous run.
+    logger.info("Computing rolling features with window=%d, min_periods=1", window)
+    group_pos = _group_positions(df["SOURCE_KEY"])
+    mean_power, std_power = rolling_mean_std(
+        df["AC_POWER"].to_numpy(), group_pos, window
     )
-    df["rolling_temp_mean"] = group["MODULE_TEMPERATURE"].apply(
-        lambda s: s.rolling(window=4, min_periods=1).mean()
+    temp_mean, _ = rolling_mean_std(
+        df["MODULE_TEMPERATURE"].to_numpy(), group_pos, window, with_std=False
     )
-
-    # Ensure no NaN remains
-    df = df.ffill().bfill()
-    df = df.dropna().reset_index(drop=True)
+    df["rolling_mean_power"] = mean_power
+    df["rolling_std_power"] = std_power
+    df["rolling_temp_mean"] = temp_mean
+
+    # Ensure no NaN remains. Filling is column-wise, so only columns that
+    # actually contain NaN need the (copying) ffill/bfill pass.
+    na_columns = [column for column in df.columns if df[column].hasnans]
+    for column in na_columns:
+        df[column] = df[column].ffill().bfill()
+    if na_columns:
+        df = df.dropna()
+    df = df.reset_index(drop=True)
 
     logger.info(
         "Feature engineering completed. Final shape: %d rows, %d columns",
@@ -86,3 +168,77 @@ def add_engineered_features(df: pd.DataFrame) -> pd.DataFrame:
     )
     return df
 
+
+def compute_online_features(
+    dc_power: float,
+    ac_power: float,
+    ambient_temperature: float,
+    module_temperature: float,
+    irradiation: float,
+    rolling: Optional[Tuple[float, float, float]] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Compute `FEATURE_COLUMNS` for a single reading without pandas.
+
+    Produces the same float32 values as running a one-row frame through
+    `add_engineered_features` and casting to float32: arithmetic is done in
+    float64 and only the final values are narrowed.
+
+    `rolling` is `(rolling_mean_power, rolling_std_power, rolling_temp_mean)`
+    for this reading's inverter, e.g. from a `RollingFeatureStore`. Without it
+    the reading is treated as the only one in its window (mean = value,
+    std 0).
+
+    If `out` is given it must be a float32 array of length
+    `len(FEATURE_COLUMNS)` and is filled in place.
+    """
+    if out is None:
+        out = np.empty(len(FEATURE_COLUMNS), dtype=np.float32)
+
+    out[0] = dc_power
+    out[1] = ac_power
+    out[2] = ambient_temperature
+    out[3] = module_temperature
+    out[4] = irradiation
+    out[5] = ac_power / max(irradiation, EPS)
+    out[6] = module_temperature - ambient_temperature
+    out[7] = dc_power / max(ac_power, EPS)
+    if rolling is None:
+        out[8] = ac_power
+        out[9] = 0.0
+        out[10] = module_temperature
+    else:
+        out[8], out[9], out[10] = rolling
+    return out
+
+
+def compute_online_features_batch(
+    raw: np.ndarray,
+    rolling: Optional[np.ndarray] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Vectorized `compute_online_features` for many independent readings.
+
+    `raw` has shape (n, 5) with columns DC_POWER, AC_POWER,
+    AMBIENT_TEMPERATURE, MODULE_TEMPERATURE, IRRADIATION (float64).
+    `rolling`, if given, has shape (n, 3) and supplies the rolling features
+    per row; otherwise each row is its own window. Returns (n, 11) float32
+    rows identical to `compute_online_features` on each reading.
+    """
+    raw = np.asarray(raw, dtype=np.float64)
+    n = raw.shape[0]
+    if out is None:
+        out = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float32)
+
+    dc, ac, ambient, module, irradiation = raw.T
+    out[:, :5] = raw
+    out[:, 5] = ac / np.maximum(irradiation, EPS)
+    out[:, 6] = module - ambient
+    out[:, 7] = dc / np.maximum(ac, EPS)
+    if rolling is None:
+        out[:, 8] = ac
+        out[:, 9] = 0.0
+        out[:, 10] = module
+    else:
+        out[:, 8:11] = rolling
+    return out
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .feature_engineering import ROLLING_WINDOW
+from .utils import get_logger
+
+
+logger = get_logger(__name__)
+
+# Column order of the per-reading values kept in the ring buffers.
+_AC_POWER = 0
+_MODULE_TEMPERATURE = 1
+
+
+class RollingFeatureStore:
+    """Bounded in-process store of recent readings per inverter.
+
+    Keeps the last `window` AC power and module temperature readings of up
+    to `max_inverters` inverters (`SOURCE_KEY`) in preallocated ring buffers.
+    Each update recomputes its window's statistics from the buffer with the
+    arithmetic of `rolling_mean_std` (O(window), no running sums that lose
+    precision), so this reproduces the rolling features of
+    `add_engineered_features` (window `ROLLING_WINDOW`, `min_periods=1`,
+    NaNs skipped, sample std with 0 for fewer than two readings) online,
+    one reading at a time.
+
+    When full, the least recently updated inverter is evicted and its slot
+    reused, so memory is fixed at construction time.
+    """
+
+    def __init__(
+        self,
+        window: int = ROLLING_WINDOW,
+        max_inverters: int = 10_000,
+    ) -> None:
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        if max_inverters < 1:
+            raise ValueError("max_inverters must be >= 1")
+        self.window = window
+        self.max_inverters = max_inverters
+
+        self._values = np.zeros((max_inverters, window, 2), dtype=np.float64)
+        self._count = np.zeros(max_inverters, dtype=np.int64)
+        self._head = np.zeros(max_inverters, dtype=np.int64)
+
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free = list(range(max_inverters - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, source_key: object) -> bool:
+        return source_key in self._slots
+
+    def _slot_for(self, source_key: str) -> int:
+        slot = self._slots.get(source_key)
+        if slot is not None:
+            self._slots.move_to_end(source_key)
+            return slot
+
+        if self._free:
+            slot = self._free.pop()
+        else:
+            evicted, slot = self._slots.popitem(last=False)
+            logger.debug("Evicting rolling state for inverter %s", evicted)
+        self._count[slot] = 0
+        self._head[slot] = 0
+        self._slots[source_key] = slot
+        return slot
+
+    def update(
+        self,
+        source_key: str,
+        ac_power: float,
+        module_temperature: float,
+    ) -> Tuple[float, float, float]:
+        """Record a reading and return its rolling features.
+
+        Returns `(rolling_mean_power, rolling_std_power, rolling_temp_mean)`
+        over the window ending at (and including) this reading.
+        """
+        with self._lock:
+            slot = self._slot_for(source_key)
+            head = int(self._head[slot])
+            buf = self._values[slot]
+            buf[head, _AC_POWER] = ac_power
+            buf[head, _MODULE_TEMPERATURE] = module_temperature
+            n = min(int(self._count[slot]) + 1, self.window)
+            self._count[slot] = n
+            self._head[slot] = (head + 1) % self.window
+            rows = buf.tolist()
+        # Newest first, the order `rolling_mean_std` sums them in.
+        window = [rows[(head - k) % self.window] for k in range(n)]
+        power = [row[_AC_POWER] for row in window]
+        mean_power, std_power = _mean_std(power)
+        mean_temp, _ = _mean_std([row[_MODULE_TEMPERATURE] for row in window])
+        return mean_power, std_power, mean_temp
+
+    def forget(self, source_key: str) -> None:
+        """Drop the rolling state of one inverter, if present."""
+        with self._lock:
+            slot = self._slots.pop(source_key, None)
+            if slot is not None:
+                self._free.append(slot)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slots.clear()
+            self._free = list(range(self.max_inverters - 1, -1, -1))
+
+
+def _mean_std(values: Sequence[float]) -> Tuple[float, float]:
+    """Mean and two-pass sample std of the non-NaN `values` (NaN mean if
+    there are none, std 0 for fewer than two)."""
+    valid: List[float] = [value for value in values if not math.isnan(value)]
+    if not valid:
+        return math.nan, 0.0
+    total = 0.0
+    for value in valid:
+        total += value
+    mean = total / len(valid)
+    if len(valid) < 2:
+        return mean, 0.0
+    sq_dev = 0.0
+    for value in valid:
+        sq_dev += (value - mean) ** 2
+    return mean, math.sqrt(sq_dev / (len(valid) - 1))
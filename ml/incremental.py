@@ -0,0 +1,261 @@
+"""Building blocks for incremental training (`python -m ml.train --incremental`).
+
+A full training run saves, next to its models, the state an incremental run
+needs to continue from it:
+
+- `history_tail/`: the last `ROLLING_WINDOW` cleaned readings of every
+  inverter, so rolling features of the new readings (and of the last old
+  one, whose target only arrives with them) match a full run;
+- `anomaly_window/`: the unscaled features of the most recent
+  `anomaly_window_days`, which the anomaly model is refit on;
+- `training_manifest.json`: what data each run added and, for runs that
+  loaded the CSVs in chunks, where in each file the next run can resume
+  reading (`sources`).
+
+An incremental run updates the scaler with `partial_fit`, rewrites the
+XGBoost split thresholds for the new scaling (the trees keep splitting the
+same raw values), continues boosting on the new rows only, and refits the
+IsolationForest on the rolling window.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .data_loader import csv_resume_offsets
+from .dataset_cache import load_dataset, save_dataset
+from .feature_engineering import FEATURE_COLUMNS, FEATURE_VERSION, ROLLING_WINDOW
+from .utils import get_logger
+
+
+logger = get_logger(__name__)
+
+TRAINING_MANIFEST = "training_manifest.json"
+HISTORY_TAIL_DIR = "history_tail"
+ANOMALY_WINDOW_DIR = "anomaly_window"
+ANOMALY_WINDOW_DAYS = 30
+RAW_COLUMNS = [
+    "DATE_TIME",
+    "SOURCE_KEY",
+    "DC_POWER",
+    "AC_POWER",
+    "AMBIENT_TEMPERATURE",
+    "MODULE_TEMPERATURE",
+    "IRRADIATION",
+]
+# Bytes before a resume offset that must be unchanged for it to be used.
+FINGERPRINT_BYTES = 4096
+
+
+def read_manifest(bundle_dir: Path) -> Dict[str, Any]:
+    path = bundle_dir / TRAINING_MANIFEST
+    if not path.exists():
+        logger.error("Training manifest not found at %s", path)
+        raise FileNotFoundError(
+            f"No training manifest in {bundle_dir}; run a full training first"
+        )
+    return json.loads(path.read_text())
+
+
+def write_manifest(
+    bundle_dir: Path,
+    run: Dict[str, Any],
+    parent: Optional[Dict[str, Any]] = None,
+    **state: Any,
+) -> Dict[str, Any]:
+    """Write the manifest of `bundle_dir`: the parent's runs plus `run`."""
+    manifest = {
+        "feature_version": FEATURE_VERSION,
+        "rolling_window": ROLLING_WINDOW,
+        **state,
+        "runs": (parent["runs"] if parent else []) + [run],
+    }
+    (bundle_dir / TRAINING_MANIFEST).write_text(
+        json.dumps(manifest, indent=2, default=str)
+    )
+    return manifest
+
+
+def describe_rows(df: pd.DataFrame) -> Dict[str, Any]:
+    """Summary of a block of training rows for the manifest."""
+    return {
+        "rows": int(len(df)),
+        "inverters": int(df["SOURCE_KEY"].nunique()),
+        "data_start": str(df["DATE_TIME"].min()) if len(df) else None,
+        "data_end": str(df["DATE_TIME"].max()) if len(df) else None,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def save_history_tail(df: pd.DataFrame, bundle_dir: Path) -> None:
+    """Keep the last `ROLLING_WINDOW` readings of each inverter."""
+    tail = (
+        df.sort_values(["SOURCE_KEY", "DATE_TIME"])
+        .groupby("SOURCE_KEY", observed=True)
+        .tail(ROLLING_WINDOW)[RAW_COLUMNS]
+        .reset_index(drop=True)
+    )
+    save_dataset(tail, bundle_dir / HISTORY_TAIL_DIR)
+
+
+def load_history_tail(bundle_dir: Path) -> pd.DataFrame:
+    tail = load_dataset(bundle_dir / HISTORY_TAIL_DIR, mmap=False)
+    tail["SOURCE_KEY"] = tail["SOURCE_KEY"].astype(str)
+    return tail
+
+
+def inverter_watermarks(tail: pd.DataFrame) -> pd.Series:
+    """Last trained `DATE_TIME` of each inverter, from its history tail."""
+    return tail.groupby("SOURCE_KEY")["DATE_TIME"].max()
+
+
+def after_watermarks(df: pd.DataFrame, watermarks: pd.Series) -> np.ndarray:
+    """Mask of the rows of `df` newer than their inverter's watermark; all
+    rows of inverters without one."""
+    since = df["SOURCE_KEY"].astype(str).map(watermarks)
+    return (since.isna() | (df["DATE_TIME"] > since)).to_numpy(dtype=bool)
+
+
+def csv_sizes(generation_csv: Path, weather_csv: Path) -> Tuple[int, int]:
+    """Current sizes of both CSVs; take them before loading, for `csv_sources`."""
+    return Path(generation_csv).stat().st_size, Path(weather_csv).stat().st_size
+
+
+def _fingerprint(path: Path, offset: int) -> str:
+    with open(path, "rb") as handle:
+        start = max(0, offset - FINGERPRINT_BYTES)
+        handle.seek(start)
+        return hashlib.sha256(handle.read(offset - start)).hexdigest()
+
+
+def csv_sources(
+    generation_csv: Path, weather_csv: Path, sizes: Tuple[int, int]
+) -> Dict[str, Any]:
+    """Manifest state for resuming after the first `sizes` bytes of both
+    CSVs were trained on (see `resume_offsets`)."""
+    offsets = csv_resume_offsets(generation_csv, weather_csv, sizes)
+    return {
+        name: {
+            "path": str(Path(path).resolve()),
+            "offset": offset,
+            "fingerprint": _fingerprint(Path(path), offset),
+        }
+        for name, path, offset in zip(
+            ("generation", "weather"), (generation_csv, weather_csv), offsets
+        )
+    }
+
+
+def resume_offsets(
+    manifest: Dict[str, Any], generation_csv: Path, weather_csv: Path
+) -> Optional[Tuple[int, int]]:
+    """Offsets to resume both CSVs from, if the parent run recorded them
+    for these files and the bytes before them are unchanged; else None."""
+    sources = manifest.get("sources")
+    if not sources:
+        return None
+    offsets = []
+    for name, path in (("generation", generation_csv), ("weather", weather_csv)):
+        source = sources[name]
+        path = Path(path).resolve()
+        if (
+            source["path"] != str(path)
+            or path.stat().st_size < source["offset"]
+            or _fingerprint(path, source["offset"]) != source["fingerprint"]
+        ):
+            logger.info("%s is not the file the parent read; reading all of it", path)
+            return None
+        offsets.append(source["offset"])
+    logger.info("Resuming both CSVs at byte offsets %s", offsets)
+    return offsets[0], offsets[1]
+
+
+def update_anomaly_window(
+    previous: Optional[pd.DataFrame],
+    new: pd.DataFrame,
+    days: float = ANOMALY_WINDOW_DAYS,
+) -> pd.DataFrame:
+    """Append `new` (DATE_TIME + `FEATURE_COLUMNS`) and keep the last `days`."""
+    frames = [new[["DATE_TIME"] + FEATURE_COLUMNS]]
+    if previous is not None:
+        frames.insert(0, previous)
+    window = pd.concat(frames, ignore_index=True)
+    window[FEATURE_COLUMNS] = window[FEATURE_COLUMNS].astype(np.float32)
+    cutoff = window["DATE_TIME"].max() - pd.Timedelta(days=days)
+    return window[window["DATE_TIME"] > cutoff].reset_index(drop=True)
+
+
+def save_anomaly_window(window: pd.DataFrame, bundle_dir: Path) -> None:
+    save_dataset(window, bundle_dir / ANOMALY_WINDOW_DIR)
+
+
+def load_anomaly_window(bundle_dir: Path) -> pd.DataFrame:
+    return load_dataset(bundle_dir / ANOMALY_WINDOW_DIR, mmap=False)
+
+
+def remap_split_thresholds(
+    xgb_model: Any,
+    old_mean: np.ndarray,
+    old_scale: np.ndarray,
+    new_mean: np.ndarray,
+    new_scale: np.ndarray,
+) -> None:
+    """Rewrite the split thresholds of a fitted XGBoost sklearn model so it
+    takes features standardized with (`new_mean`, `new_scale`) and splits
+    the same raw values it did under (`old_mean`, `old_scale`).
+
+    Thresholds are stored as float32, so inputs within one float32 step of
+    a split can land on the other side.
+    """
+    config = json.loads(xgb_model.get_booster().save_raw("json"))
+    old_mean = np.asarray(old_mean, dtype=np.float64)
+    old_scale = np.asarray(old_scale, dtype=np.float64)
+    new_mean = np.asarray(new_mean, dtype=np.float64)
+    new_scale = np.asarray(new_scale, dtype=np.float64)
+    for tree in config["learner"]["gradient_booster"]["model"]["trees"]:
+        is_split = np.asarray(tree["left_children"]) != -1
+        feature = np.asarray(tree["split_indices"])[is_split]
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float64)
+        raw = conditions[is_split] * old_scale[feature] + old_mean[feature]
+        conditions[is_split] = (raw - new_mean[feature]) / new_scale[feature]
+        tree["split_conditions"] = conditions.astype(np.float32).tolist()
+    xgb_model.load_model(bytearray(json.dumps(config).encode()))
+
+
+def continue_boosting(
+    xgb_model: Any,
+    X: np.ndarray,
+    y: np.ndarray,
+    n_rounds: int,
+    num_class: Optional[int] = None,
+) -> None:
+    """Add `n_rounds` trees to a fitted XGBoost sklearn model, fit on (X, y).
+
+    Uses `xgboost.train` directly so a classifier can continue on new rows
+    that do not contain every class.
+    """
+    import xgboost as xgb
+
+    params = {k: v for k, v in xgb_model.get_xgb_params().items() if v is not None}
+    if num_class is not None:
+        params["num_class"] = num_class
+    booster = xgb.train(
+        params,
+        xgb.DMatrix(X, label=y),
+        num_boost_round=n_rounds,
+        xgb_model=xgb_model.get_booster(),
+    )
+    xgb_model.load_model(bytearray(booster.save_raw("ubj")))
+    xgb_model.set_params(n_estimators=booster.num_boosted_rounds())
+
+
+def total_rounds(xgb_model: Any) -> int:
+    return int(xgb_model.get_booster().num_boosted_rounds())
+
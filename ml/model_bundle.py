@@ -0,0 +1,397 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .compiled_models import MANIFEST_FILE, load_compiled, read_compiled_manifest
+from .feature_engineering import FEATURE_COLUMNS
+from .metrics import MODEL_LOAD_SECONDS, STAGE_SECONDS
+from .preprocessing import load_scaler, scale_features_inplace, scaler_arrays
+from .result_cache import file_fingerprint
+from .utils import get_logger
+
+
+logger = get_logger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+MODELS_DIR = ROOT / "models"
+# Each training run writes a complete bundle under `BUNDLES_DIR/<name>/`
+# and then points `CURRENT_POINTER` at it, so readers never see a mix of
+# files from two runs. Without a pointer the flat `models/` layout is used.
+BUNDLES_DIR = MODELS_DIR / "bundles"
+CURRENT_POINTER = MODELS_DIR / "CURRENT"
+
+SCALER_FILE = "scaler.pkl"
+# The XGBoost models are native boosters (see `ml.native_models`); bundles
+# written before that hold `.pkl` files of the same name, which still load.
+EFFICIENCY_MODEL_FILE = "efficiency_model.ubj"
+CLASSIFIER_MODEL_FILE = "classifier_model.ubj"
+ANOMALY_MODEL_FILE = "anomaly_model.pkl"
+COMPILED_SUBDIR = "compiled"
+COMPILED_MODEL_NAMES = ("scaler", "efficiency", "classifier", "anomaly")
+# Optional per-shard models: `SHARDS_SUBDIR/<shard>/` holds the same files
+# as a bundle, and `SHARD_MAP` routes each SOURCE_KEY to its shard.
+# Inverters without a shard are served by the bundle's own models.
+SHARDS_SUBDIR = "shards"
+SHARD_MAP = "shards.json"
+
+_SCALING = STAGE_SECONDS.labels("scaling")
+_EFFICIENCY = STAGE_SECONDS.labels("efficiency_model")
+_ANOMALY = STAGE_SECONDS.labels("anomaly_model")
+_CLASSIFIER = STAGE_SECONDS.labels("classifier_model")
+
+
+def current_bundle_dir() -> Path:
+    """Directory of the published bundle, or `MODELS_DIR` if none is."""
+    try:
+        name = CURRENT_POINTER.read_text().strip()
+    except FileNotFoundError:
+        return MODELS_DIR
+    if not name:
+        return MODELS_DIR
+    return BUNDLES_DIR / name
+
+
+def new_bundle_dir() -> Path:
+    """Create and return an empty, not yet published bundle directory."""
+    BUNDLES_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    path = BUNDLES_DIR / stamp
+    suffix = 1
+    while path.exists():
+        path = BUNDLES_DIR / f"{stamp}-{suffix}"
+        suffix += 1
+    path.mkdir(parents=True)
+    return path
+
+
+def publish_bundle(bundle_dir: Path) -> None:
+    """Atomically make `bundle_dir` the bundle that servers load."""
+    bundle_dir = bundle_dir.resolve()
+    if bundle_dir.parent != BUNDLES_DIR.resolve():
+        raise ValueError(f"Not a bundle under {BUNDLES_DIR}: {bundle_dir}")
+    if not bundle_dir.is_dir():
+        logger.error("Model bundle not found at %s", bundle_dir)
+        raise FileNotFoundError(f"Model bundle not found: {bundle_dir}")
+    tmp = CURRENT_POINTER.with_name(CURRENT_POINTER.name + ".tmp")
+    tmp.write_text(bundle_dir.name + "\n")
+    os.replace(tmp, CURRENT_POINTER)
+    logger.info("Published model bundle %s", bundle_dir.name)
+
+
+def prune_bundles(keep: int = 3) -> List[Path]:
+    """Delete all but the `keep` newest bundles, never the published one."""
+    if not BUNDLES_DIR.exists():
+        return []
+    current = current_bundle_dir().resolve()
+    bundles = sorted(p for p in BUNDLES_DIR.iterdir() if p.is_dir())
+    removed = []
+    for path in bundles[: max(0, len(bundles) - keep)]:
+        if path.resolve() == current:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(path)
+    if removed:
+        logger.info("Pruned %d old model bundles", len(removed))
+    return removed
+
+
+def bundle_artifact_paths(bundle_dir: Path, backend: str) -> List[Path]:
+    """Files whose replacement changes the models served from `bundle_dir`."""
+    if backend == "compiled":
+        return [
+            bundle_dir / COMPILED_SUBDIR / name / "meta.json"
+            for name in COMPILED_MODEL_NAMES
+        ] + [bundle_dir / COMPILED_SUBDIR / MANIFEST_FILE, bundle_dir / SHARD_MAP]
+    return [
+        bundle_dir / SCALER_FILE,
+        bundle_dir / EFFICIENCY_MODEL_FILE,
+        bundle_dir / CLASSIFIER_MODEL_FILE,
+        bundle_dir / ANOMALY_MODEL_FILE,
+        bundle_dir / SHARD_MAP,
+    ]
+
+
+def bundle_version(backend: str, bundle_dir: Optional[Path] = None) -> str:
+    """Bundle name plus a fingerprint of its files (default: the published
+    bundle), so both publishing a new bundle and overwriting files in place
+    change the version."""
+    bundle_dir = bundle_dir or current_bundle_dir()
+    paths = bundle_artifact_paths(bundle_dir, backend)
+    return f"{bundle_dir.name}:{file_fingerprint(paths)}"
+
+
+def _manifest_entry(
+    manifest: Dict[str, Any], compiled_dir: Path, name: str
+) -> Dict[str, Any]:
+    if name not in manifest["models"]:
+        raise ValueError(f"Manifest of {compiled_dir} does not list model {name!r}")
+    return manifest["models"][name]
+
+
+class ModelBundle:
+    """Scaler and the three models loaded together from one bundle.
+
+    A bundle is immutable once loaded; `PredictionService` serves from one
+    bundle at a time and replaces it as a whole, so a request never sees a
+    scaler from one training run and a model from another.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        version: str,
+        backend: str,
+        scaler: Any,
+        efficiency: Any,
+        classifier: Any,
+        anomaly: Any,
+        shard: Optional[str] = None,
+        router: Optional["ShardRouter"] = None,
+    ) -> None:
+        self.path = path
+        self.version = version
+        self.backend = backend
+        self.scaler = scaler
+        self.scaler_mean, self.scaler_scale = scaler_arrays(scaler)
+        self.efficiency = efficiency
+        self.classifier = classifier
+        self.anomaly = anomaly
+        self.shard = shard
+        self.router = router
+
+    @classmethod
+    def load(
+        cls,
+        backend: str,
+        bundle_dir: Optional[Path] = None,
+        shard: Optional[str] = None,
+    ) -> "ModelBundle":
+        """Load the published bundle (or `bundle_dir`) for `backend`.
+
+        Shards listed in the bundle's `SHARD_MAP` are loaded on first use
+        (see `ShardRouter`); `shard` names the shard a bundle directory is.
+        """
+        start = time.perf_counter()
+        bundle_dir = bundle_dir or current_bundle_dir()
+        # Taken before loading: if files change meanwhile, the next version
+        # check sees a difference and loads again.
+        version = bundle_version(backend, bundle_dir)
+
+        if backend == "compiled":
+            compiled_dir = bundle_dir / COMPILED_SUBDIR
+            logger.info("Loading compiled models from %s", compiled_dir)
+            manifest = read_compiled_manifest(compiled_dir, FEATURE_COLUMNS)
+            models = [
+                load_compiled(
+                    compiled_dir / name,
+                    mmap_mode="r",
+                    expected=_manifest_entry(manifest, compiled_dir, name),
+                )
+                for name in COMPILED_MODEL_NAMES
+            ]
+        else:
+            from .anomaly_model import AnomalyDetector
+            from .classifier_model import FailureRiskClassifier
+            from .efficiency_model import EfficiencyRegressor
+
+            logger.info("Loading models from %s", bundle_dir)
+            models = [
+                load_scaler(bundle_dir / SCALER_FILE),
+                EfficiencyRegressor.load(bundle_dir / EFFICIENCY_MODEL_FILE),
+                FailureRiskClassifier.load(bundle_dir / CLASSIFIER_MODEL_FILE),
+                AnomalyDetector.load(bundle_dir / ANOMALY_MODEL_FILE),
+            ]
+        router = None if shard is not None else ShardRouter.open(bundle_dir, backend)
+        bundle = cls(bundle_dir, version, backend, *models, shard=shard, router=router)
+        MODEL_LOAD_SECONDS.labels(backend).observe(time.perf_counter() - start)
+        return bundle
+
+    def shard_for(self, source_key: Optional[str]) -> Optional[str]:
+        """Shard serving `source_key`, or None for this bundle's own models."""
+        if self.router is None or not source_key:
+            return None
+        return self.router.shard_for(source_key)
+
+    def shard_bundle(self, shard: Optional[str]) -> "ModelBundle":
+        """The bundle of `shard` (from `shard_for`); None is this bundle."""
+        if shard is None or self.router is None:
+            return self
+        return self.router.get(shard)
+
+    def set_n_jobs(self, n_jobs: int) -> None:
+        """Limit per-call threads of models that support it."""
+        for model in (self.efficiency, self.classifier, self.anomaly):
+            if hasattr(model, "set_n_jobs"):
+                model.set_n_jobs(n_jobs)
+        if self.router is not None:
+            self.router.set_n_jobs(n_jobs)
+
+    def scale(self, X: np.ndarray) -> np.ndarray:
+        """Scale float32 features in place with this bundle's scaler."""
+        with _SCALING.time():
+            return scale_features_inplace(X, self.scaler_mean, self.scaler_scale)
+
+    def score_arrays(self, X_scaled: np.ndarray) -> Dict[str, np.ndarray]:
+        """Run each model once over scaled features; one array per output.
+
+        Returns ``efficiency_prediction``, ``anomaly_score``,
+        ``anomaly_label``, ``risk_label`` (index into
+        `classifier.class_names`) and ``risk_proba`` (one column per class).
+        Risk labels are derived from the same class probabilities that are
+        returned, and anomaly labels from the same scores.
+        """
+        with _EFFICIENCY.time():
+            eff_pred = self.efficiency.predict(X_scaled)
+        with _ANOMALY.time():
+            anomaly_score, anomaly_label = self.anomaly.predict(X_scaled)
+        with _CLASSIFIER.time():
+            risk_label, risk_proba = self.classifier.predict_with_proba(X_scaled)
+        return {
+            "efficiency_prediction": eff_pred,
+            "anomaly_score": anomaly_score,
+            "anomaly_label": anomaly_label,
+            "risk_label": risk_label,
+            "risk_proba": risk_proba,
+        }
+
+    def score(self, X_scaled: np.ndarray) -> List[Dict[str, Any]]:
+        """`score_arrays` as one result dict per row."""
+        scores = self.score_arrays(X_scaled)
+        eff_pred = scores["efficiency_prediction"]
+        anomaly_score = scores["anomaly_score"]
+        anomaly_label = scores["anomaly_label"]
+        risk_proba = scores["risk_proba"]
+        class_names = self.classifier.class_names
+        risk_level = np.asarray(class_names)[scores["risk_label"]]
+
+        return [
+            {
+                "efficiency_prediction": float(eff_pred[i]),
+                "anomaly_score": float(anomaly_score[i]),
+                "anomaly_label": int(anomaly_label[i]),
+                "risk_level": str(risk_level[i]),
+                "risk_probabilities": dict(
+                    zip(class_names, risk_proba[i].astype(float).tolist())
+                ),
+            }
+            for i in range(len(eff_pred))
+        ]
+
+
+class ShardRouter:
+    """Routes inverters to per-shard bundles, loaded lazily behind an LRU.
+
+    At most `max_loaded` shard bundles are kept in memory; the least
+    recently used one is dropped when another has to be loaded, so memory
+    stays bounded however many shards a bundle has. A shard is loaded by
+    one thread while others asking for it wait.
+    """
+
+    def __init__(
+        self,
+        bundle_dir: Path,
+        backend: str,
+        routes: Dict[str, str],
+        max_loaded: int = 32,
+    ) -> None:
+        if max_loaded < 1:
+            raise ValueError("max_loaded must be >= 1")
+        self.bundle_dir = bundle_dir
+        self.backend = backend
+        self.routes = routes
+        self.max_loaded = max_loaded
+        self.n_jobs: Optional[int] = None
+        self._loaded: "OrderedDict[str, ModelBundle]" = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._loads = 0
+        self._evictions = 0
+
+    @classmethod
+    def open(cls, bundle_dir: Path, backend: str) -> Optional["ShardRouter"]:
+        """Router for the shards of `bundle_dir`, None if it has none.
+
+        `SOLARA_MAX_LOADED_SHARDS` (default 32) caps the shards in memory.
+        """
+        path = bundle_dir / SHARD_MAP
+        if not path.exists():
+            return None
+        shard_map = json.loads(path.read_text())
+        router = cls(
+            bundle_dir,
+            backend,
+            shard_map["routes"],
+            max_loaded=int(os.environ.get("SOLARA_MAX_LOADED_SHARDS", "32")),
+        )
+        logger.info(
+            "Bundle %s has %d shards for %d inverters (at most %d loaded)",
+            bundle_dir.name,
+            len(set(router.routes.values())),
+            len(router.routes),
+            router.max_loaded,
+        )
+        return router
+
+    def shard_for(self, source_key: str) -> Optional[str]:
+        return self.routes.get(source_key)
+
+    def get(self, shard: str) -> ModelBundle:
+        """Loaded bundle of `shard`, loading it (and evicting) if needed."""
+        with self._lock:
+            bundle = self._loaded.get(shard)
+            if bundle is not None:
+                self._loaded.move_to_end(shard)
+                self._hits += 1
+                return bundle
+            loading = self._loading.setdefault(shard, threading.Lock())
+
+        with loading:
+            with self._lock:
+                bundle = self._loaded.get(shard)
+                if bundle is not None:
+                    self._loaded.move_to_end(shard)
+                    self._hits += 1
+                    return bundle
+            bundle = ModelBundle.load(
+                self.backend, self.bundle_dir / SHARDS_SUBDIR / shard, shard=shard
+            )
+            if self.n_jobs is not None:
+                bundle.set_n_jobs(self.n_jobs)
+            with self._lock:
+                self._loaded[shard] = bundle
+                self._loads += 1
+                while len(self._loaded) > self.max_loaded:
+                    evicted, _ = self._loaded.popitem(last=False)
+                    self._evictions += 1
+                    logger.debug("Unloaded model shard %s", evicted)
+                self._loading.pop(shard, None)
+        return bundle
+
+    def set_n_jobs(self, n_jobs: int) -> None:
+        with self._lock:
+            self.n_jobs = n_jobs
+            bundles = list(self._loaded.values())
+        for bundle in bundles:
+            bundle.set_n_jobs(n_jobs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "shards": len(set(self.routes.values())),
+                "inverters": len(self.routes),
+                "loaded": len(self._loaded),
+                "max_loaded": self.max_loaded,
+                "hits": self._hits,
+                "loads": self._loads,
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,40 @@
+"""Native XGBoost model files for the estimator wrappers.
+
+`EfficiencyRegressor` and `FailureRiskClassifier` are saved with XGBoost's
+own `save_model` (UBJSON for a `.ubj` path) instead of being pickled: the
+format is portable across xgboost and Python versions and loads without
+unpickling a whole estimator. The scikit-learn wrapper's parameters
+(learning rate, depth, threads, ...) are not part of that format, so they
+are stored in a booster attribute and restored on load; continuing to
+boost a loaded model (`ml.incremental`) trains with them.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+PARAMS_ATTR = "estimator_params"
+# Kept by XGBoost in the model itself.
+_MODEL_OWNED_PARAMS = ("base_score",)
+
+
+def save_native(model: Any, path: Path) -> None:
+    """Write the fitted XGBoost sklearn `model` and its parameters to `path`."""
+    params = {
+        name: value
+        for name, value in model.get_params().items()
+        if value is not None and name not in _MODEL_OWNED_PARAMS
+    }
+    model.get_booster().set_attr(**{PARAMS_ATTR: json.dumps(params)})
+    model.save_model(str(path))
+
+
+def load_native(model: Any, path: Path) -> Any:
+    """Load `path` (from `save_native`) into the unfitted XGBoost `model`."""
+    model.load_model(str(path))
+    params = model.get_booster().attr(PARAMS_ATTR)
+    if params is not None:
+        model.set_params(**json.loads(params))
+    return model
@@ -1,28 +1,44 @@
 from __future__ import annotations
 
+import os
+import threading
 from dataclasses import dataclass
-from pathlib import Path
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
-import pandas as pd
 
-from .anomaly_model import AnomalyDetector
-from .classifier_model import FailureRiskClassifier, RISK_LEVELS
-from .efficiency_model import EfficiencyRegressor
-from .feature_engineering import FEATURE_COLUMNS, add_engineered_features
-from .preprocessing import basic_cleaning, load_scaler, apply_scaler
+from .feature_engineering import (
+    FEATURE_COLUMNS,
+    compute_online_features,
+    compute_online_features_batch,
+)
+from .feature_store import RollingFeatureStore
+from .metrics import STAGE_SECONDS
+from .model_bundle import ModelBundle, bundle_version
+from .result_cache import ResultCache
 from .utils import get_logger
 
 
+if TYPE_CHECKING:  # only `SolarInput.to_dataframe` needs pandas
+    import pandas as pd
+
+
 logger = get_logger(__name__)
 
-ROOT = Path(__file__).resolve().parent.parent
-MODELS_DIR = ROOT / "models"
-SCALER_PATH = MODELS_DIR / "scaler.pkl"
-ANOMALY_MODEL_PATH = MODELS_DIR / "anomaly_model.pkl"
-EFFICIENCY_MODEL_PATH = MODELS_DIR / "efficiency_model.pkl"
-CLASSIFIER_MODEL_PATH = MODELS_DIR / "classifier_model.pkl"
+# "joblib" serves the native XGBoost models and the pickled IsolationForest
+# and scaler; "compiled" serves the array-backed export from `ml.train` and
+# never imports xgboost or scikit-learn.
+MODEL_BACKENDS = ("joblib", "compiled")
+
+ONLINE_SOURCE_KEY = "online_inverter"
+FILTERED_OUT_MESSAGE = "Input filtered out during preprocessing (e.g., irradiation == 0)."
+
+# Stages of the online path (scaling and each model are timed in
+# `ModelBundle`); the DataFrame pipeline is not used for serving.
+_CLEANING = STAGE_SECONDS.labels("cleaning")
+_ROLLING_STATE = STAGE_SECONDS.labels("rolling_state")
+_FEATURES = STAGE_SECONDS.labels("features")
+_RESULT_CACHE = STAGE_SECONDS.labels("result_cache")
 
 
 @dataclass
@@ -32,93 +48,475 @@ class SolarInput:
     ambient_temperature: float
     module_temperature: float
     irradiation: float
+    source_key: Optional[str] = None
 
-    def to_dataframe(self) -> pd.DataFrame:
-        """Convert to a single-row DataFrame with required columns.
+    def to_record(self) -> Dict[str, Any]:
+        """Convert to a raw record with the columns used by the pipeline.
 
         For online prediction we synthesize minimal fields required by
-        preprocessing and feature engineering.
+        preprocessing and feature engineering. Readings without a
+        `source_key` share a placeholder inverter ID.
         """
-        df = pd.DataFrame(
-            [
-                {
-                    "DC_POWER": self.dc_power,
-                    "AC_POWER": self.ac_power,
-                    "AMBIENT_TEMPERATURE": self.ambient_temperature,
-                    "MODULE_TEMPERATURE": self.module_temperature,
-                    "IRRADIATION": self.irradiation,
-                    "SOURCE_KEY": "online_inverter",
-                    "DATE_TIME": pd.Timestamp.utcnow(),
-                }
-            ]
+        import pandas as pd
+
+        return {
+            "DC_POWER": self.dc_power,
+            "AC_POWER": self.ac_power,
+            "AMBIENT_TEMPERATURE": self.ambient_temperature,
+            "MODULE_TEMPERATURE": self.module_temperature,
+            "IRRADIATION": self.irradiation,
+            "SOURCE_KEY": self.source_key or ONLINE_SOURCE_KEY,
+            "DATE_TIME": pd.Timestamp.utcnow(),
+        }
+
+    def values(self) -> Tuple[float, float, float, float, float]:
+        """The five raw readings, in `compute_online_features` order."""
+        return (
+            self.dc_power,
+            self.ac_power,
+            self.ambient_temperature,
+            self.module_temperature,
+            self.irradiation,
+        )
+
+    def is_finite(self) -> bool:
+        return bool(np.isfinite(self.values()).all())
+
+    def passes_cleaning(self) -> bool:
+        """Whether `basic_cleaning` would keep this reading."""
+        return (
+            self.dc_power >= 0
+            and self.ac_power >= 0
+            and self.irradiation > 0
         )
-        return df
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Convert to a single-row DataFrame with required columns."""
+        import pandas as pd
+
+        return pd.DataFrame([self.to_record()])
+
+
+WARM_UP_INPUT = SolarInput(
+    dc_power=1.0,
+    ac_power=1.0,
+    ambient_temperature=25.0,
+    module_temperature=35.0,
+    irradiation=1.0,
+)
+
+
+def _warm_up_features() -> np.ndarray:
+    """Unscaled float32 features of `WARM_UP_INPUT`, shape (1, n_features)."""
+    X = np.empty((1, len(FEATURE_COLUMNS)), dtype=np.float32)
+    compute_online_features(*WARM_UP_INPUT.values(), out=X[0])
+    return X
 
 
 class PredictionService:
-    """Thread-safe, lazily loaded prediction service."""
-
-    def __init__(self) -> None:
-        self._scaler = None
-        self._eff_model = None
-        self._clf_model = None
-        self._anomaly_model = None
-
-    def _load_assets(self) -> None:
-        if self._scaler is None:
-            logger.info("Loading scaler from %s", SCALER_PATH)
-            self._scaler = load_scaler(SCALER_PATH)
-        if self._eff_model is None:
-            logger.info("Loading efficiency model from %s", EFFICIENCY_MODEL_PATH)
-            self._eff_model = EfficiencyRegressor.load(EFFICIENCY_MODEL_PATH)
-        if self._clf_model is None:
-            logger.info("Loading classifier model from %s", CLASSIFIER_MODEL_PATH)
-            self._clf_model = FailureRiskClassifier.load(CLASSIFIER_MODEL_PATH)
-        if self._anomaly_model is None:
-            logger.info("Loading anomaly model from %s", ANOMALY_MODEL_PATH)
-            self._anomaly_model = AnomalyDetector.load(ANOMALY_MODEL_PATH)
-
-    def predict(self, solar_input: SolarInput) -> Dict[str, Any]:
-        """Run full prediction pipeline on single input."""
-        try:
-            self._load_assets()
+    """Thread-safe, lazily loaded prediction service.
+
+    Models are served from one `ModelBundle` at a time. `reload` loads and
+    warms a new bundle in the calling thread and then swaps it in with a
+    single assignment; every request reads the bundle once, so it is scored
+    entirely by the old or entirely by the new models.
 
-            df_raw = solar_input.to_dataframe()
-            df_clean = basic_cleaning(df_raw)
-            if df_clean.empty:
-                raise ValueError("Input filtered out during preprocessing (e.g., irradiation == 0).")
+    Readings that carry a `source_key` get rolling features from
+    `feature_store`, which remembers the last few readings of each inverter;
+    readings without one are scored as if they were their inverter's only
+    reading. Callers that keep the store elsewhere (the process executor's
+    parent) record readings with `rolling_features` and pass the result to
+    `predict` or `predict_batch`, which then leave `feature_store` alone.
 
-            df_feat = add_engineered_features(df_clean)
+    Bundles trained with shards (`python -m ml.train --shard-by ...`) route
+    each keyed reading to its inverter's shard models, loaded lazily and
+    kept behind a bounded LRU (see `ShardRouter`); other readings use the
+    bundle's global models.
 
-            X = df_feat[FEATURE_COLUMNS].astype("float32")
-            X_scaled_df = apply_scaler(
-                df_feat, FEATURE_COLUMNS, self._scaler, inplace=False
-            )[FEATURE_COLUMNS]
+    `backend` selects the model format (see `MODEL_BACKENDS`); it defaults
+    to the `SOLARA_MODEL_BACKEND` environment variable, then "joblib".
 
-            # Efficiency prediction (use scaled features)
-            eff_pred = float(self._eff_model.predict(X_scaled_df)[0])
+    `result_cache` short-circuits repeated identical readings; by default
+    one is built from the environment (see `ResultCache.from_env`), which
+    leaves caching off unless `SOLARA_RESULT_CACHE_SIZE` is set. Cached
+    entries are keyed by the version of the bundle that scored them and
+    dropped when another bundle is swapped in.
+    """
 
-            # Anomaly score/label (use scaled features)
-            anomaly_score_arr, anomaly_label_arr = self._anomaly_model.predict(
-                X_scaled_df
+    def __init__(
+        self,
+        feature_store: Optional[RollingFeatureStore] = None,
+        backend: Optional[str] = None,
+        result_cache: Optional[ResultCache] = None,
+    ) -> None:
+        backend = backend or os.environ.get("SOLARA_MODEL_BACKEND", "joblib")
+        if backend not in MODEL_BACKENDS:
+            raise ValueError(
+                f"Unknown model backend {backend!r}; expected one of {MODEL_BACKENDS}"
             )
-            anomaly_score = float(anomaly_score_arr[0])
-            anomaly_label = int(anomaly_label_arr[0])
-
-            # Risk level (use scaled features)
-            risk_label = int(self._clf_model.predict_label(X_scaled_df)[0])
-            risk_level = RISK_LEVELS.get(risk_label, "Low")
-
-            return {
-                "efficiency_prediction": eff_pred,
-                "anomaly_score": anomaly_score,
-                "anomaly_label": anomaly_label,
-                "risk_level": risk_level,
-            }
+        self.backend = backend
+        self.inference_threads: Optional[int] = None
+        self._bundle: Optional[ModelBundle] = None
+        self._warmed = False
+        self._load_lock = threading.Lock()
+        self._local = threading.local()
+        self.feature_store = (
+            feature_store if feature_store is not None else RollingFeatureStore()
+        )
+        if result_cache is None:
+            result_cache = ResultCache.from_env()
+        self.result_cache = result_cache
+
+    def model_version(self) -> str:
+        """Version of the model files on disk (see `bundle_version`)."""
+        return bundle_version(self.backend)
+
+    @property
+    def loaded_version(self) -> Optional[str]:
+        """Version of the bundle being served, None before the first load."""
+        bundle = self._bundle
+        return bundle.version if bundle is not None else None
+
+    @property
+    def ready(self) -> bool:
+        """Whether a bundle has been loaded and warmed (by `warm_up` or
+        `reload`), so requests are served without loading delays."""
+        return self._warmed
+
+    @property
+    def bundle(self) -> ModelBundle:
+        """The bundle being served, loaded on first use."""
+        return self._get_bundle()
+
+    def _get_bundle(self) -> ModelBundle:
+        bundle = self._bundle
+        if bundle is None:
+            with self._load_lock:
+                if self._bundle is None:
+                    self._swap_in(self._load_bundle())
+                bundle = self._bundle
+        return bundle
+
+    def _load_bundle(self) -> ModelBundle:
+        bundle = ModelBundle.load(self.backend)
+        if self.inference_threads is not None:
+            bundle.set_n_jobs(self.inference_threads)
+        return bundle
+
+    def _swap_in(self, bundle: ModelBundle) -> None:
+        # Called with `_load_lock` held. The cache switches first, so results
+        # of requests still scoring with the old bundle are not stored.
+        if self.result_cache is not None:
+            self.result_cache.set_version(bundle.version)
+        self._bundle = bundle
+
+    def reload(self, force: bool = False) -> bool:
+        """Load, warm up and swap in the published bundle.
+
+        Returns False without loading if the bundle on disk is the one
+        already served (unless `force`). Raises if the new bundle fails to
+        load or score, leaving the current one in place.
+        """
+        with self._load_lock:
+            current = self._bundle
+            if (
+                not force
+                and current is not None
+                and current.version == self.model_version()
+            ):
+                return False
+            bundle = self._load_bundle()
+            bundle.score(bundle.scale(_warm_up_features()))
+            self._swap_in(bundle)
+            self._warmed = True
+        logger.info(
+            "Serving model bundle %s (was %s)",
+            bundle.version,
+            current.version if current is not None else "none",
+        )
+        return True
+
+    def set_inference_threads(self, n_threads: int) -> None:
+        """Limit the threads each model may use per call (-1: every core).
+
+        Applies to models loaded now and later. Compiled models are plain
+        single-threaded NumPy and are unaffected.
+        """
+        self.inference_threads = n_threads
+        if self._bundle is not None:
+            self._bundle.set_n_jobs(n_threads)
+
+    def warm_up(self) -> None:
+        """Load all assets and run one prediction so first requests are fast."""
+        self.predict(WARM_UP_INPUT)
+        self._warmed = True
+
+    def _feature_buffer(self) -> np.ndarray:
+        """Per-thread preallocated (1, n_features) float32 buffer."""
+        buf = getattr(self._local, "features", None)
+        if buf is None:
+            buf = np.empty((1, len(FEATURE_COLUMNS)), dtype=np.float32)
+            self._local.features = buf
+        return buf
+
+    def online_features(self, solar_input: SolarInput) -> np.ndarray:
+        """Compute scaled features for one input without going through pandas.
+
+        Bit-for-bit equal to the scaled `FEATURE_COLUMNS` produced by the
+        DataFrame pipeline (`basic_cleaning` -> `add_engineered_features`
+        -> `apply_scaler`) for the same single reading; with a `source_key`
+        the rolling features come from `feature_store` and the reading is
+        recorded there. The returned array
+        is a reused per-thread buffer; copy it if it must outlive the call.
+        """
+        bundle = self._get_bundle()
+        bundle = bundle.shard_bundle(bundle.shard_for(solar_input.source_key))
+        return self._scaled_features(
+            bundle, solar_input, self._rolling_for(solar_input)
+        )
+
+    def _rolling_for(
+        self,
+        solar_input: SolarInput,
+        rolling: Optional[Tuple[float, float, float]] = None,
+    ) -> Optional[Tuple[float, float, float]]:
+        """Validate one input and record it in `feature_store` if keyed,
+        unless its `rolling` features were recorded already."""
+        with _CLEANING.time():
+            if not solar_input.passes_cleaning():
+                raise ValueError(FILTERED_OUT_MESSAGE)
+            if not solar_input.is_finite():
+                raise ValueError("Input contains non-finite values.")
+        if rolling is not None or not solar_input.source_key:
+            return rolling
+        with _ROLLING_STATE.time():
+            return self.feature_store.update(
+                solar_input.source_key,
+                solar_input.ac_power,
+                solar_input.module_temperature,
+            )
+
+    def _scaled_features(
+        self,
+        bundle: ModelBundle,
+        solar_input: SolarInput,
+        rolling: Optional[Tuple[float, float, float]],
+    ) -> np.ndarray:
+        X = self._feature_buffer()
+        with _FEATURES.time():
+            compute_online_features(
+                solar_input.dc_power,
+                solar_input.ac_power,
+                solar_input.ambient_temperature,
+                solar_input.module_temperature,
+                solar_input.irradiation,
+                rolling=rolling,
+                out=X[0],
+            )
+        return bundle.scale(X)
+
+    def rolling_features(
+        self, solar_inputs: Sequence[SolarInput]
+    ) -> List[Optional[Tuple[float, float, float]]]:
+        """Record inputs in `feature_store` and return their rolling features.
+
+        Only keyed inputs that would be scored are recorded, exactly as
+        `predict_batch` would; the others get None. Pass the result to
+        `predict_batch` (or an element to `predict`) in a process that
+        does not hold the store.
+        """
+        rolling: List[Optional[Tuple[float, float, float]]] = []
+        with _ROLLING_STATE.time():
+            for solar_input in solar_inputs:
+                if (
+                    solar_input.source_key
+                    and solar_input.is_finite()
+                    and solar_input.passes_cleaning()
+                ):
+                    rolling.append(
+                        self.feature_store.update(
+                            solar_input.source_key,
+                            solar_input.ac_power,
+                            solar_input.module_temperature,
+                        )
+                    )
+                else:
+                    rolling.append(None)
+        return rolling
+
+    def predict(
+        self,
+        solar_input: SolarInput,
+        rolling: Optional[Tuple[float, float, float]] = None,
+    ) -> Dict[str, Any]:
+        """Run full prediction pipeline on single input.
+
+        The result's `model_version` is the version of the bundle that
+        scored it.
+
+        `rolling`: the input's features from `rolling_features`, if it was
+        recorded there already.
+        """
+        try:
+            bundle = self._get_bundle()
+            shard = bundle.shard_for(solar_input.source_key)
+
+            rolling = self._rolling_for(solar_input, rolling)
+            cache = self.result_cache
+            if cache is not None:
+                with _RESULT_CACHE.time():
+                    key = cache.make_key(
+                        bundle.version, solar_input.values(), rolling, shard
+                    )
+                    cached = cache.get(key)
+                if cached is not None:
+                    return cached
+
+            version = bundle.version
+            bundle = bundle.shard_bundle(shard)
+            result = bundle.score(
+                self._scaled_features(bundle, solar_input, rolling)
+            )[0]
+            result["model_version"] = version
+            if cache is not None:
+                cache.put(key, result)
+            return result
         except Exception as exc:  # noqa: BLE001
             logger.error("Prediction failed: %s", exc, exc_info=True)
             raise
 
+    def _score_by_shard(
+        self, bundle: ModelBundle, X: np.ndarray, shards: List[Optional[str]]
+    ) -> List[Dict[str, Any]]:
+        """Score unscaled rows of `X`, each with the models of its shard."""
+        if not any(shards):
+            return bundle.score(bundle.scale(X))
+        rows_by_shard: Dict[Optional[str], List[int]] = {}
+        for pos, shard in enumerate(shards):
+            rows_by_shard.setdefault(shard, []).append(pos)
+        scored: List[Dict[str, Any]] = [{} for _ in shards]
+        for shard, rows in rows_by_shard.items():
+            shard_bundle = bundle.shard_bundle(shard)
+            # Fancy indexing copies, so scaling in place leaves X untouched.
+            results = shard_bundle.score(shard_bundle.scale(X[rows]))
+            for pos, result in zip(rows, results):
+                scored[pos] = result
+        return scored
+
+    def shard_stats(self) -> Optional[Dict[str, Any]]:
+        """Shard router counters of the served bundle, None if unsharded."""
+        bundle = self._bundle
+        if bundle is None or bundle.router is None:
+            return None
+        return bundle.router.stats()
+
+    def predict_batch(
+        self,
+        solar_inputs: Sequence[SolarInput],
+        rolling_features: Optional[
+            Sequence[Optional[Tuple[float, float, float]]]
+        ] = None,
+    ) -> List[Dict[str, Any]]:
+        """Run the prediction pipeline once over many inputs.
+
+        Returns one entry per input, in input order. Inputs rejected along
+        the way get an ``{"error": ...}`` entry instead of predictions, so a
+        single bad reading never fails the whole batch. Predictions carry
+        the `model_version` of the bundle that scored them.
+
+        Features are computed for all rows at once with the same arithmetic
+        as `online_features` (bit-for-bit equal to the DataFrame pipeline).
+        Keyed rows are recorded in `feature_store` in input order, so several
+        readings of one inverter in a batch see each other like consecutive
+        requests; with `rolling_features` (from `rolling_features`) the
+        store is not touched. With a `result_cache`, only rows that miss it
+        are scored. With shards, rows are grouped and scored once per shard.
+        """
+        results: List[Dict[str, Any]] = [
+            {"error": FILTERED_OUT_MESSAGE} for _ in solar_inputs
+        ]
+        try:
+            kept: List[int] = []
+            with _CLEANING.time():
+                for row_id, solar_input in enumerate(solar_inputs):
+                    if not solar_input.is_finite():
+                        results[row_id] = {
+                            "error": "Input contains non-finite values."
+                        }
+                    elif solar_input.passes_cleaning():
+                        kept.append(row_id)
+            if not kept:
+                return results
+
+            bundle = self._get_bundle()
+
+            raw = np.array(
+                [
+                    (
+                        solar_inputs[row_id].dc_power,
+                        solar_inputs[row_id].ac_power,
+                        solar_inputs[row_id].ambient_temperature,
+                        solar_inputs[row_id].module_temperature,
+                        solar_inputs[row_id].irradiation,
+                    )
+                    for row_id in kept
+                ],
+                dtype=np.float64,
+            )
+            rolling = None
+            if any(solar_inputs[row_id].source_key for row_id in kept):
+                rolling = raw[:, [1, 1, 3]].copy()
+                rolling[:, 1] = 0.0
+                if rolling_features is None:
+                    rolling_features = self.rolling_features(solar_inputs)
+                for pos, row_id in enumerate(kept):
+                    if rolling_features[row_id] is not None:
+                        rolling[pos] = rolling_features[row_id]
+
+            shards = [
+                bundle.shard_for(solar_inputs[row_id].source_key) for row_id in kept
+            ]
+
+            cache = self.result_cache
+            if cache is not None:
+                misses: List[int] = []
+                with _RESULT_CACHE.time():
+                    keys = [
+                        cache.make_key(
+                            bundle.version,
+                            raw[pos],
+                            rolling[pos] if rolling is not None else None,
+                            shards[pos],
+                        )
+                        for pos in range(len(kept))
+                    ]
+                    for pos, row_id in enumerate(kept):
+                        cached = cache.get(keys[pos])
+                        if cached is None:
+                            misses.append(pos)
+                        else:
+                            results[row_id] = cached
+                if not misses:
+                    return results
+                if len(misses) < len(kept):
+                    raw = raw[misses]
+                    rolling = rolling[misses] if rolling is not None else None
+                    shards = [shards[pos] for pos in misses]
+
+            with _FEATURES.time():
+                X = compute_online_features_batch(raw, rolling)
+            scored = self._score_by_shard(bundle, X, shards)
+            positions = misses if cache is not None else range(len(kept))
+            for pos, result in zip(positions, scored):
+                result["model_version"] = bundle.version
+                results[kept[pos]] = result
+                if cache is not None:
+                    cache.put(keys[pos], result)
+            return results
+        except Exception as exc:  # noqa: BLE001
+            logger.error("Batch prediction failed: %s", exc, exc_info=True)
+            raise
+
 
 prediction_service = PredictionService()
 
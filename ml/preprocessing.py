@@ -1,15 +1,17 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
 
-import joblib
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
+import numpy as np
 
 from .utils import get_logger
 
 
+if TYPE_CHECKING:  # pandas/scikit-learn/joblib are only needed off the serving path
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+
 logger = get_logger(__name__)
 
 
@@ -31,12 +33,16 @@ def basic_cleaning(df: pd.DataFrame) -> pd.DataFrame:
     mask_non_negative = (df["DC_POWER"] >= 0) & (df["AC_POWER"] >= 0)
     before = len(df)
     df = df[mask_non_negative]
-    logger.info("Removed %d rows with negative power values", before - len(df))
+    if len(df) < before:
+        logger.info("Removed %d rows with negative power values", before - len(df))
 
     # Filter out nighttime values where irradiation == 0
     before = len(df)
     df = df[df["IRRADIATION"] > 0]
-    logger.info("Removed %d nighttime rows where IRRADIATION == 0", before - len(df))
+    if len(df) < before:
+        logger.info(
+            "Removed %d nighttime rows where IRRADIATION == 0", before - len(df)
+        )
 
     df = df.reset_index(drop=True)
     return df
@@ -48,6 +54,9 @@ def fit_scaler(
     scaler_path: Path,
 ) -> StandardScaler:
     """Fit a StandardScaler on given feature columns and persist it."""
+    import joblib
+    from sklearn.preprocessing import StandardScaler
+
     scaler = StandardScaler()
     X = df[list(feature_columns)].astype("float32")
 
@@ -63,6 +72,8 @@ def fit_scaler(
 
 def load_scaler(scaler_path: Path) -> StandardScaler:
     """Load a previously persisted StandardScaler."""
+    import joblib
+
     scaler_path = scaler_path.resolve()
     if not scaler_path.exists():
         logger.error("Scaler file not found at %s", scaler_path)
@@ -85,3 +96,33 @@ def apply_scaler(
     target_df[cols] = X_scaled
     return target_df
 
+
+def scaler_arrays(
+    scaler: StandardScaler,
+) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """Return a fitted scaler's (mean, scale) as float32, `None` if disabled.
+
+    `StandardScaler.transform` casts its float64 statistics to the input
+    dtype before applying them, so float32 copies reproduce it exactly.
+    """
+    mean = scaler.mean_.astype(np.float32) if scaler.with_mean else None
+    scale = scaler.scale_.astype(np.float32) if scaler.with_std else None
+    return mean, scale
+
+
+def scale_features_inplace(
+    X: np.ndarray,
+    mean: Optional[np.ndarray],
+    scale: Optional[np.ndarray],
+) -> np.ndarray:
+    """Apply StandardScaler arithmetic to a float32 array in place.
+
+    `mean`/`scale` come from `scaler_arrays`. The result matches
+    `StandardScaler.transform` on the same float32 input bit for bit,
+    without its input validation overhead.
+    """
+    if mean is not None:
+        np.subtract(X, mean, out=X)
+    if scale is not None:
+        np.divide(X, scale, out=X)
+    return X
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, Optional, Sequence, Tuple
+
+from .utils import get_logger
+
+
+logger = get_logger(__name__)
+
+
+def file_fingerprint(paths: Iterable[Path]) -> str:
+    """Short hash of the size, mtime and inode of each file.
+
+    Changes whenever any file is rewritten or replaced (e.g. by `ml.train`),
+    without reading file contents. Missing files hash as missing.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        try:
+            st = os.stat(path)
+            digest.update(f"{path}:{st.st_size}:{st.st_mtime_ns}:{st.st_ino};".encode())
+        except FileNotFoundError:
+            digest.update(f"{path}:missing;".encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Bounded LRU/TTL cache of prediction results for repeated readings.
+
+    Keys are the version of the model bundle that scored the reading plus
+    the input values rounded to `decimals` places. Callers take the
+    version from the bundle object they score with, so a key always names
+    the models behind its result. `set_version` is called whenever another
+    bundle is swapped in: it drops every entry, and results still being
+    computed with the previous bundle are not stored when they arrive.
+
+    Entries older than `ttl_seconds` (0: no expiry) are treated as misses,
+    and the least recently used entry is evicted once `max_entries` is
+    reached. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        ttl_seconds: float = 60.0,
+        decimals: int = 6,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.decimals = decimals
+
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResultCache"]:
+        """Build from `SOLARA_RESULT_CACHE_SIZE` (0 or unset: disabled),
+        `SOLARA_RESULT_CACHE_TTL` and `SOLARA_RESULT_CACHE_DECIMALS`."""
+        size = int(os.environ.get("SOLARA_RESULT_CACHE_SIZE", "0"))
+        if size <= 0:
+            return None
+        return cls(
+            max_entries=size,
+            ttl_seconds=float(os.environ.get("SOLARA_RESULT_CACHE_TTL", "60")),
+            decimals=int(os.environ.get("SOLARA_RESULT_CACHE_DECIMALS", "6")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def set_version(self, version: str) -> None:
+        """Make `version` the bundle being served, dropping other entries."""
+        with self._lock:
+            if version == self._version:
+                return
+            if self._entries:
+                logger.info(
+                    "Model version changed (%s -> %s); dropping %d cached results",
+                    self._version or "-",
+                    version,
+                    len(self._entries),
+                )
+                self._invalidations += 1
+                self._entries.clear()
+            self._version = version
+
+    def make_key(
+        self,
+        version: str,
+        values: Sequence[float],
+        rolling: Optional[Sequence[float]] = None,
+        shard: Optional[str] = None,
+    ) -> Hashable:
+        """Key for one reading scored by bundle `version`; `rolling` is the
+        inverter's rolling state, if any, and `shard` the model shard
+        serving it, since both change the prediction too."""
+        d = self.decimals
+        key: Tuple[Any, ...] = (version,) + tuple(round(float(v), d) for v in values)
+        if rolling is not None:
+            key += tuple(round(float(v), d) for v in rolling)
+        if shard is not None:
+            key += (shard,)
+        return key
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Cached result for `key` (a copy), or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            stored_at, result = entry
+            if self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return copy.deepcopy(result)
+
+    def put(self, key: Hashable, result: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        result = copy.deepcopy(result)
+        with self._lock:
+            if key[0] != self._version:  # type: ignore[index]
+                return  # scored by a bundle that has since been replaced
+            self._entries[key] = (now, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "model_version": self._version,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
@@ -0,0 +1,408 @@
+"""Offline bulk scoring of historical CSVs: `python -m ml.score`.
+
+The CSVs go through the training pipeline (`load_generation_and_weather`,
+`basic_cleaning`, `add_engineered_features`, cached like `build_dataset`),
+so rows get the same features the models were trained on. Rows are split
+into parts of whole inverters (`SOURCE_KEY`) of about `--part-rows` rows,
+and the parts are scored across a pool of single-threaded worker processes
+with the batch model API (`ModelBundle.score_arrays`), each inverter with
+its shard's models. Features are shared with the workers as memory-mapped
+files, so they are not pickled per part.
+
+Each finished part is written to the output directory straight away, one
+`.npy` per column (see `ml.dataset_cache.save_dataset`), and logged with the
+overall progress and an ETA. `score.json` there records the plan, the
+dataset and the model version, so rerunning the same command after a crash
+or Ctrl-C only scores the parts not written yet. `load_scores` reads the
+result back as one DataFrame.
+
+    python -m ml.score --generation-csv gen.csv --weather-csv weather.csv \\
+        --output scores/history --backend compiled --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .dataset_cache import CACHE_DIR, MANIFEST, dataset_key, load_dataset, save_dataset
+from .feature_engineering import FEATURE_COLUMNS
+from .model_bundle import ModelBundle, bundle_version, current_bundle_dir
+from .predict import MODEL_BACKENDS
+from .utils import configure_logging, get_logger
+
+
+logger = get_logger(__name__)
+
+JOB_FILE = "score.json"
+FORMAT_VERSION = 1
+PART_ROWS = 500_000
+BATCH_ROWS = 65_536
+SHARED_MEMORY_DIR = Path("/dev/shm")
+
+# The bundle of this worker process, loaded once by `_init_worker`.
+_bundle: Optional[ModelBundle] = None
+
+
+def plan_parts(keys: np.ndarray, part_rows: int) -> List[Tuple[int, int]]:
+    """Split rows grouped by inverter into ``[start, stop)`` spans of whole
+    inverters, each closed once it holds at least `part_rows` rows."""
+    if part_rows < 1:
+        raise ValueError("part_rows must be >= 1")
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    for boundary in (np.flatnonzero(keys[1:] != keys[:-1]) + 1).tolist():
+        if boundary - start >= part_rows:
+            spans.append((start, boundary))
+            start = boundary
+    if start < len(keys):
+        spans.append((start, len(keys)))
+    return spans
+
+
+def _init_worker(backend: str, bundle_dir: str, n_jobs: Optional[int]) -> None:
+    global _bundle
+    configure_logging()
+    _bundle = ModelBundle.load(backend, Path(bundle_dir))
+    if n_jobs is not None:
+        _bundle.set_n_jobs(n_jobs)
+
+
+def _score_part(
+    name: str, start: int, stop: int, data_dir: str, out_dir: str, batch_rows: int
+) -> Dict[str, Any]:
+    """Score rows ``[start, stop)`` of the shared data into `out_dir/name`."""
+    assert _bundle is not None, "worker not initialized"
+    begin = time.perf_counter()
+    data = Path(data_dir)
+    X = np.load(data / "X.npy", mmap_mode="r")[start:stop]
+    codes = np.load(data / "keys.npy", mmap_mode="r")[start:stop]
+    key_names = json.loads((data / "keys.json").read_text())
+
+    n_rows = stop - start
+    class_names = _bundle.classifier.class_names
+    efficiency = np.empty(n_rows, dtype=np.float32)
+    anomaly_score = np.empty(n_rows, dtype=np.float32)
+    anomaly_label = np.empty(n_rows, dtype=np.int8)
+    risk_label = np.empty(n_rows, dtype=np.int8)
+    risk_proba = np.empty((n_rows, len(class_names)), dtype=np.float32)
+
+    part_keys, local_codes = np.unique(codes, return_inverse=True)
+    shard_of_key = [_bundle.shard_for(key_names[code]) for code in part_keys]
+    for shard in dict.fromkeys(shard_of_key):
+        bundle = _bundle.shard_bundle(shard)
+        in_shard = [i for i, s in enumerate(shard_of_key) if s == shard]
+        rows = np.flatnonzero(np.isin(local_codes, in_shard))
+        for offset in range(0, len(rows), batch_rows):
+            batch = rows[offset : offset + batch_rows]
+            # Fancy indexing copies, so scaling in place leaves X untouched.
+            scores = bundle.score_arrays(bundle.scale(X[batch]))
+            efficiency[batch] = scores["efficiency_prediction"]
+            anomaly_score[batch] = scores["anomaly_score"]
+            anomaly_label[batch] = scores["anomaly_label"]
+            risk_label[batch] = scores["risk_label"]
+            risk_proba[batch] = scores["risk_proba"]
+
+    frame = pd.DataFrame(
+        {
+            "DATE_TIME": np.load(data / "times.npy", mmap_mode="r")[start:stop],
+            "SOURCE_KEY": pd.Categorical.from_codes(
+                local_codes, categories=[key_names[code] for code in part_keys]
+            ),
+            "efficiency_prediction": efficiency,
+            "anomaly_score": anomaly_score,
+            "anomaly_label": anomaly_label,
+            "risk_level": pd.Categorical.from_codes(risk_label, categories=class_names),
+            **{
+                f"risk_probability_{class_name}": risk_proba[:, i]
+                for i, class_name in enumerate(class_names)
+            },
+        }
+    )
+    save_dataset(frame, Path(out_dir) / name, meta={"start": start, "stop": stop})
+    return {"name": name, "rows": n_rows, "seconds": time.perf_counter() - begin}
+
+
+def _shared_dir() -> Optional[Path]:
+    return SHARED_MEMORY_DIR if SHARED_MEMORY_DIR.is_dir() else None
+
+
+def _write_job(output: Path, job: Dict[str, Any]) -> None:
+    tmp = output / f"{JOB_FILE}.tmp"
+    tmp.write_text(json.dumps(job, indent=2))
+    os.replace(tmp, output / JOB_FILE)
+
+
+def _open_job(
+    output: Path, identity: Dict[str, Any], spans: List[Tuple[int, int]]
+) -> Dict[str, Any]:
+    """The job recorded in `output` for the same inputs, or a new one.
+
+    Raises ValueError if `output` holds a job for another dataset or model.
+    """
+    path = output / JOB_FILE
+    if path.exists():
+        job = json.loads(path.read_text())
+        recorded = {key: job.get(key) for key in identity}
+        if recorded != identity:
+            raise ValueError(
+                f"{output} holds a scoring job for other inputs ({recorded}); "
+                "pass --restart to discard it"
+            )
+        return job
+    output.mkdir(parents=True, exist_ok=True)
+    job = {
+        **identity,
+        "parts": [
+            {"name": f"part-{i:05d}", "start": start, "stop": stop}
+            for i, (start, stop) in enumerate(spans)
+        ],
+        "complete": False,
+    }
+    _write_job(output, job)
+    return job
+
+
+def discard_job(output: Path) -> None:
+    """Remove the job file and parts of a scoring job from `output`."""
+    for path in output.glob("part-*"):
+        shutil.rmtree(path, ignore_errors=True)
+    for path in output.glob(".part-*.tmp"):
+        shutil.rmtree(path, ignore_errors=True)
+    (output / JOB_FILE).unlink(missing_ok=True)
+
+
+def score_dataset(
+    df: pd.DataFrame,
+    output: Path,
+    dataset_id: str,
+    backend: str = "joblib",
+    bundle_dir: Optional[Path] = None,
+    workers: Optional[int] = None,
+    part_rows: int = PART_ROWS,
+    batch_rows: int = BATCH_ROWS,
+) -> Dict[str, Any]:
+    """Score the engineered dataset `df` into `output`, resuming a job there.
+
+    `df` must be sorted by inverter (as `add_engineered_features` leaves
+    it); `dataset_id` identifies it for resuming. Parts run on a pool of
+    `workers` (default: all cores) single-threaded processes, or in this
+    process with one worker.
+    """
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend {backend!r}")
+    output = Path(output)
+    bundle_dir = (bundle_dir or current_bundle_dir()).resolve()
+    codes, key_names = pd.factorize(df["SOURCE_KEY"].astype(str), sort=False)
+    identity = {
+        "format_version": FORMAT_VERSION,
+        "dataset": dataset_id,
+        "rows": len(df),
+        "backend": backend,
+        "bundle": str(bundle_dir),
+        "model_version": bundle_version(backend, bundle_dir),
+    }
+    job = _open_job(output, identity, plan_parts(codes, part_rows))
+    for stale in output.glob(".part-*.tmp"):  # left by an interrupted run
+        shutil.rmtree(stale, ignore_errors=True)
+
+    todo = [p for p in job["parts"] if not (output / p["name"] / MANIFEST).exists()]
+    total_rows = len(df)
+    done_rows = total_rows - sum(p["stop"] - p["start"] for p in todo)
+    logger.info(
+        "Scoring %d rows of %d inverters in %d parts into %s (%d parts to go)",
+        total_rows,
+        len(key_names),
+        len(job["parts"]),
+        output,
+        len(todo),
+    )
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    begin = time.perf_counter()
+    scored_rows = 0
+    with tempfile.TemporaryDirectory(
+        prefix="solara-score-", dir=_shared_dir()
+    ) as data_dir:
+        if todo:
+            data = Path(data_dir)
+            np.save(data / "X.npy", df[FEATURE_COLUMNS].to_numpy(dtype=np.float32))
+            np.save(data / "keys.npy", codes.astype(np.int32))
+            np.save(data / "times.npy", df["DATE_TIME"].to_numpy())
+            (data / "keys.json").write_text(json.dumps(key_names.tolist()))
+
+        jobs = [
+            (p["name"], p["start"], p["stop"], data_dir, str(output), batch_rows)
+            for p in todo
+        ]
+
+        def report(result: Dict[str, Any]) -> None:
+            nonlocal scored_rows, done_rows
+            scored_rows += result["rows"]
+            done_rows += result["rows"]
+            elapsed = time.perf_counter() - begin
+            rate = scored_rows / elapsed if elapsed else 0.0
+            eta = (total_rows - done_rows) / rate if rate else float("nan")
+            logger.info(
+                "Scored %s (%d rows, %.1f s): %d/%d rows (%.1f%%), "
+                "%.0f rows/s, ETA %.0f s",
+                result["name"],
+                result["rows"],
+                result["seconds"],
+                done_rows,
+                total_rows,
+                100.0 * done_rows / total_rows if total_rows else 100.0,
+                rate,
+                eta,
+            )
+
+        init_args = (backend, str(bundle_dir), 1 if workers > 1 else None)
+        if workers > 1 and len(jobs) > 1:
+            pool = ProcessPoolExecutor(
+                max_workers=min(workers, len(jobs)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=init_args,
+            )
+            try:
+                futures = [pool.submit(_score_part, *args) for args in jobs]
+                for future in as_completed(futures):
+                    report(future.result())
+            finally:
+                # On errors and Ctrl-C, don't start the parts still queued.
+                pool.shutdown(cancel_futures=True)
+        elif jobs:
+            _init_worker(*init_args)
+            for args in jobs:
+                report(_score_part(*args))
+
+    wall = time.perf_counter() - begin
+    job["complete"] = True
+    _write_job(output, job)
+    logger.info(
+        "Scoring complete: %d rows in %s (%d scored in %.1f s this run)",
+        total_rows,
+        output,
+        scored_rows,
+        wall,
+    )
+    return {
+        "output": str(output),
+        "rows": total_rows,
+        "parts": len(job["parts"]),
+        "scored_rows": scored_rows,
+        "resumed_parts": len(job["parts"]) - len(todo),
+        "seconds": wall,
+        "rows_per_second": scored_rows / wall if wall else None,
+    }
+
+
+def load_scores(output: Path, mmap: bool = True) -> pd.DataFrame:
+    """Read the scores of a complete job in `output` as one DataFrame."""
+    output = Path(output)
+    job = json.loads((output / JOB_FILE).read_text())
+    if not job.get("complete"):
+        raise ValueError(f"Scoring job in {output} is not complete")
+    frames = [load_dataset(output / part["name"], mmap=mmap) for part in job["parts"]]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    # Parts have their own SOURCE_KEY categories, which concat drops.
+    df["SOURCE_KEY"] = df["SOURCE_KEY"].astype("category")
+    return df
+
+
+def main() -> None:
+    from .train import build_dataset
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--generation-csv", type=Path, required=True)
+    parser.add_argument("--weather-csv", type=Path, required=True)
+    parser.add_argument(
+        "--output", type=Path, required=True, help="Directory for the scores."
+    )
+    parser.add_argument(
+        "--bundle",
+        type=Path,
+        help="Model bundle directory (default: the one the job in --output "
+        "used, else the published one).",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=MODEL_BACKENDS,
+        default="joblib",
+        help="Models to score with; the native XGBoost models of the joblib "
+        "backend are faster on large batches than the compiled arrays.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Parts scored in parallel (one core each).",
+    )
+    parser.add_argument(
+        "--part-rows",
+        type=int,
+        default=PART_ROWS,
+        help="Rows per part: the unit of parallelism and of checkpointing.",
+    )
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=BATCH_ROWS,
+        help="Rows per model call within a part.",
+    )
+    parser.add_argument("--chunksize", type=int)
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Discard a previous job in --output instead of resuming it.",
+    )
+    args = parser.parse_args()
+    configure_logging()
+
+    if args.restart:
+        discard_job(args.output)
+    bundle_dir = args.bundle
+    if bundle_dir is None and (args.output / JOB_FILE).exists():
+        bundle_dir = Path(json.loads((args.output / JOB_FILE).read_text())["bundle"])
+
+    df = build_dataset(
+        args.generation_csv,
+        args.weather_csv,
+        args.chunksize,
+        cache_dir=None if args.no_cache else args.cache_dir,
+    )
+    try:
+        summary = score_dataset(
+            df,
+            args.output,
+            dataset_key(
+                args.generation_csv, args.weather_csv, args.chunksize, args.cache_dir
+            ),
+            backend=args.backend,
+            bundle_dir=bundle_dir,
+            workers=args.workers,
+            part_rows=args.part_rows,
+            batch_rows=args.batch_rows,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
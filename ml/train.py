@@ -1,50 +1,207 @@
 from __future__ import annotations
 
 import argparse
+import json
+import os
+import shutil
 from pathlib import Path
+from typing import Any, Dict, Optional
 
 import numpy as np
 import pandas as pd
 from sklearn.metrics import f1_score, mean_absolute_error, mean_squared_error
+from sklearn.preprocessing import StandardScaler
 
 from .anomaly_model import AnomalyDetector
 from .classifier_model import FailureRiskClassifier, efficiency_to_risk_label
+from .compiled_models import (
+    compile_isolation_forest,
+    compile_scaler,
+    compile_xgboost_classifier,
+    compile_xgboost_regressor,
+    save_compiled,
+    write_compiled_manifest,
+)
 from .data_loader import load_generation_and_weather
-from .feature_engineering import FEATURE_COLUMNS, add_engineered_features
+from .dataset_cache import CACHE_DIR, cached_dataset
+from .feature_engineering import (
+    FEATURE_COLUMNS,
+    FEATURE_VERSION,
+    ROLLING_WINDOW,
+    add_engineered_features,
+)
 from .efficiency_model import EfficiencyRegressor
-from .preprocessing import basic_cleaning, fit_scaler
-from .utils import get_logger
+from .incremental import (
+    ANOMALY_WINDOW_DAYS,
+    RAW_COLUMNS,
+    after_watermarks,
+    continue_boosting,
+    csv_sizes,
+    csv_sources,
+    describe_rows,
+    inverter_watermarks,
+    load_anomaly_window,
+    load_history_tail,
+    read_manifest,
+    remap_split_thresholds,
+    resume_offsets,
+    save_anomaly_window,
+    save_history_tail,
+    total_rounds,
+    update_anomaly_window,
+    write_manifest,
+)
+from .model_bundle import (
+    ANOMALY_MODEL_FILE,
+    BUNDLES_DIR,
+    CLASSIFIER_MODEL_FILE,
+    COMPILED_SUBDIR,
+    EFFICIENCY_MODEL_FILE,
+    SCALER_FILE,
+    SHARD_MAP,
+    SHARDS_SUBDIR,
+    current_bundle_dir,
+    new_bundle_dir,
+    prune_bundles,
+    publish_bundle,
+)
+from .preprocessing import basic_cleaning, fit_scaler, load_scaler
+from .training_scheduler import SHARD_STRATEGIES, assign_shards, fit_models, fit_shards
+from .utils import configure_logging, get_logger
 
 
 logger = get_logger(__name__)
 
-ROOT = Path(__file__).resolve().parent.parent
-MODELS_DIR = ROOT / "models"
-SCALER_PATH = MODELS_DIR / "scaler.pkl"
-ANOMALY_MODEL_PATH = MODELS_DIR / "anomaly_model.pkl"
-EFFICIENCY_MODEL_PATH = MODELS_DIR / "efficiency_model.pkl"
-CLASSIFIER_MODEL_PATH = MODELS_DIR / "classifier_model.pkl"
+KEEP_BUNDLES = 3
+EXTRA_ROUNDS = 50
 
 
 def build_dataset(
     generation_csv: Path,
     weather_csv: Path,
+    chunksize: Optional[int] = None,
+    cache_dir: Optional[Path] = CACHE_DIR,
+    refresh_cache: bool = False,
 ) -> pd.DataFrame:
-    df = load_generation_and_weather(generation_csv, weather_csv)
-    df = basic_cleaning(df)
-    df = add_engineered_features(df)
-    return df
+    """Load, clean and engineer the training dataset.
 
+    With `cache_dir`, the result is cached there as memory-mappable
+    columns keyed by the input files' content and `FEATURE_VERSION`, and
+    later calls on the same inputs load it instead of rebuilding it.
+    """
 
-def train_models(
-    df: pd.DataFrame,
+    def build() -> pd.DataFrame:
+        df = load_generation_and_weather(
+            generation_csv, weather_csv, chunksize=chunksize
+        )
+        df = basic_cleaning(df)
+        return add_engineered_features(df)
+
+    if cache_dir is None:
+        return build()
+    return cached_dataset(
+        build,
+        generation_csv,
+        weather_csv,
+        chunksize=chunksize,
+        cache_dir=cache_dir,
+        refresh=refresh_cache,
+    )
+
+
+def export_compiled_models(
+    scaler: StandardScaler,
+    eff_model: EfficiencyRegressor,
+    clf: FailureRiskClassifier,
+    anomaly: AnomalyDetector,
+    compiled_dir: Path,
 ) -> None:
-    # Prepare regression target: future efficiency (shifted by 1 timestep)
+    """Export fitted models as array-backed ensembles for NumPy-only serving,
+    plus the manifest describing them."""
+    save_compiled(compile_scaler(scaler), compiled_dir / "scaler")
+    save_compiled(compile_xgboost_regressor(eff_model.model), compiled_dir / "efficiency")
+    save_compiled(
+        compile_xgboost_classifier(clf.model, clf.class_names),
+        compiled_dir / "classifier",
+    )
+    save_compiled(compile_isolation_forest(anomaly.model), compiled_dir / "anomaly")
+    write_compiled_manifest(compiled_dir, FEATURE_COLUMNS)
+    logger.info("Exported compiled models under %s", compiled_dir)
+
+
+def export_saved_models(bundle_dir: Optional[Path] = None) -> None:
+    """Compile the models saved in `bundle_dir` (default: the published one)."""
+    bundle_dir = bundle_dir or current_bundle_dir()
+    export_compiled_models(
+        load_scaler(bundle_dir / SCALER_FILE),
+        EfficiencyRegressor.load(bundle_dir / EFFICIENCY_MODEL_FILE),
+        FailureRiskClassifier.load(bundle_dir / CLASSIFIER_MODEL_FILE),
+        AnomalyDetector.load(bundle_dir / ANOMALY_MODEL_FILE),
+        bundle_dir / COMPILED_SUBDIR,
+    )
+
+
+def _add_efficiency_target(df: pd.DataFrame) -> pd.DataFrame:
+    """Prepare regression target: future efficiency (shifted by 1 timestep).
+
+    The last reading of each inverter has no target and is dropped.
+    """
     df = df.sort_values(["SOURCE_KEY", "DATE_TIME"]).reset_index(drop=True)
     df["efficiency_target"] = (
-        df.groupby("SOURCE_KEY")["efficiency"].shift(-1)
+        df.groupby("SOURCE_KEY", observed=True)["efficiency"].shift(-1)
     )
-    df = df.dropna(subset=["efficiency_target"]).reset_index(drop=True)
+    return df.dropna(subset=["efficiency_target"]).reset_index(drop=True)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _finish_bundle(bundle_dir: Path, publish: bool) -> None:
+    logger.info("Training complete. Models saved under %s", bundle_dir)
+    if publish:
+        publish_bundle(bundle_dir)
+        prune_bundles(KEEP_BUNDLES)
+
+
+def train_models(
+    df: pd.DataFrame,
+    publish: bool = True,
+    anomaly_window_days: float = ANOMALY_WINDOW_DAYS,
+    parallel: bool = True,
+    cores: Optional[int] = None,
+    shard_by: Optional[str] = None,
+    n_shards: int = 8,
+    min_shard_rows: int = 500,
+    hyperparams: Optional[Dict[str, Dict[str, Any]]] = None,
+    sources: Optional[Dict[str, Any]] = None,
+) -> Path:
+    """Fit all models and save them as a new bundle under `models/bundles/`.
+
+    With `parallel`, the three models are fit at once in worker processes
+    that split `cores` (default: all) between them; see
+    `ml.training_scheduler`.
+
+    With `shard_by` ("source_key" or "cluster"), a complete set of models
+    is also fit per inverter or per cluster of `n_shards` similar inverters
+    (see `assign_shards`); serving routes each inverter to its shard and
+    falls back to the global models for the rest.
+
+    `hyperparams` overrides estimator parameters per model ("efficiency",
+    "classifier", "anomaly"), e.g. the `best_params.json` of `ml.tune`.
+
+    The bundle also gets the state `train_incremental` continues from (see
+    `ml.incremental`), including `sources` (from `csv_sources`) if the
+    CSVs can be resumed from. It is published (made the one servers load) only
+    after every file is written, unless `publish` is False. Returns the
+    bundle path.
+    """
+    bundle_dir = new_bundle_dir()
+    history = df
+    df = _add_efficiency_target(df)
 
     feature_cols = FEATURE_COLUMNS
     X = df[feature_cols].astype("float32")
@@ -52,56 +209,248 @@ def train_models(
 
     # Train-test split by time (80/20)
     split_idx = int(0.8 * len(df))
-    X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
-    y_train, y_test = y_eff.iloc[:split_idx], y_eff.iloc[split_idx:]
+    X_train = X.iloc[:split_idx]
+    y_test = y_eff.iloc[split_idx:]
 
     # Fit scaler on training data only
     scaler = fit_scaler(
         df=X_train,
         feature_columns=feature_cols,
-        scaler_path=SCALER_PATH,
+        scaler_path=bundle_dir / SCALER_FILE,
     )
-    X_train_s = scaler.transform(X_train.values)
-    X_test_s = scaler.transform(X_test.values)
+    # The training rows are the first split_idx rows of the scaled matrix.
+    X_all_scaled = scaler.transform(X.values)
+    X_test_s_df = pd.DataFrame(X_all_scaled[split_idx:], columns=feature_cols)
+    y_risk = df["efficiency_target"].apply(efficiency_to_risk_label).astype(int)
+    y_risk_test = y_risk.iloc[split_idx:]
 
-    X_train_s_df = pd.DataFrame(X_train_s, columns=feature_cols)
-    X_test_s_df = pd.DataFrame(X_test_s, columns=feature_cols)
+    # Efficiency regression, failure risk classification and anomaly
+    # detection (on the full dataset) are fit concurrently.
+    fit_report = fit_models(
+        X_all_scaled,
+        y_eff.to_numpy(),
+        y_risk.to_numpy(),
+        split_idx,
+        bundle_dir,
+        cores=cores,
+        parallel=parallel,
+        hyperparams=hyperparams,
+    )
+    eff_model = EfficiencyRegressor.load(bundle_dir / EFFICIENCY_MODEL_FILE)
+    clf = FailureRiskClassifier.load(bundle_dir / CLASSIFIER_MODEL_FILE)
+    anomaly = AnomalyDetector.load(bundle_dir / ANOMALY_MODEL_FILE)
 
-    # Efficiency regression
-    eff_model = EfficiencyRegressor()
-    eff_model.fit(X_train_s_df, y_train)
     y_pred_eff = eff_model.predict(X_test_s_df)
-
     rmse = float(np.sqrt(mean_squared_error(y_test, y_pred_eff)))
     mae = float(mean_absolute_error(y_test, y_pred_eff))
     logger.info("Efficiency model RMSE=%.5f, MAE=%.5f", rmse, mae)
 
-    # Failure risk classification
-    y_risk = df["efficiency_target"].apply(efficiency_to_risk_label).astype(int)
-    y_risk_train, y_risk_test = y_risk.iloc[:split_idx], y_risk.iloc[split_idx:]
-
-    clf = FailureRiskClassifier()
-    clf.fit(X_train_s_df, y_risk_train)
     y_risk_pred = clf.predict_label(X_test_s_df)
-
     f1 = float(f1_score(y_risk_test, y_risk_pred, average="weighted"))
     logger.info("Failure risk classifier F1-score=%.5f", f1)
 
-    # Anomaly detection (using same scaled features, full dataset)
-    X_all_scaled = scaler.transform(X.values)
-    X_all_scaled_df = pd.DataFrame(X_all_scaled, columns=feature_cols)
+    export_compiled_models(
+        scaler, eff_model, clf, anomaly, bundle_dir / COMPILED_SUBDIR
+    )
 
-    anomaly = AnomalyDetector()
-    anomaly.fit(X_all_scaled_df)
+    shard_report = None
+    if shard_by is not None:
+        routes = assign_shards(df, shard_by, n_shards, min_shard_rows)
+        if routes:
+            shard_report = fit_shards(
+                df, routes, bundle_dir, shard_by, cores=cores, hyperparams=hyperparams
+            )
 
-    # Persist all models
-    MODELS_DIR.mkdir(parents=True, exist_ok=True)
-    eff_model.save(EFFICIENCY_MODEL_PATH)
-    clf.save(CLASSIFIER_MODEL_PATH)
-    anomaly.save(ANOMALY_MODEL_PATH)
+    # State for incremental runs
+    save_history_tail(history, bundle_dir)
+    window = update_anomaly_window(None, history, anomaly_window_days)
+    save_anomaly_window(window, bundle_dir)
+    write_manifest(
+        bundle_dir,
+        run={
+            "bundle": bundle_dir.name,
+            "mode": "full",
+            **describe_rows(history),
+            "metrics": {"rmse": rmse, "mae": mae, "f1": f1},
+            "fit": fit_report,
+            "shards": shard_report,
+            "hyperparams": hyperparams,
+        },
+        data_end=str(history["DATE_TIME"].max()),
+        scaler_samples=int(scaler.n_samples_seen_),
+        efficiency_rounds=total_rounds(eff_model.model),
+        classifier_rounds=total_rounds(clf.model),
+        anomaly_window_days=anomaly_window_days,
+        anomaly_window_rows=len(window),
+        sources=sources,
+    )
 
-    logger.info("Training complete. Models saved under %s", MODELS_DIR)
     logger.info("Metrics -> RMSE: %.5f | MAE: %.5f | F1: %.5f", rmse, mae, f1)
+    _finish_bundle(bundle_dir, publish)
+    return bundle_dir
+
+
+def train_incremental(
+    df: pd.DataFrame,
+    extra_rounds: int = EXTRA_ROUNDS,
+    anomaly_window_days: Optional[float] = None,
+    publish: bool = True,
+    parent_dir: Optional[Path] = None,
+    sources: Optional[Dict[str, Any]] = None,
+) -> Optional[Path]:
+    """Update the models of `parent_dir` (default: the published bundle)
+    with the readings of `df` newer than anything it was trained on.
+
+    `df` is the cleaned, not yet engineered data (`basic_cleaning` output);
+    rows at or before the last trained timestamp of their inverter are
+    ignored, so it may be all readings or only those read since the parent
+    (see `resume_offsets`), and an inverter that reports late still gets
+    its readings trained on. The scaler
+    is updated with `partial_fit`, both XGBoost models get `extra_rounds`
+    more trees fit on the new rows, and the IsolationForest is refit on the
+    last `anomaly_window_days`. Returns the new bundle, or None when there
+    is nothing new to train on.
+    """
+    import joblib
+
+    parent_dir = parent_dir or current_bundle_dir()
+    parent = read_manifest(parent_dir)
+    if (
+        parent["feature_version"] != FEATURE_VERSION
+        or parent["rolling_window"] != ROLLING_WINDOW
+    ):
+        raise ValueError(
+            f"Bundle {parent_dir.name} was trained with different features; "
+            "run a full training"
+        )
+    if anomaly_window_days is None:
+        anomaly_window_days = parent["anomaly_window_days"]
+
+    tail = load_history_tail(parent_dir)
+    watermarks = inverter_watermarks(tail)
+    new = df.loc[after_watermarks(df, watermarks), RAW_COLUMNS].copy()
+    if new.empty:
+        logger.info("No readings newer than the parent's; nothing to train")
+        return None
+    new["SOURCE_KEY"] = new["SOURCE_KEY"].astype(str)
+
+    # Engineer the new readings with each inverter's previous ones in front,
+    # so their rolling windows match a full run.
+    raw = pd.concat([tail, new], ignore_index=True)
+    engineered = add_engineered_features(raw)
+    is_new = after_watermarks(engineered, watermarks)
+    history = engineered[is_new].reset_index(drop=True)
+    # Train on rows whose target is a new reading: the new rows and the last
+    # old reading of each inverter, which had no target in the parent run.
+    df = engineered.copy()
+    df["is_new"] = is_new
+    grouped = df.groupby("SOURCE_KEY", observed=True)
+    df["efficiency_target"] = grouped["efficiency"].shift(-1)
+    next_is_new = grouped["is_new"].shift(-1, fill_value=False).to_numpy(dtype=bool)
+    df = df[next_is_new].drop(columns="is_new").reset_index(drop=True)
+
+    X = df[FEATURE_COLUMNS].astype("float32").values
+    y_eff = df["efficiency_target"].astype("float32").values
+    y_risk = df["efficiency_target"].apply(efficiency_to_risk_label).astype(int).values
+    logger.info(
+        "Incremental run on %d new readings (%d training rows) of %d inverters",
+        len(history),
+        len(df),
+        history["SOURCE_KEY"].nunique(),
+    )
+
+    scaler = load_scaler(parent_dir / SCALER_FILE)
+    eff_model = EfficiencyRegressor.load(parent_dir / EFFICIENCY_MODEL_FILE)
+    clf = FailureRiskClassifier.load(parent_dir / CLASSIFIER_MODEL_FILE)
+
+    # How the parent models do on data they have not seen
+    X_prior_s = scaler.transform(X)
+    prior_eff = eff_model.model.predict(X_prior_s)
+    prior_metrics = {
+        "rmse": float(np.sqrt(mean_squared_error(y_eff, prior_eff))),
+        "mae": float(mean_absolute_error(y_eff, prior_eff)),
+        "f1": float(
+            f1_score(y_risk, clf.model.predict(X_prior_s), average="weighted")
+        ),
+    }
+    logger.info(
+        "Parent metrics on new rows -> RMSE: %.5f | MAE: %.5f | F1: %.5f",
+        prior_metrics["rmse"],
+        prior_metrics["mae"],
+        prior_metrics["f1"],
+    )
+
+    # Update the scaler, and move the trees' thresholds with it
+    old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+    scaler.partial_fit(X)
+    for model in (eff_model.model, clf.model):
+        remap_split_thresholds(
+            model, old_mean, old_scale, scaler.mean_, scaler.scale_
+        )
+    X_s = scaler.transform(X)
+    drift = float(np.abs(eff_model.model.predict(X_s) - prior_eff).max())
+    logger.info("Largest prediction change from threshold remap: %.3g", drift)
+
+    continue_boosting(eff_model.model, X_s, y_eff, extra_rounds)
+    continue_boosting(
+        clf.model, X_s, y_risk, extra_rounds, num_class=len(clf.class_names)
+    )
+
+    window = update_anomaly_window(
+        load_anomaly_window(parent_dir), history, anomaly_window_days
+    )
+    anomaly = AnomalyDetector()
+    anomaly.fit(
+        pd.DataFrame(
+            scaler.transform(window[FEATURE_COLUMNS].values), columns=FEATURE_COLUMNS
+        )
+    )
+
+    # A late inverter's readings can be older than the parent's newest.
+    data_end = max(history["DATE_TIME"].max(), pd.Timestamp(parent["data_end"]))
+    bundle_dir = new_bundle_dir()
+    joblib.dump(scaler, bundle_dir / SCALER_FILE)
+    eff_model.save(bundle_dir / EFFICIENCY_MODEL_FILE)
+    clf.save(bundle_dir / CLASSIFIER_MODEL_FILE)
+    anomaly.save(bundle_dir / ANOMALY_MODEL_FILE)
+    export_compiled_models(
+        scaler, eff_model, clf, anomaly, bundle_dir / COMPILED_SUBDIR
+    )
+
+    if (parent_dir / SHARD_MAP).exists():
+        # Shard models are not updated incrementally; the new bundle keeps
+        # serving the parent's (hard-linked, not copied).
+        logger.info("Carrying over the shards of %s unchanged", parent_dir.name)
+        shutil.copytree(
+            parent_dir / SHARDS_SUBDIR,
+            bundle_dir / SHARDS_SUBDIR,
+            copy_function=_link_or_copy,
+        )
+        shutil.copy2(parent_dir / SHARD_MAP, bundle_dir / SHARD_MAP)
+
+    save_history_tail(raw, bundle_dir)
+    save_anomaly_window(window, bundle_dir)
+    write_manifest(
+        bundle_dir,
+        run={
+            "bundle": bundle_dir.name,
+            "mode": "incremental",
+            "parent": parent_dir.name,
+            **describe_rows(history),
+            "extra_rounds": extra_rounds,
+            "parent_metrics_on_new_rows": prior_metrics,
+        },
+        parent=parent,
+        data_end=str(data_end),
+        scaler_samples=int(scaler.n_samples_seen_),
+        efficiency_rounds=total_rounds(eff_model.model),
+        classifier_rounds=total_rounds(clf.model),
+        anomaly_window_days=anomaly_window_days,
+        anomaly_window_rows=len(window),
+        sources=sources,
+    )
+    _finish_bundle(bundle_dir, publish)
+    return bundle_dir
 
 
 def main() -> None:
@@ -111,20 +460,166 @@ def main() -> None:
     parser.add_argument(
         "--generation-csv",
         type=Path,
-        required=True,
         help="Path to solar generation CSV (Kaggle dataset).",
     )
     parser.add_argument(
         "--weather-csv",
         type=Path,
-        required=True,
         help="Path to solar weather CSV (Kaggle dataset).",
     )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        help="Stream the CSVs (sorted by DATE_TIME) in chunks of this many rows.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=CACHE_DIR,
+        help="Directory for the cached engineered dataset.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always rebuild the dataset from the CSVs and do not cache it.",
+    )
+    parser.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="Rebuild the dataset and overwrite its cache entry.",
+    )
+    parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="Fit the models one after another instead of in parallel.",
+    )
+    parser.add_argument(
+        "--train-cores",
+        type=int,
+        help="Cores to split between the parallel fits (default: all).",
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=SHARD_STRATEGIES,
+        help="Also train models per inverter (source_key) or per cluster of "
+        "similar inverters (cluster).",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=8,
+        help="Number of inverter clusters for --shard-by cluster.",
+    )
+    parser.add_argument(
+        "--min-shard-rows",
+        type=int,
+        default=500,
+        help="Shards with fewer rows are served by the global models.",
+    )
+    parser.add_argument(
+        "--hyperparams",
+        type=Path,
+        help="JSON of estimator parameters per model (from `python -m ml.tune`).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Continue the published bundle with the readings newer than it.",
+    )
+    parser.add_argument(
+        "--extra-rounds",
+        type=int,
+        default=EXTRA_ROUNDS,
+        help="Boosting rounds to add per XGBoost model in an incremental run.",
+    )
+    parser.add_argument(
+        "--anomaly-window-days",
+        type=float,
+        help="Days of recent data the anomaly model is fit on "
+        f"(default: {ANOMALY_WINDOW_DAYS}, or the parent bundle's setting).",
+    )
+    parser.add_argument(
+        "--compile-only",
+        action="store_true",
+        help="Skip training and export the saved models to the compiled format.",
+    )
+    parser.add_argument(
+        "--no-publish",
+        action="store_true",
+        help="Write the new model bundle without making servers load it.",
+    )
+    parser.add_argument(
+        "--publish",
+        metavar="BUNDLE",
+        help="Skip training and publish an existing bundle (e.g. to roll back).",
+    )
 
     args = parser.parse_args()
+    configure_logging()
+    if args.publish:
+        publish_bundle(BUNDLES_DIR / args.publish)
+        return
+    if args.compile_only:
+        export_saved_models()
+        return
+    if args.generation_csv is None or args.weather_csv is None:
+        parser.error("--generation-csv and --weather-csv are required for training")
+
+    # Chunked loading checks that both CSVs are sorted by DATE_TIME, which
+    # resuming from a byte offset relies on.
+    sizes = None
+    if args.chunksize:
+        sizes = csv_sizes(args.generation_csv, args.weather_csv)
+
+    def sources() -> Optional[Dict[str, Any]]:
+        if sizes is None:
+            return None
+        return csv_sources(args.generation_csv, args.weather_csv, sizes)
 
-    df = build_dataset(args.generation_csv, args.weather_csv)
-    train_models(df)
+    if args.incremental:
+        offsets = None
+        if args.chunksize:
+            offsets = resume_offsets(
+                read_manifest(current_bundle_dir()),
+                args.generation_csv,
+                args.weather_csv,
+            )
+        df = load_generation_and_weather(
+            args.generation_csv,
+            args.weather_csv,
+            chunksize=args.chunksize,
+            offsets=offsets,
+        )
+        train_incremental(
+            basic_cleaning(df),
+            extra_rounds=args.extra_rounds,
+            anomaly_window_days=args.anomaly_window_days,
+            publish=not args.no_publish,
+            sources=sources(),
+        )
+        return
+
+    df = build_dataset(
+        args.generation_csv,
+        args.weather_csv,
+        args.chunksize,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        refresh_cache=args.refresh_cache,
+    )
+    train_models(
+        df,
+        publish=not args.no_publish,
+        anomaly_window_days=args.anomaly_window_days or ANOMALY_WINDOW_DAYS,
+        parallel=not args.sequential,
+        cores=args.train_cores,
+        shard_by=args.shard_by,
+        n_shards=args.shards,
+        min_shard_rows=args.min_shard_rows,
+        hyperparams=(
+            json.loads(args.hyperparams.read_text()) if args.hyperparams else None
+        ),
+        sources=sources(),
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,422 @@
+"""Run the model fits of a training run concurrently in worker processes.
+
+The feature matrix and targets are written once as `.npy` files (in
+`/dev/shm` when available) and memory-mapped by every worker, so they are
+not pickled to each process. Each fit gets an explicit core budget instead
+of `n_jobs=-1`, so concurrent models do not oversubscribe the machine.
+
+`fit_models` fits the three global models side by side; `fit_shards` fits a
+complete set of models per shard of inverters across a process pool.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .anomaly_model import AnomalyDetector
+from .classifier_model import FailureRiskClassifier, efficiency_to_risk_label
+from .efficiency_model import EfficiencyRegressor
+from .feature_engineering import FEATURE_COLUMNS
+from .model_bundle import (
+    ANOMALY_MODEL_FILE,
+    CLASSIFIER_MODEL_FILE,
+    COMPILED_SUBDIR,
+    EFFICIENCY_MODEL_FILE,
+    SCALER_FILE,
+    SHARD_MAP,
+    SHARDS_SUBDIR,
+)
+from .utils import configure_logging, get_logger
+
+
+logger = get_logger(__name__)
+
+# name -> (model class, target array or None, fit on the training rows only,
+# model file, relative cost used to split cores)
+MODEL_FITS = {
+    "efficiency": (EfficiencyRegressor, "y_eff", True, EFFICIENCY_MODEL_FILE, 2),
+    # Multi-class boosting grows one tree per class and round.
+    "classifier": (FailureRiskClassifier, "y_risk", True, CLASSIFIER_MODEL_FILE, 3),
+    "anomaly": (AnomalyDetector, None, False, ANOMALY_MODEL_FILE, 1),
+}
+SHARED_MEMORY_DIR = Path("/dev/shm")
+SHARD_STRATEGIES = ("source_key", "cluster")
+# Per-inverter summary used to cluster inverters with similar hardware.
+CLUSTER_PROFILE_COLUMNS = [
+    "efficiency",
+    "dc_ac_ratio",
+    "thermal_stress",
+    "AC_POWER",
+    "IRRADIATION",
+]
+
+
+def core_budgets(total_cores: Optional[int] = None) -> Dict[str, int]:
+    """Split `total_cores` (default: all) between the fits by their cost.
+
+    Every fit gets at least one core, so with fewer cores than models the
+    machine is oversubscribed by at most `len(MODEL_FITS) - total_cores`.
+    """
+    total = max(1, total_cores or os.cpu_count() or 1)
+    weights = {name: spec[4] for name, spec in MODEL_FITS.items()}
+    weight_sum = sum(weights.values())
+    budgets = {
+        name: max(1, total * weight // weight_sum) for name, weight in weights.items()
+    }
+    while sum(budgets.values()) < total:
+        name = max(weights, key=lambda n: weights[n] / budgets[n])
+        budgets[name] += 1
+    return budgets
+
+
+def _shared_dir() -> Optional[Path]:
+    return SHARED_MEMORY_DIR if SHARED_MEMORY_DIR.is_dir() else None
+
+
+def _fit_one(
+    name: str,
+    data_dir: str,
+    split_idx: int,
+    n_jobs: int,
+    model_path: str,
+    params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Fit and save one model from the memory-mapped arrays in `data_dir`."""
+    from threadpoolctl import threadpool_limits
+
+    start = time.perf_counter()
+    model_cls, target, train_only, _, _ = MODEL_FITS[name]
+    X = np.load(Path(data_dir) / "X.npy", mmap_mode="r")
+    rows = slice(0, split_idx) if train_only else slice(None)
+    X_df = pd.DataFrame(X[rows], columns=FEATURE_COLUMNS, copy=False)
+
+    model = model_cls(params=params)
+    model.set_n_jobs(n_jobs)
+    with threadpool_limits(limits=n_jobs if n_jobs > 0 else None):
+        if target is None:
+            model.fit(X_df)
+        else:
+            y = np.load(Path(data_dir) / f"{target}.npy", mmap_mode="r")
+            model.fit(X_df, pd.Series(y[rows], copy=False))
+    model.save(Path(model_path))
+    return {
+        "model": name,
+        "n_jobs": n_jobs,
+        "seconds": time.perf_counter() - start,
+        "pid": os.getpid(),
+    }
+
+
+def fit_models(
+    X_scaled: np.ndarray,
+    y_eff: np.ndarray,
+    y_risk: np.ndarray,
+    split_idx: int,
+    bundle_dir: Path,
+    cores: Optional[int] = None,
+    parallel: bool = True,
+    hyperparams: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Fit the efficiency, classifier and anomaly models into `bundle_dir`.
+
+    `hyperparams` maps model names to estimator parameter overrides (the
+    `best_params.json` written by `python -m ml.tune`).
+
+    The supervised models are fit on the first `split_idx` rows of
+    `X_scaled`, the anomaly model on all of them. With `parallel`, each
+    fit runs in its own process with its `core_budgets` share; otherwise
+    they run one after another in this process, each using every core
+    (also the case on a single core, where workers would only add
+    overhead). Returns per-model wall times and the speedup over running them back to
+    back.
+    """
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    if parallel and (cores or os.cpu_count() or 1) < 2:
+        logger.info("Single core available; fitting models sequentially")
+        parallel = False
+    budgets = core_budgets(cores) if parallel else {name: -1 for name in MODEL_FITS}
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(
+        prefix="solara-train-", dir=_shared_dir()
+    ) as data_dir:
+        for array_name, array in (
+            ("X", X_scaled),
+            ("y_eff", y_eff),
+            ("y_risk", y_risk),
+        ):
+            np.save(Path(data_dir) / f"{array_name}.npy", np.ascontiguousarray(array))
+        hyperparams = hyperparams or {}
+        jobs = [
+            (
+                name,
+                data_dir,
+                split_idx,
+                budgets[name],
+                str(bundle_dir / spec[3]),
+                hyperparams.get(name),
+            )
+            for name, spec in MODEL_FITS.items()
+        ]
+        if parallel:
+            logger.info("Fitting models in parallel with core budgets %s", budgets)
+            with ProcessPoolExecutor(
+                max_workers=len(jobs),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=configure_logging,
+            ) as pool:
+                futures = [pool.submit(_fit_one, *job) for job in jobs]
+                results = [future.result() for future in futures]
+        else:
+            results = [_fit_one(*job) for job in jobs]
+    wall = time.perf_counter() - start
+
+    models = {result["model"]: result for result in results}
+    for result in results:
+        logger.info(
+            "Fit %s in %.2f s (n_jobs=%d)",
+            result["model"],
+            result["seconds"],
+            result["n_jobs"],
+        )
+    serial = sum(result["seconds"] for result in results)
+    logger.info(
+        "Fitted %d models in %.2f s wall (%.2f s back to back, speedup %.2fx)",
+        len(results),
+        wall,
+        serial,
+        serial / wall if wall else float("nan"),
+    )
+    return {
+        "parallel": parallel,
+        "wall_seconds": wall,
+        "serial_seconds": serial,
+        "speedup": serial / wall if wall else None,
+        "models": {
+            name: {"seconds": r["seconds"], "n_jobs": r["n_jobs"]}
+            for name, r in models.items()
+        },
+    }
+
+
+def assign_shards(
+    df: pd.DataFrame,
+    shard_by: str,
+    n_shards: int = 8,
+    min_rows: int = 500,
+) -> Dict[str, str]:
+    """Map each SOURCE_KEY of engineered `df` to a shard id.
+
+    `shard_by="source_key"` gives every inverter its own shard;
+    `"cluster"` groups inverters into `n_shards` k-means clusters of their
+    mean `CLUSTER_PROFILE_COLUMNS`. Shards with fewer than `min_rows` rows
+    are left out, so their inverters fall back to the global models.
+    """
+    if shard_by not in SHARD_STRATEGIES:
+        raise ValueError(
+            f"Unknown shard strategy {shard_by!r}; expected one of {SHARD_STRATEGIES}"
+        )
+    grouped = df.groupby("SOURCE_KEY", observed=True)
+    if shard_by == "source_key":
+        keys = sorted(str(key) for key in grouped.groups)
+        labels = np.arange(len(keys))
+    else:
+        from sklearn.cluster import KMeans
+        from sklearn.preprocessing import StandardScaler
+
+        profile = grouped[CLUSTER_PROFILE_COLUMNS].mean()
+        keys = [str(key) for key in profile.index]
+        n_clusters = max(1, min(n_shards, len(keys)))
+        labels = KMeans(n_clusters=n_clusters, n_init=10, random_state=42).fit_predict(
+            StandardScaler().fit_transform(profile.to_numpy(dtype=np.float64))
+        )
+    shard_ids = {key: f"shard-{label:03d}" for key, label in zip(keys, labels)}
+
+    rows = grouped.size()
+    shard_rows: Dict[str, int] = {}
+    for key, count in rows.items():
+        shard = shard_ids[str(key)]
+        shard_rows[shard] = shard_rows.get(shard, 0) + int(count)
+    small = {shard for shard, count in shard_rows.items() if count < min_rows}
+    if small:
+        logger.info(
+            "%d of %d shards have fewer than %d rows; their inverters use the "
+            "global models",
+            len(small),
+            len(shard_rows),
+            min_rows,
+        )
+    return {key: shard for key, shard in shard_ids.items() if shard not in small}
+
+
+def _shard_order(shard_ids: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Row order grouping rows by shard and sorting each shard by time.
+
+    Ties keep their input order (inverter, then time), so a shard of one
+    inverter keeps its rows as they are.
+    """
+    return np.lexsort((times, shard_ids))
+
+
+def _fit_shard(
+    shard: str,
+    data_dir: str,
+    start: int,
+    stop: int,
+    shard_dir: str,
+    hyperparams: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Fit scaler and all three models on rows [start, stop) of `data_dir`."""
+    from sklearn.metrics import mean_squared_error
+
+    from .preprocessing import fit_scaler
+    from .train import export_compiled_models
+
+    begin = time.perf_counter()
+    out = Path(shard_dir)
+    X = np.load(Path(data_dir) / "X.npy", mmap_mode="r")[start:stop]
+    y = pd.Series(np.load(Path(data_dir) / "y_eff.npy", mmap_mode="r")[start:stop])
+    # Rows are in time order (see `_shard_order`), so this is a split by time.
+    split = max(1, int(0.8 * len(X)))
+
+    X_df = pd.DataFrame(X, columns=FEATURE_COLUMNS, copy=False)
+    scaler = fit_scaler(X_df.iloc[:split], FEATURE_COLUMNS, out / SCALER_FILE)
+    X_s = pd.DataFrame(scaler.transform(X), columns=FEATURE_COLUMNS)
+    y_risk = y.apply(efficiency_to_risk_label).astype(int)
+
+    hyperparams = hyperparams or {}
+    eff_model = EfficiencyRegressor(params=hyperparams.get("efficiency"))
+    clf = FailureRiskClassifier(params=hyperparams.get("classifier"))
+    anomaly = AnomalyDetector(params=hyperparams.get("anomaly"))
+    for model in (eff_model, clf, anomaly):
+        model.set_n_jobs(1)
+    eff_model.fit(X_s.iloc[:split], y.iloc[:split])
+    clf.fit(X_s.iloc[:split], y_risk.iloc[:split])
+    anomaly.fit(X_s)
+
+    rmse = None
+    if split < len(X):
+        y_pred = eff_model.predict(X_s.iloc[split:])
+        rmse = float(np.sqrt(mean_squared_error(y.iloc[split:], y_pred)))
+
+    eff_model.save(out / EFFICIENCY_MODEL_FILE)
+    clf.save(out / CLASSIFIER_MODEL_FILE)
+    anomaly.save(out / ANOMALY_MODEL_FILE)
+    export_compiled_models(scaler, eff_model, clf, anomaly, out / COMPILED_SUBDIR)
+    return {
+        "shard": shard,
+        "rows": int(stop - start),
+        "rmse": rmse,
+        "seconds": time.perf_counter() - begin,
+    }
+
+
+def fit_shards(
+    df: pd.DataFrame,
+    routes: Dict[str, str],
+    bundle_dir: Path,
+    shard_by: str,
+    cores: Optional[int] = None,
+    hyperparams: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Fit one set of models per shard of `routes` into `bundle_dir`.
+
+    `df` is the engineered dataset with `efficiency_target`, sorted by
+    inverter and time. Each shard's rows are ordered by `DATE_TIME`, so its
+    80/20 split is by time even when it holds several inverters. Shards are
+    fit across a pool of `cores` (default:
+    all) single-threaded worker processes, in-process on a single core.
+    Writes `SHARD_MAP` last, so a bundle only routes to complete shards.
+    """
+    shard_of_row = df["SOURCE_KEY"].astype(str).map(routes)
+    df = df[shard_of_row.notna()]
+    shard_of_row = shard_of_row[shard_of_row.notna()]
+    order = _shard_order(shard_of_row.to_numpy(dtype=str), df["DATE_TIME"].to_numpy())
+    shard_ids = shard_of_row.to_numpy(dtype=str)[order]
+    boundaries = np.flatnonzero(shard_ids[1:] != shard_ids[:-1]) + 1
+    starts = np.r_[0, boundaries]
+    stops = np.r_[boundaries, len(shard_ids)]
+    spans: List[Tuple[str, int, int]] = [
+        (shard_ids[start], int(start), int(stop)) for start, stop in zip(starts, stops)
+    ]
+
+    workers = max(1, cores or os.cpu_count() or 1)
+    begin = time.perf_counter()
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(
+        prefix="solara-shards-", dir=_shared_dir()
+    ) as data_dir:
+        X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)[order]
+        np.save(Path(data_dir) / "X.npy", X)
+        y = df["efficiency_target"].to_numpy(dtype=np.float32)[order]
+        np.save(Path(data_dir) / "y_eff.npy", y)
+        del X, y
+        jobs = [
+            (
+                shard,
+                data_dir,
+                start,
+                stop,
+                str(bundle_dir / SHARDS_SUBDIR / shard),
+                hyperparams,
+            )
+            for shard, start, stop in spans
+        ]
+        logger.info(
+            "Fitting %d shards (%s) on %d rows with %d workers",
+            len(jobs),
+            shard_by,
+            len(shard_ids),
+            workers,
+        )
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(jobs)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=configure_logging,
+            ) as pool:
+                futures = [pool.submit(_fit_shard, *job) for job in jobs]
+                for future in as_completed(futures):
+                    results.append(future.result())
+        else:
+            results = [_fit_shard(*job) for job in jobs]
+    wall = time.perf_counter() - begin
+
+    serial = sum(result["seconds"] for result in results)
+    logger.info(
+        "Fitted %d shards in %.2f s wall (%.2f s of fits, speedup %.2fx)",
+        len(results),
+        wall,
+        serial,
+        serial / wall if wall else float("nan"),
+    )
+    shards = {
+        result["shard"]: {
+            "rows": result["rows"],
+            "inverters": sum(1 for s in routes.values() if s == result["shard"]),
+            "rmse": result["rmse"],
+            "seconds": result["seconds"],
+        }
+        for result in sorted(results, key=lambda r: r["shard"])
+    }
+    (bundle_dir / SHARD_MAP).write_text(
+        json.dumps({"shard_by": shard_by, "routes": routes, "shards": shards}, indent=2)
+    )
+    return {
+        "shard_by": shard_by,
+        "shards": len(shards),
+        "inverters": len(routes),
+        "wall_seconds": wall,
+        "serial_seconds": serial,
+        "speedup": serial / wall if wall else None,
+    }
@@ -0,0 +1,519 @@
+"""Hyperparameter search for the three models: `python -m ml.tune`.
+
+Trials are scored with time-split cross-validation (expanding window: each
+fold trains on everything before its validation block). Folds are rungs of
+a successive-halving schedule: after every fold only the best
+`keep_fraction` of the trials go on, so bad configurations are dropped
+after one cheap fit. XGBoost trials stop adding trees once the last 10% of
+their training rows stop improving (early stopping), and are trimmed to
+the best iteration.
+
+The engineered dataset comes from the dataset cache (see `build_dataset`);
+it is scaled once and shared with the worker processes as memory-mapped
+files. Finalists are then timed one at a time, with both the joblib and
+the compiled backend, on single rows and on batches, so the report shows
+accuracy against serving latency. `best_params.json` gets, per model, the
+fastest trial within `tolerance` of the best score; pass it to
+`python -m ml.train --hyperparams`.
+
+    python -m ml.tune --generation-csv gen.csv --weather-csv weather.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .anomaly_model import AnomalyDetector
+from .classifier_model import FailureRiskClassifier, efficiency_to_risk_label
+from .dataset_cache import CACHE_DIR
+from .efficiency_model import EfficiencyRegressor
+from .feature_engineering import FEATURE_COLUMNS
+from .model_bundle import (
+    ANOMALY_MODEL_FILE,
+    CLASSIFIER_MODEL_FILE,
+    EFFICIENCY_MODEL_FILE,
+)
+from .utils import configure_logging, get_logger
+
+
+logger = get_logger(__name__)
+
+MODEL_NAMES = ("efficiency", "classifier", "anomaly")
+MODEL_CLASSES = {
+    "efficiency": EfficiencyRegressor,
+    "classifier": FailureRiskClassifier,
+    "anomaly": AnomalyDetector,
+}
+# Whether a higher score is better: RMSE for the regressor, weighted F1 for
+# the classifier, label agreement with the default configuration for the
+# anomaly detector (it has no ground truth).
+HIGHER_IS_BETTER = {"efficiency": False, "classifier": True, "anomaly": True}
+METRIC_NAMES = {"efficiency": "rmse", "classifier": "f1", "anomaly": "agreement"}
+# Trial models are saved in the format of the bundle file they stand for.
+MODEL_FILES = {
+    "efficiency": EFFICIENCY_MODEL_FILE,
+    "classifier": CLASSIFIER_MODEL_FILE,
+    "anomaly": ANOMALY_MODEL_FILE,
+}
+
+_XGB_SPACE: Dict[str, List[Any]] = {
+    "max_depth": [2, 3, 4, 6, 8],
+    "learning_rate": [0.05, 0.1, 0.2, 0.3],
+    "subsample": [0.7, 0.85, 1.0],
+    "colsample_bytree": [0.7, 0.85, 1.0],
+    "min_child_weight": [1, 5, 20],
+}
+SEARCH_SPACES: Dict[str, Dict[str, List[Any]]] = {
+    "efficiency": _XGB_SPACE,
+    "classifier": _XGB_SPACE,
+    "anomaly": {
+        "n_estimators": [10, 25, 50, 100, 200],
+        "max_samples": [64, 128, 256, 512],
+        "max_features": [0.5, 0.75, 1.0],
+    },
+}
+MAX_ESTIMATORS = 400
+EARLY_STOPPING_ROUNDS = 20
+EARLY_STOPPING_FRACTION = 0.1
+LATENCY_BATCH = 1024
+
+
+def sample_trials(model: str, n_trials: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Trial 0 is the current defaults (no overrides, no early stopping);
+    the rest are distinct random draws from `SEARCH_SPACES[model]`."""
+    space = SEARCH_SPACES[model]
+    rng = random.Random(seed)
+    trials: List[Dict[str, Any]] = [{}]
+    seen = set()
+    n_combinations = math.prod(len(values) for values in space.values())
+    while len(trials) < min(n_trials, n_combinations + 1):
+        params = {name: rng.choice(values) for name, values in space.items()}
+        key = tuple(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            trials.append(params)
+    return trials
+
+
+def time_folds(n_rows: int, n_folds: int) -> List[Tuple[int, int]]:
+    """(validation start, validation end) of each expanding-window fold
+    over time-ordered rows; fold k trains on rows [0, start)."""
+    edges = np.linspace(0.5 * n_rows, n_rows, n_folds + 1).astype(int)
+    return [(int(edges[k]), int(edges[k + 1])) for k in range(n_folds)]
+
+
+def _fit_xgb(model: Any, params: Dict[str, Any], X: np.ndarray, y: np.ndarray) -> int:
+    """Fit `model` (an XGBoost wrapper) with early stopping unless `params`
+    is the baseline; trim it to the best iteration. Returns the tree count
+    per class."""
+    if not params:
+        model.model.fit(X, y)
+        return int(model.model.get_booster().num_boosted_rounds())
+    n_es = max(1, int(EARLY_STOPPING_FRACTION * len(X)))
+    model.model.set_params(
+        n_estimators=MAX_ESTIMATORS, early_stopping_rounds=EARLY_STOPPING_ROUNDS
+    )
+    model.model.fit(
+        X[:-n_es], y[:-n_es], eval_set=[(X[-n_es:], y[-n_es:])], verbose=False
+    )
+    rounds = int(model.model.best_iteration) + 1
+    trimmed = model.model.get_booster()[:rounds]
+    fresh = type(model.model)()
+    fresh.load_model(bytearray(trimmed.save_raw("ubj")))
+    model.model = fresh
+    return rounds
+
+
+def _run_trial(
+    model_name: str,
+    params: Dict[str, Any],
+    data_dir: str,
+    fold: Tuple[int, int],
+    fold_id: int,
+    save_path: Optional[str],
+) -> Dict[str, Any]:
+    """Fit one trial on one fold; save the fitted model if `save_path`."""
+    from sklearn.metrics import f1_score, mean_squared_error
+    from threadpoolctl import threadpool_limits
+
+    start = time.perf_counter()
+    data = Path(data_dir)
+    X = np.load(data / "X.npy", mmap_mode="r")
+    val_start, val_end = fold
+    X_train, X_val = np.asarray(X[:val_start]), np.asarray(X[val_start:val_end])
+
+    model = MODEL_CLASSES[model_name](params=params)
+    model.set_n_jobs(1)
+    rounds = None
+    try:
+        with threadpool_limits(limits=1):
+            if model_name == "anomaly":
+                model.fit(pd.DataFrame(X_train, columns=FEATURE_COLUMNS))
+                _, labels = model.predict(X_val)
+                reference = np.load(data / f"anomaly_reference_{fold_id}.npy")
+                score = float((labels == reference).mean())
+            else:
+                y = np.load(data / f"y_{model_name}.npy", mmap_mode="r")
+                rounds = _fit_xgb(model, params, X_train, np.asarray(y[:val_start]))
+                y_val = np.asarray(y[val_start:val_end])
+                if model_name == "efficiency":
+                    y_pred = model.predict(X_val)
+                    score = float(np.sqrt(mean_squared_error(y_val, y_pred)))
+                else:
+                    y_pred = model.predict_label(X_val)
+                    score = float(f1_score(y_val, y_pred, average="weighted"))
+    except Exception as exc:  # noqa: BLE001
+        return {"error": f"{type(exc).__name__}: {exc}"}
+    if save_path is not None:
+        model.save(Path(save_path))
+    return {
+        "score": score,
+        "rounds": rounds,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _trial_model_path(data_dir: Path, model_name: str, trial: int) -> Path:
+    suffix = Path(MODEL_FILES[model_name]).suffix
+    return data_dir / "models" / f"{model_name}-{trial}{suffix}"
+
+
+def _inference_fn(model_name: str, model: Any) -> Callable[[np.ndarray], Any]:
+    if model_name == "classifier":
+        return model.predict_with_proba
+    return model.predict
+
+
+def _median_seconds(fn: Callable[[], Any], repeats: int) -> float:
+    fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def measure_latency(
+    model_name: str, model_path: Path, X: np.ndarray, repeats: int = 200
+) -> Dict[str, float]:
+    """Median single-row latency and per-row batch latency in microseconds,
+    for the joblib model and its compiled export."""
+    from .compiled_models import (
+        compile_isolation_forest,
+        compile_xgboost_classifier,
+        compile_xgboost_regressor,
+    )
+
+    model = MODEL_CLASSES[model_name].load(model_path)
+    model.set_n_jobs(1)
+    if model_name == "efficiency":
+        compiled = compile_xgboost_regressor(model.model)
+    elif model_name == "classifier":
+        compiled = compile_xgboost_classifier(model.model, model.class_names)
+    else:
+        compiled = compile_isolation_forest(model.model)
+
+    row = np.ascontiguousarray(X[:1], dtype=np.float32)
+    batch = np.ascontiguousarray(
+        np.resize(X, (LATENCY_BATCH, X.shape[1])), dtype=np.float32
+    )
+    latency: Dict[str, float] = {}
+    for backend, candidate in (("joblib", model), ("compiled", compiled)):
+        fn = _inference_fn(model_name, candidate)
+        latency[f"{backend}_single_us"] = 1e6 * _median_seconds(
+            lambda: fn(row), repeats
+        )
+        latency[f"{backend}_batch_us_per_row"] = (
+            1e6 * _median_seconds(lambda: fn(batch), max(3, repeats // 20))
+        ) / LATENCY_BATCH
+    return latency
+
+
+def _prepare_data(df: pd.DataFrame, data_dir: Path) -> np.ndarray:
+    """Write the scaled, time-ordered matrix and targets to `data_dir`;
+    returns the scaled matrix."""
+    from sklearn.preprocessing import StandardScaler
+
+    df = df.sort_values(["SOURCE_KEY", "DATE_TIME"]).reset_index(drop=True)
+    df["efficiency_target"] = df.groupby("SOURCE_KEY", observed=True)[
+        "efficiency"
+    ].shift(-1)
+    df = df.dropna(subset=["efficiency_target"])
+    df = df.sort_values("DATE_TIME", kind="stable").reset_index(drop=True)
+
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    # As in training: fit on the first 80% of rows (here: by time).
+    scaler = StandardScaler().fit(X[: int(0.8 * len(X))])
+    X = scaler.transform(X).astype(np.float32)
+    np.save(data_dir / "X.npy", X)
+    y_eff = df["efficiency_target"].to_numpy(dtype=np.float32)
+    np.save(data_dir / "y_efficiency.npy", y_eff)
+    y_risk = df["efficiency_target"].apply(efficiency_to_risk_label).to_numpy()
+    np.save(data_dir / "y_classifier.npy", y_risk.astype(np.int64))
+    return X
+
+
+def _anomaly_references(
+    X: np.ndarray, data_dir: Path, folds: List[Tuple[int, int]]
+) -> None:
+    """Labels of the default anomaly model per fold, for `agreement`."""
+    for fold_id, (val_start, val_end) in enumerate(folds):
+        reference = AnomalyDetector()
+        reference.fit(pd.DataFrame(X[:val_start], columns=FEATURE_COLUMNS))
+        _, labels = reference.predict(X[val_start:val_end])
+        np.save(data_dir / f"anomaly_reference_{fold_id}.npy", labels)
+
+
+def tune_model(
+    model_name: str,
+    data_dir: Path,
+    folds: List[Tuple[int, int]],
+    pool: Optional[ProcessPoolExecutor],
+    n_trials: int = 16,
+    keep_fraction: float = 0.5,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Run the successive-halving search for one model; one entry per trial.
+
+    The baseline (trial 0) is never pruned, so it is always in the report.
+    """
+    trials = [
+        {"trial": i, "model": model_name, "params": params, "scores": []}
+        for i, params in enumerate(sample_trials(model_name, n_trials, seed))
+    ]
+    higher = HIGHER_IS_BETTER[model_name]
+    alive = list(trials)
+    for fold_id, fold in enumerate(folds):
+        last = fold_id == len(folds) - 1
+        jobs = [
+            (
+                model_name,
+                trial["params"],
+                str(data_dir),
+                fold,
+                fold_id,
+                (
+                    str(_trial_model_path(data_dir, model_name, trial["trial"]))
+                    if last
+                    else None
+                ),
+            )
+            for trial in alive
+        ]
+        if pool is not None:
+            results = list(pool.map(_run_trial, *zip(*jobs)))
+        else:
+            results = [_run_trial(*job) for job in jobs]
+        for trial, result in zip(alive, results):
+            if "error" in result:
+                trial["error"] = result["error"]
+                trial["pruned_after_fold"] = fold_id
+                continue
+            trial["scores"].append(result["score"])
+            trial["rounds"] = result["rounds"]
+            trial["fit_seconds"] = trial.get("fit_seconds", 0.0) + result["seconds"]
+        alive = [trial for trial in alive if "error" not in trial]
+        if last or not alive:
+            break
+
+        def running(trial: Dict[str, Any]) -> float:
+            mean = float(np.mean(trial["scores"]))
+            return -mean if higher else mean
+
+        ranked = sorted(alive, key=running)
+        keep = ranked[: max(1, math.ceil(keep_fraction * len(ranked)))]
+        if trials[0] in alive and trials[0] not in keep:
+            keep.append(trials[0])
+        for trial in alive:
+            if trial not in keep:
+                trial["pruned_after_fold"] = fold_id
+        alive = keep
+        logger.info(
+            "%s: fold %d done, %d of %d trials continue",
+            model_name,
+            fold_id,
+            len(alive),
+            len(trials),
+        )
+
+    for trial in trials:
+        trial["cv_score"] = float(np.mean(trial["scores"])) if trial["scores"] else None
+        trial["completed"] = len(trial["scores"]) == len(folds)
+    return trials
+
+
+def _pick(trials: List[Dict[str, Any]], higher: bool, tolerance: float) -> Dict:
+    """Fastest completed trial (compiled single-row latency) scoring within
+    `tolerance` (relative) of the best."""
+    done = [trial for trial in trials if trial["completed"]]
+    best = max(done, key=lambda t: t["cv_score"] if higher else -t["cv_score"])
+    bound = abs(best["cv_score"]) * tolerance
+    good = [
+        trial
+        for trial in done
+        if (
+            trial["cv_score"] >= best["cv_score"] - bound
+            if higher
+            else trial["cv_score"] <= best["cv_score"] + bound
+        )
+    ]
+    return min(good, key=lambda t: t["latency"]["compiled_single_us"])
+
+
+def _chosen_params(model_name: str, trial: Dict[str, Any]) -> Dict[str, Any]:
+    params = dict(trial["params"])
+    if model_name != "anomaly" and trial["params"]:
+        params["n_estimators"] = trial["rounds"]
+    return params
+
+
+def _print_report(model_name: str, trials: List[Dict[str, Any]], chosen: int) -> None:
+    metric = METRIC_NAMES[model_name]
+    print(f"\n{model_name} ({metric}, {len(trials)} trials)")
+    print(
+        f"{'trial':>5} {metric:>9} {'trees':>5} {'single us':>10} "
+        f"{'batch us/row':>12} {'compiled single':>15} {'compiled batch':>14}  params"
+    )
+    higher = HIGHER_IS_BETTER[model_name]
+    done = sorted(
+        (trial for trial in trials if trial["completed"]),
+        key=lambda t: -t["cv_score"] if higher else t["cv_score"],
+    )
+    for trial in done:
+        lat = trial["latency"]
+        trees = trial["rounds"] or trial["params"].get("n_estimators", "")
+        marker = "*" if trial["trial"] == chosen else " "
+        print(
+            f"{trial['trial']:>4}{marker} {trial['cv_score']:9.5f} {trees!s:>5} "
+            f"{lat['joblib_single_us']:10.1f} {lat['joblib_batch_us_per_row']:12.2f} "
+            f"{lat['compiled_single_us']:15.1f} "
+            f"{lat['compiled_batch_us_per_row']:14.2f}  "
+            f"{trial['params'] or 'defaults'}"
+        )
+    pruned = [trial for trial in trials if not trial["completed"]]
+    if pruned:
+        print(f"      {len(pruned)} trials pruned early")
+
+
+def main() -> None:
+    from .train import build_dataset
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--generation-csv", type=Path, required=True)
+    parser.add_argument("--weather-csv", type=Path, required=True)
+    parser.add_argument("--chunksize", type=int)
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--models", nargs="+", choices=MODEL_NAMES, default=MODEL_NAMES)
+    parser.add_argument("--trials", type=int, default=16, help="Trials per model.")
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument(
+        "--keep-fraction",
+        type=float,
+        default=0.5,
+        help="Share of trials that continue after each fold.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Parallel trials (one core each).",
+    )
+    parser.add_argument("--max-rows", type=int, help="Tune on the latest rows only.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.02,
+        help="Pick the fastest trial within this relative distance of the best.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", type=Path, default=Path("tune_report.json"))
+    parser.add_argument("--best-params", type=Path, default=Path("best_params.json"))
+    args = parser.parse_args()
+    configure_logging()
+
+    df = build_dataset(
+        args.generation_csv,
+        args.weather_csv,
+        args.chunksize,
+        cache_dir=None if args.no_cache else args.cache_dir,
+    )
+    if args.max_rows and len(df) > args.max_rows:
+        df = df.sort_values("DATE_TIME", kind="stable").iloc[-args.max_rows :]
+
+    shm = Path("/dev/shm")
+    report: Dict[str, Any] = {"folds": args.folds, "rows": len(df), "models": {}}
+    best_params: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory(
+        prefix="solara-tune-", dir=shm if shm.is_dir() else None
+    ) as tmp:
+        data_dir = Path(tmp)
+        (data_dir / "models").mkdir()
+        X = _prepare_data(df, data_dir)
+        del df
+        folds = time_folds(len(X), args.folds)
+        if "anomaly" in args.models:
+            _anomaly_references(X, data_dir, folds)
+        latency_rows = X[folds[-1][0] : folds[-1][0] + LATENCY_BATCH]
+
+        pool = None
+        if args.workers > 1:
+            pool = ProcessPoolExecutor(
+                max_workers=args.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=configure_logging,
+            )
+        try:
+            for offset, model_name in enumerate(args.models):
+                start = time.perf_counter()
+                trials = tune_model(
+                    model_name,
+                    data_dir,
+                    folds,
+                    pool,
+                    n_trials=args.trials,
+                    keep_fraction=args.keep_fraction,
+                    seed=args.seed + offset,
+                )
+                # Timed one at a time, after the search, so trials running
+                # in parallel do not skew each other's latency.
+                for trial in trials:
+                    if trial["completed"]:
+                        path = _trial_model_path(data_dir, model_name, trial["trial"])
+                        trial["latency"] = measure_latency(
+                            model_name, path, latency_rows
+                        )
+                chosen = _pick(trials, HIGHER_IS_BETTER[model_name], args.tolerance)
+                best_params[model_name] = _chosen_params(model_name, chosen)
+                report["models"][model_name] = {
+                    "metric": METRIC_NAMES[model_name],
+                    "seconds": time.perf_counter() - start,
+                    "chosen_trial": chosen["trial"],
+                    "trials": trials,
+                }
+                _print_report(model_name, trials, chosen["trial"])
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    args.report.write_text(json.dumps(report, indent=2, default=str))
+    args.best_params.write_text(json.dumps(best_params, indent=2))
+    print(f"\nReport: {args.report}\nBest parameters: {args.best_params}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,49 @@
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Any, Dict, Optional
 
 
 LOG_DIR = Path(__file__).resolve().parent.parent / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+# Whether `_listener` has been started and not stopped since.
+_listening = False
+
+
+class _InProcessQueueHandler(QueueHandler):
+    """Enqueues records untouched; the writer thread formats them.
+
+    The stock `prepare` formats every record in the calling thread so it
+    can be pickled; this queue never leaves the process. Log arguments are
+    rendered later, so don't mutate objects after logging them.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 
 def configure_logging() -> None:
     """Configure application-wide logging.
 
-    Uses a rotating file handler plus console output.
+    The root logger only enqueues records; a background listener thread
+    writes them to a rotating file plus console output, so logging never
+    blocks the caller on I/O. The level comes from `SOLARA_LOG_LEVEL`
+    (default INFO). Does nothing if the root logger already has handlers.
+
+    Importing `ml` modules does not configure logging; entry points (CLIs,
+    the API app and worker-process initializers) call this.
     """
+    global _queue_handler, _listener
+    root_logger = logging.getLogger()
+    if root_logger.handlers:
+        return
+
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
     log_file = LOG_DIR / "ml_pipeline.log"
 
     formatter = logging.Formatter(
@@ -26,15 +58,81 @@ def configure_logging() -> None:
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
 
-    root_logger = logging.getLogger()
-    if not root_logger.handlers:
-        root_logger.setLevel(logging.INFO)
-        root_logger.addHandler(file_handler)
-        root_logger.addHandler(console_handler)
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root_logger.setLevel(os.environ.get("SOLARA_LOG_LEVEL", "INFO").upper())
+    _queue_handler = _InProcessQueueHandler(records)
+    root_logger.addHandler(_queue_handler)
+    _start_listener(records, file_handler, console_handler)
+    # Writes out what is still queued when the interpreter exits.
+    atexit.register(shutdown_logging)
+    # Threads do not survive fork(), and one caught mid-write would leave
+    # the child's handler and stream locks held forever. So the listener is
+    # drained and stopped before forking and restarted on both sides.
+    os.register_at_fork(
+        before=shutdown_logging,
+        after_in_parent=lambda: _restart_listener(in_child=False),
+        after_in_child=lambda: _restart_listener(in_child=True),
+    )
+
+
+def _start_listener(
+    records: "queue.SimpleQueue[logging.LogRecord]", *handlers: logging.Handler
+) -> None:
+    global _listener, _listening
+    _listener = QueueListener(records, *handlers)
+    _listener.start()
+    _listening = True
+
+
+def _restart_listener(in_child: bool) -> None:
+    if _queue_handler is None or _listener is None:
+        return
+    if in_child:
+        # Records other parent threads queued meanwhile are the parent's.
+        _queue_handler.queue = queue.SimpleQueue()
+    _start_listener(_queue_handler.queue, *_listener.handlers)
+
+
+def shutdown_logging() -> None:
+    """Write out queued records and stop the listener thread.
+
+    For processes that leave with `os._exit`, which skips `atexit`.
+    """
+    global _listening
+    if _listener is not None and _listening:
+        _listening = False
+        _listener.stop()
 
 
 def get_logger(name: str) -> logging.Logger:
-    """Get a configured logger."""
-    configure_logging()
+    """Get a logger; see `configure_logging` for where its records go."""
     return logging.getLogger(name)
 
+
+class _Fields:
+    """`key=value` rendering of event fields, done only when formatted."""
+
+    __slots__ = ("fields",)
+
+    def __init__(self, fields: Dict[str, Any]) -> None:
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return " ".join(f"{key}={value}" for key, value in self.fields.items())
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields: Any) -> None:
+    """Log `event` with `key=value` fields, e.g. ``prediction_served ms=1.2``.
+
+    For hot paths: the level is checked first, so a disabled event costs
+    one lookup, and fields are rendered on the writer thread. Formatters
+    can also read them from the record's `event` and `fields` attributes.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(
+            level,
+            "%s %s",
+            event,
+            _Fields(fields),
+            extra={"event": event, "fields": fields},
+        )
@@ -20,8 +20,10 @@ export type Database = {
           id: string
           message: string
           resolved: boolean
+          resolved_at: string | null
           sensor_type: string | null
           severity: string
+          source_key: string | null
           threshold: number | null
           user_id: string
           value: number | null
@@ -31,8 +33,10 @@ export type Database = {
           id?: string
           message: string
           resolved?: boolean
+          resolved_at?: string | null
           sensor_type?: string | null
           severity?: string
+          source_key?: string | null
           threshold?: number | null
           user_id: string
           value?: number | null
@@ -42,8 +46,10 @@ export type Database = {
           id?: string
           message?: string
           resolved?: boolean
+          resolved_at?: string | null
           sensor_type?: string | null
           severity?: string
+          source_key?: string | null
           threshold?: number | null
           user_id?: string
           value?: number | null
@@ -91,33 +97,51 @@ export type Database = {
       }
       predictions: {
         Row: {
+          anomaly_label: number | null
+          anomaly_score: number | null
           confidence: number | null
           created_at: string
+          efficiency_prediction: number | null
           failure_probability: number | null
           feature_importance: Json | null
           id: string
+          model_version: string | null
           prediction_type: string | null
           remaining_useful_life: number | null
+          risk_level: string | null
+          source_key: string | null
           user_id: string
         }
         Insert: {
+          anomaly_label?: number | null
+          anomaly_score?: number | null
           confidence?: number | null
           created_at?: string
+          efficiency_prediction?: number | null
           failure_probability?: number | null
           feature_importance?: Json | null
           id?: string
+          model_version?: string | null
           prediction_type?: string | null
           remaining_useful_life?: number | null
+          risk_level?: string | null
+          source_key?: string | null
           user_id: string
         }
         Update: {
+          anomaly_label?: number | null
+          anomaly_score?: number | null
           confidence?: number | null
           created_at?: string
+          efficiency_prediction?: number | null
           failure_probability?: number | null
           feature_importance?: Json | null
           id?: string
+          model_version?: string | null
           prediction_type?: string | null
           remaining_useful_life?: number | null
+          risk_level?: string | null
+          source_key?: string | null
           user_id?: string
         }
         Relationships: []
@@ -0,0 +1,20 @@
+-- Columns written by the backend alert pipeline (backend/alerts.py), which
+-- connects as a service role and inserts alerts and predictions in bulk.
+
+-- Alerts: the inverter they concern and when the backend resolved them
+ALTER TABLE public.alerts
+  ADD COLUMN IF NOT EXISTS source_key TEXT,
+  ADD COLUMN IF NOT EXISTS resolved_at TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS alerts_source_key_created_at_idx
+  ON public.alerts (source_key, created_at DESC);
+
+-- Predictions: the model outputs served per reading
+ALTER TABLE public.predictions
+  ADD COLUMN IF NOT EXISTS source_key TEXT,
+  ADD COLUMN IF NOT EXISTS efficiency_prediction DOUBLE PRECISION,
+  ADD COLUMN IF NOT EXISTS anomaly_score DOUBLE PRECISION,
+  ADD COLUMN IF NOT EXISTS anomaly_label SMALLINT,
+  ADD COLUMN IF NOT EXISTS risk_level TEXT,
+  ADD COLUMN IF NOT EXISTS model_version TEXT;
+CREATE INDEX IF NOT EXISTS predictions_source_key_created_at_idx
+  ON public.predictions (source_key, created_at DESC);
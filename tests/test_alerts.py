@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from backend.alerts import DEFAULT_RULES, AlertEngine, AlertPipeline
+from backend.db import BatchWriter, Database
+from ml.predict import SolarInput
+
+EFFICIENCY = DEFAULT_RULES[0]  # breaches below 0.8, hysteresis 0.05
+AT = datetime(2026, 10, 17, tzinfo=timezone.utc)
+
+
+def _result(efficiency: float) -> Dict[str, Any]:
+    return {
+        "efficiency_prediction": efficiency,
+        "anomaly_score": 0.1,
+        "anomaly_label": 0,
+        "risk_level": "Low",
+        "risk_probabilities": {"Low": 0.9, "Medium": 0.05, "High": 0.05},
+        "model_version": "v1",
+    }
+
+
+def _feed(engine: AlertEngine, source_key: str, values: List[float]) -> List[str]:
+    return [
+        event.kind
+        for value in values
+        for event in engine.observe(source_key, _result(value), AT)
+    ]
+
+
+def test_raises_after_consecutive_breaches_only() -> None:
+    engine = AlertEngine(raise_after=3, clear_after=3)
+    # An outlier, then two breaches and a recovery: never three in a row.
+    assert _feed(engine, "INV", [0.5, 0.9, 0.5, 0.5, 0.9]) == []
+    assert _feed(engine, "INV", [0.5, 0.5, 0.5]) == ["raised"]
+    assert engine.active() == 1
+    # Breaching on does not raise it again.
+    assert _feed(engine, "INV", [0.5, 0.5, 0.5]) == []
+
+
+def test_clears_only_past_the_hysteresis_band() -> None:
+    engine = AlertEngine(raise_after=1, clear_after=2)
+    assert _feed(engine, "INV", [0.5]) == ["raised"]
+    # Back above the 0.8 threshold but inside the band (< 0.85): still active.
+    assert _feed(engine, "INV", [0.82, 0.84, 0.82, 0.84]) == []
+    # One reading past the band is not enough, and a dip resets the count.
+    assert _feed(engine, "INV", [0.9, 0.84, 0.9]) == []
+    assert _feed(engine, "INV", [0.9]) == ["resolved"]
+    assert engine.active() == 0
+
+
+def test_per_inverter_threshold_overrides() -> None:
+    engine = AlertEngine(overrides={"HOT": {"efficiency": 0.6}}, raise_after=1)
+    assert engine.threshold("HOT", EFFICIENCY) == 0.6
+    assert engine.threshold("OTHER", EFFICIENCY) == EFFICIENCY.threshold
+
+    assert _feed(engine, "HOT", [0.7]) == []
+    assert _feed(engine, "OTHER", [0.7]) == ["raised"]
+    assert _feed(engine, "HOT", [0.55]) == ["raised"]
+
+
+def test_inverters_are_debounced_independently() -> None:
+    engine = AlertEngine(raise_after=2)
+    assert _feed(engine, "A", [0.5]) == []
+    assert _feed(engine, "B", [0.5]) == []
+    assert _feed(engine, "A", [0.5]) == ["raised"]
+
+
+def test_state_is_bounded_per_inverter() -> None:
+    engine = AlertEngine(raise_after=1, max_inverters=2)
+    for source_key in ("A", "B", "C"):
+        _feed(engine, source_key, [0.5])
+    assert len(engine) == 2
+    assert engine.active() == 2
+
+
+def test_restored_alert_is_resolved_not_raised_again(tmp_path: Path) -> None:
+    database = Database(f"sqlite:///{tmp_path / 'alerts.db'}")
+    readings = [SolarInput(5000, 4800, 25, 40, 0.6, source_key="INV")] * 3
+
+    first = AlertPipeline(AlertEngine(raise_after=3), BatchWriter(database), "u1")
+    first.evaluate(readings, [_result(0.5)] * 3)
+    assert first.writer.flush()
+
+    second = AlertPipeline(AlertEngine(clear_after=3), BatchWriter(database), "u1")
+    assert second.restore() == 1
+    second.evaluate(readings, [_result(0.5)] * 3)
+    second.evaluate(readings, [_result(0.95)] * 3)
+    assert second.writer.flush()
+
+    with database.connection() as conn:
+        rows = conn.execute(
+            "SELECT sensor_type, resolved, model_version FROM alerts "
+            "JOIN predictions USING (source_key) GROUP BY alerts.id"
+        ).fetchall()
+    assert rows == [("efficiency", 1, "v1")]
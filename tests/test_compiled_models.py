@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from ml.compiled_models import (
+    MANIFEST_FILE,
+    CompiledScaler,
+    compile_isolation_forest,
+    compile_xgboost_regressor,
+    load_compiled,
+    read_compiled_manifest,
+    save_compiled,
+    write_compiled_manifest,
+)
+
+FEATURES = ["a", "b", "c"]
+
+
+@pytest.fixture
+def compiled_dir(tmp_path: Path) -> Path:
+    scaler = CompiledScaler(np.array([1.0, 2.0, 3.0]), np.array([0.5, 1.0, 2.0]))
+    save_compiled(scaler, tmp_path / "scaler")
+    write_compiled_manifest(tmp_path, FEATURES)
+    return tmp_path
+
+
+def test_manifest_describes_the_arrays(compiled_dir: Path) -> None:
+    manifest = read_compiled_manifest(compiled_dir, FEATURES)
+    assert manifest["models"]["scaler"] == {
+        "kind": "scaler",
+        "arrays": {
+            "mean": {"dtype": "float64", "shape": [3]},
+            "scale": {"dtype": "float64", "shape": [3]},
+        },
+    }
+    model = load_compiled(
+        compiled_dir / "scaler", mmap_mode="r", expected=manifest["models"]["scaler"]
+    )
+    np.testing.assert_array_equal(model.mean_, [1.0, 2.0, 3.0])
+
+
+def test_array_that_does_not_match_the_manifest_is_rejected(
+    compiled_dir: Path,
+) -> None:
+    manifest = read_compiled_manifest(compiled_dir, FEATURES)
+    np.save(compiled_dir / "scaler" / "mean.npy", np.zeros(4, dtype=np.float32))
+    with pytest.raises(ValueError, match="does not match its manifest"):
+        load_compiled(compiled_dir / "scaler", expected=manifest["models"]["scaler"])
+
+
+def test_manifest_for_other_features_is_rejected(compiled_dir: Path) -> None:
+    with pytest.raises(ValueError, match="expect features"):
+        read_compiled_manifest(compiled_dir, ["a", "c", "b"])
+
+
+def test_manifest_from_a_newer_format_is_rejected(compiled_dir: Path) -> None:
+    path = compiled_dir / MANIFEST_FILE
+    manifest = json.loads(path.read_text())
+    manifest["format_version"] += 1
+    path.write_text(json.dumps(manifest))
+    with pytest.raises(ValueError, match="format"):
+        read_compiled_manifest(compiled_dir, FEATURES)
+
+
+def test_export_without_a_manifest_is_rejected(compiled_dir: Path) -> None:
+    (compiled_dir / MANIFEST_FILE).unlink()
+    with pytest.raises(ValueError, match="compile-only"):
+        read_compiled_manifest(compiled_dir, FEATURES)
+
+
+def test_mapped_ensembles_are_traversed_in_place(tmp_path: Path) -> None:
+    from sklearn.ensemble import IsolationForest
+    from xgboost import XGBRegressor
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 3)).astype(np.float32)
+    y = X[:, 0] - 2.0 * X[:, 1]
+    X_test = rng.normal(size=(50, 3)).astype(np.float32)
+    X_test[::7, 1] = np.nan
+    regressor = XGBRegressor(n_estimators=10, max_depth=3).fit(X, y)
+    iforest = IsolationForest(n_estimators=10, random_state=0).fit(X)
+    save_compiled(compile_xgboost_regressor(regressor), tmp_path / "efficiency")
+    save_compiled(compile_isolation_forest(iforest), tmp_path / "anomaly")
+    write_compiled_manifest(tmp_path, FEATURES)
+    manifest = read_compiled_manifest(tmp_path, FEATURES)
+
+    efficiency, anomaly = (
+        load_compiled(tmp_path / name, mmap_mode="r", expected=manifest["models"][name])
+        for name in ("efficiency", "anomaly")
+    )
+    for model in (efficiency, anomaly):
+        ensemble = model.ensemble
+        # Leaves point to themselves and send every sample left.
+        leaf = ensemble.first_child == np.arange(len(ensemble.first_child))
+        assert leaf.any()
+        assert np.isposinf(ensemble.threshold[leaf]).all()
+        assert ensemble.default_left[leaf].all()
+        # Nothing is copied per process: every table is the mapped file.
+        assert all(
+            isinstance(table, np.memmap)
+            for table in vars(ensemble).values()
+            if isinstance(table, np.ndarray)
+        )
+    np.testing.assert_allclose(
+        efficiency.predict(X_test), regressor.predict(X_test), atol=1e-5
+    )
+    complete = X_test[~np.isnan(X_test).any(axis=1)]
+    np.testing.assert_allclose(
+        anomaly.score_samples(complete), iforest.score_samples(complete), atol=1e-12
+    )
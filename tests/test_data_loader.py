@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml.data_loader import (
+    _GroupFillState,
+    iter_generation_and_weather,
+    load_generation_and_weather,
+)
+
+
+def _window(start: int, module: list) -> pd.DataFrame:
+    times = pd.date_range("2020-05-15", periods=12, freq="15min")[
+        start : start + len(module)
+    ]
+    return pd.DataFrame(
+        {
+            "DATE_TIME": times,
+            "SOURCE_KEY": "INV",
+            "AC_POWER": np.arange(len(module), dtype=float),
+            "MODULE_TEMPERATURE": module,
+        }
+    )
+
+
+def test_rows_waiting_for_a_first_value_are_back_filled() -> None:
+    state = _GroupFillState()
+    assert state.fill(_window(0, [np.nan, np.nan]), final=False).empty
+    filled = state.fill(_window(2, [np.nan, 30.0]), final=False)
+    assert filled["MODULE_TEMPERATURE"].tolist() == [30.0] * 4
+    assert state.pending is None
+
+
+def test_pending_rows_are_bounded() -> None:
+    state = _GroupFillState(max_pending=3)
+    for start in (0, 2, 4):
+        assert state.fill(_window(start, [np.nan, np.nan]), final=False).empty
+        assert len(state.pending) <= 3
+    assert state.dropped == 3
+
+    # The newest held rows are kept and still back-filled.
+    filled = state.fill(_window(6, [31.0]), final=True)
+    assert filled["DATE_TIME"].tolist() == list(
+        pd.date_range("2020-05-15 00:45", periods=4, freq="15min")
+    )
+    assert filled["MODULE_TEMPERATURE"].tolist() == [31.0] * 4
+
+
+def test_never_valid_inverter_is_dropped_when_streaming(tmp_path: Path) -> None:
+    times = pd.date_range("2020-05-15", periods=20, freq="15min").repeat(2)
+    keys = ["GOOD", "BAD"] * 20
+    gen = pd.DataFrame(
+        {"DATE_TIME": times, "SOURCE_KEY": keys, "DC_POWER": 10.0, "AC_POWER": 9.0}
+    )
+    weather = pd.DataFrame(
+        {
+            "DATE_TIME": times,
+            "SOURCE_KEY": keys,
+            "AMBIENT_TEMPERATURE": 20.0,
+            "MODULE_TEMPERATURE": 30.0,
+            "IRRADIATION": [0.5, np.nan] * 20,
+        }
+    )
+    gen.to_csv(tmp_path / "gen.csv", index=False)
+    weather.to_csv(tmp_path / "weather.csv", index=False)
+
+    in_memory = load_generation_and_weather(
+        tmp_path / "gen.csv", tmp_path / "weather.csv"
+    )
+    streamed = pd.concat(
+        iter_generation_and_weather(
+            tmp_path / "gen.csv", tmp_path / "weather.csv", 4, max_pending_rows=5
+        ),
+        ignore_index=True,
+    )
+    assert in_memory["SOURCE_KEY"].unique().tolist() == ["GOOD"]
+    assert streamed["SOURCE_KEY"].astype(str).tolist() == ["GOOD"] * 20
+    assert streamed["DATE_TIME"].tolist() == in_memory["DATE_TIME"].tolist()
+
+
+def test_negative_pending_limit_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        _GroupFillState(max_pending=-1)
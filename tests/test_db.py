@@ -0,0 +1,121 @@
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Tuple
+
+import pytest
+
+from backend.db import ALERT_COLUMNS, PREDICTION_COLUMNS, BatchWriter, Database
+
+AT = datetime(2026, 10, 17, tzinfo=timezone.utc)
+
+
+def _prediction() -> Tuple[Any, ...]:
+    return (
+        str(uuid.uuid4()),
+        "u1",
+        0.1,
+        0.9,
+        "solar",
+        "INV",
+        0.9,
+        0.1,
+        0,
+        "Low",
+        "v1",
+        AT,
+    )
+
+
+def _alert() -> Tuple[Any, ...]:
+    return (
+        str(uuid.uuid4()),
+        "u1",
+        "warning",
+        "low",
+        "efficiency",
+        0.5,
+        0.8,
+        False,
+        "INV",
+        AT,
+    )
+
+
+def _count(database: Database, table: str) -> int:
+    with database.connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+@pytest.fixture
+def database(tmp_path: Path) -> Database:
+    return Database(f"sqlite:///{tmp_path / 'solara.db'}")
+
+
+def test_rows_match_the_columns() -> None:
+    assert len(_prediction()) == len(PREDICTION_COLUMNS)
+    assert len(_alert()) == len(ALERT_COLUMNS)
+
+
+def test_flush_writes_alerts_resolutions_and_predictions(database: Database) -> None:
+    writer = BatchWriter(database, max_batch=10_000)
+    alert = _alert()
+    # More rows than fit in one statement (999 parameters / 12 columns).
+    writer.add(alerts=[alert], predictions=[_prediction() for _ in range(250)])
+    assert writer.flush()
+    writer.add(resolutions=[(alert[0], AT)])
+    assert writer.flush()
+
+    assert _count(database, "predictions") == 250
+    with database.connection() as conn:
+        assert conn.execute("SELECT resolved, resolved_at FROM alerts").fetchall() == [
+            (1, AT.isoformat())
+        ]
+        assert database.unresolved_alerts(conn, "u1") == []
+    assert writer.stats()["written"] == {"alerts": 1, "predictions": 250}
+
+
+def test_failed_flush_keeps_rows_for_the_next(
+    database: Database, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    writer = BatchWriter(database)
+    writer.add(alerts=[_alert()], predictions=[_prediction(), _prediction()])
+
+    def broken(*args: Any) -> None:
+        raise RuntimeError("database unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(database, "insert_many", broken)
+        assert not writer.flush()
+    assert writer.stats()["pending"] == 3
+    assert writer.stats()["failed_flushes"] == 1
+    assert _count(database, "alerts") == 0  # rolled back
+
+    writer.add(predictions=[_prediction()])
+    assert writer.flush()
+    assert _count(database, "alerts") == 1
+    assert _count(database, "predictions") == 3
+    assert writer.stats()["pending"] == 0
+
+
+def test_oldest_predictions_are_dropped_past_max_pending(
+    database: Database,
+) -> None:
+    writer = BatchWriter(database, max_pending=3)
+    predictions = [_prediction() for _ in range(5)]
+    writer.add(alerts=[_alert()], predictions=predictions)
+
+    assert writer.stats()["dropped_predictions"] == 2
+    assert writer.flush()
+    with database.connection() as conn:
+        kept = {row[0] for row in conn.execute("SELECT id FROM predictions")}
+    assert kept == {row[0] for row in predictions[2:]}
+    assert _count(database, "alerts") == 1  # alerts are never dropped
+
+
+def test_stop_writes_what_is_buffered(database: Database) -> None:
+    writer = BatchWriter(database, flush_interval=60.0)
+    writer.start()
+    writer.add(predictions=[_prediction()])
+    writer.stop()
+    assert _count(database, "predictions") == 1
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml.feature_engineering import EPS, add_engineered_features
+
+# The vectorized rolling sums differ from pandas' per-group rolling only in
+# floating-point summation order.
+RTOL = 1e-12
+
+
+def _groupby_features(df: pd.DataFrame, window: int) -> pd.DataFrame:
+    """The previous per-inverter groupby/rolling implementation."""
+    df = df.copy()
+    df = df.sort_values(["SOURCE_KEY", "DATE_TIME"]).reset_index(drop=True)
+    df["efficiency"] = df["AC_POWER"] / np.clip(df["IRRADIATION"], EPS, None)
+    df["thermal_stress"] = df["MODULE_TEMPERATURE"] - df["AMBIENT_TEMPERATURE"]
+    df["dc_ac_ratio"] = df["DC_POWER"] / np.clip(df["AC_POWER"], EPS, None)
+    group = df.groupby("SOURCE_KEY", group_keys=False)
+    df["rolling_mean_power"] = group["AC_POWER"].apply(
+        lambda s: s.rolling(window=window, min_periods=1).mean()
+    )
+    df["rolling_std_power"] = group["AC_POWER"].apply(
+        lambda s: s.rolling(window=window, min_periods=1).std().fillna(0.0)
+    )
+    df["rolling_temp_mean"] = group["MODULE_TEMPERATURE"].apply(
+        lambda s: s.rolling(window=window, min_periods=1).mean()
+    )
+    df = df.ffill().bfill()
+    return df.dropna().reset_index(drop=True)
+
+
+def _frame(seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # Inverters of different lengths, including one with a single reading.
+    lengths = {"INV_A": 9, "INV_B": 6, "INV_C": 1, "INV_D": 4}
+    keys = np.repeat(list(lengths), list(lengths.values()))
+    times = np.concatenate(
+        [
+            pd.date_range("2020-05-15", periods=n, freq="15min").to_numpy()
+            for n in lengths.values()
+        ]
+    )
+    rows = len(keys)
+    irradiation = rng.uniform(0.0, 1.0, rows)
+    ac_power = irradiation * rng.uniform(500.0, 1500.0, rows)
+    ambient = rng.uniform(15.0, 35.0, rows)
+    module = ambient + 20.0 * irradiation
+    module[[0, 2, 10]] = np.nan
+    ac_power[[3, 11]] = np.nan
+    frame = pd.DataFrame(
+        {
+            "SOURCE_KEY": keys,
+            "DATE_TIME": times,
+            "DC_POWER": ac_power * 1.05,
+            "AC_POWER": ac_power,
+            "AMBIENT_TEMPERATURE": ambient,
+            "MODULE_TEMPERATURE": module,
+            "IRRADIATION": irradiation,
+        }
+    )
+    return frame.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("window", [1, 3, 4])
+def test_matches_groupby_rolling(window: int) -> None:
+    frame = _frame()
+    expected = _groupby_features(frame, window)
+    actual = add_engineered_features(frame, window=window)
+
+    assert list(actual.columns) == list(expected.columns)
+    assert len(actual) == len(expected)
+    pd.testing.assert_series_equal(actual["SOURCE_KEY"], expected["SOURCE_KEY"])
+    pd.testing.assert_series_equal(actual["DATE_TIME"], expected["DATE_TIME"])
+    numeric = expected.columns.drop(["SOURCE_KEY", "DATE_TIME"])
+    pd.testing.assert_frame_equal(
+        actual[numeric], expected[numeric], check_exact=False, rtol=RTOL, atol=0.0
+    )
+
+
+def test_input_frame_is_not_modified() -> None:
+    frame = _frame()
+    before = frame.copy()
+    add_engineered_features(frame)
+    pd.testing.assert_frame_equal(frame, before)
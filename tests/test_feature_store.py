@@ -0,0 +1,150 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import backend.main
+from ml.feature_engineering import (
+    FEATURE_COLUMNS,
+    ROLLING_WINDOW,
+    add_engineered_features,
+)
+from ml.feature_store import RollingFeatureStore
+from ml.predict import prediction_service
+
+ROLLING = ["rolling_mean_power", "rolling_std_power", "rolling_temp_mean"]
+START = pd.Timestamp("2020-05-15 06:00")
+
+
+def _expected(history: List[Tuple[float, float]]) -> Tuple[float, float, float]:
+    """Rolling features of the last reading of one inverter's `history`,
+    as training computes them."""
+    ac_power, module = np.array(history, dtype=np.float64).T
+    frame = pd.DataFrame(
+        {
+            "DATE_TIME": pd.date_range(START, periods=len(history), freq="15min"),
+            "SOURCE_KEY": "INV",
+            "DC_POWER": 1.0,
+            "AC_POWER": ac_power,
+            "AMBIENT_TEMPERATURE": 20.0,
+            "MODULE_TEMPERATURE": module,
+            "IRRADIATION": 0.5,
+        }
+    )
+    last = add_engineered_features(frame)[ROLLING].iloc[-1]
+    return tuple(last.tolist())
+
+
+def test_interleaved_inverters_match_training_through_eviction() -> None:
+    rng = np.random.default_rng(3)
+    store = RollingFeatureStore(max_inverters=3)
+    keys = ["A", "B", "C", "D", "E"]
+    histories: Dict[str, List[Tuple[float, float]]] = {}
+    evictions = 0
+    for step in range(200):
+        key = keys[int(rng.integers(len(keys)))]
+        ac_power = float(rng.uniform(0.0, 1500.0))
+        module = float(rng.uniform(15.0, 60.0))
+        if key not in store:
+            # New or evicted: the store starts this inverter afresh.
+            evictions += key in histories
+            histories[key] = []
+        history = histories[key]
+        # Missing readings, always after a valid one so that no window of a
+        # column is all NaN (training fills those from the previous row).
+        if step % 7 == 3 and history and not np.isnan(history[-1][0]):
+            ac_power = np.nan
+        elif step % 5 == 1 and history and not np.isnan(history[-1][1]):
+            module = np.nan
+        history.append((ac_power, module))
+
+        actual = store.update(key, ac_power, module)
+        np.testing.assert_allclose(
+            actual, _expected(histories[key]), rtol=1e-12, atol=0.0
+        )
+    assert len(store) == 3
+    assert evictions > 0
+
+
+def test_std_keeps_its_precision_for_large_values() -> None:
+    store = RollingFeatureStore()
+    values = 1e6 + np.array([0.1, 0.3, 0.05, 0.25, 0.2, 0.15])
+    for value in values:
+        actual = store.update("INV", float(value), 30.0)
+    # pandas' rolling std uses running sums and is off by ~3e-10 here.
+    expected = np.std(values[-ROLLING_WINDOW:], ddof=1)
+    assert actual[1] == pytest.approx(expected, rel=1e-12)
+    assert actual[1] == pytest.approx(_expected(list(zip(values, values)))[1])
+
+
+class _EchoBundle:
+    """Stands in for a `ModelBundle`, recording the features it scores."""
+
+    version = "test"
+
+    def __init__(self) -> None:
+        self.scored: List[np.ndarray] = []
+
+    def shard_for(self, source_key: Any) -> None:
+        return None
+
+    def shard_bundle(self, shard: Any) -> "_EchoBundle":
+        return self
+
+    def scale(self, X: np.ndarray) -> np.ndarray:
+        return X
+
+    def score(self, X: np.ndarray) -> List[Dict[str, Any]]:
+        self.scored.extend(np.array(row) for row in X)
+        return [
+            {
+                "efficiency_prediction": 0.9,
+                "anomaly_score": 0.1,
+                "anomaly_label": 0,
+                "risk_level": "Low",
+                "risk_probabilities": {"Low": 1.0},
+            }
+            for _ in X
+        ]
+
+
+def test_predict_endpoint_uses_rolling_features_across_calls(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    bundle = _EchoBundle()
+    monkeypatch.setattr(prediction_service, "_bundle", bundle)
+    monkeypatch.setattr(prediction_service, "result_cache", None)
+    monkeypatch.setattr(prediction_service, "feature_store", RollingFeatureStore())
+    monkeypatch.setattr(backend.main, "micro_batcher", None)
+    monkeypatch.setattr(backend.main, "alert_pipeline", None)
+    client = TestClient(backend.main.app)
+
+    readings = [(900.0, 41.0), (950.0, 43.5), (400.0, 39.0), (1000.0, 45.0)]
+    other = (700.0, 35.0)
+    history: List[Tuple[float, float]] = []
+    for ac_power, module in readings:
+        for source_key, (ac, temp) in (("INV", (ac_power, module)), ("OTHER", other)):
+            response = client.post(
+                "/predict/solar",
+                json={
+                    "dc_power": 1.0,
+                    "ac_power": ac,
+                    "ambient_temperature": 20.0,
+                    "module_temperature": temp,
+                    "irradiation": 0.5,
+                    "source_key": source_key,
+                },
+            )
+            assert response.status_code == 200
+            assert response.json()["model_version"] == "test"
+        history.append((ac_power, module))
+        # Rows alternate INV, OTHER; check the INV one just scored.
+        features = bundle.scored[-2]
+        rolling = features[[FEATURE_COLUMNS.index(name) for name in ROLLING]]
+        np.testing.assert_allclose(
+            rolling, np.float32(_expected(history)), rtol=1e-6, atol=0.0
+        )
+    # One scored row per request.
+    assert len(bundle.scored) == 2 * len(readings)
@@ -0,0 +1,103 @@
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml import data_loader
+from ml.data_loader import load_generation_and_weather
+from ml.incremental import (
+    after_watermarks,
+    csv_sizes,
+    csv_sources,
+    inverter_watermarks,
+    resume_offsets,
+)
+
+TIMES = pd.date_range("2020-05-15 06:00", periods=12, freq="15min")
+GEN = ["DC_POWER", "AC_POWER"]
+WEATHER = ["AMBIENT_TEMPERATURE", "MODULE_TEMPERATURE", "IRRADIATION"]
+
+
+def _rows(times: pd.DatetimeIndex, columns: List[str]) -> str:
+    lines = []
+    for time in times:
+        for key in ("A", "B"):
+            values = ",".join(f"{0.1 + 0.01 * i:.2f}" for i in range(len(columns)))
+            lines.append(f"{time},{key},{values}\n")
+    return "".join(lines)
+
+
+def _write(path: Path, times: pd.DatetimeIndex, columns: List[str]) -> None:
+    header = ",".join(["DATE_TIME", "SOURCE_KEY"] + columns) + "\n"
+    path.write_text(header + _rows(times, columns))
+
+
+def _append(path: Path, times: pd.DatetimeIndex, columns: List[str]) -> None:
+    with open(path, "a") as handle:
+        handle.write(_rows(times, columns))
+
+
+def test_late_inverter_keeps_readings_older_than_the_others() -> None:
+    tail = pd.DataFrame(
+        {
+            "SOURCE_KEY": ["A", "B"],
+            "DATE_TIME": [TIMES[8], TIMES[3]],
+        }
+    )
+    new = pd.DataFrame(
+        {
+            "SOURCE_KEY": ["A", "A", "B", "B", "C"],
+            "DATE_TIME": [TIMES[8], TIMES[9], TIMES[3], TIMES[4], TIMES[0]],
+        }
+    )
+    mask = after_watermarks(new, inverter_watermarks(tail))
+    np.testing.assert_array_equal(mask, [False, True, False, True, True])
+
+
+def test_resumed_load_reads_only_the_appended_rows(tmp_path: Path) -> None:
+    gen, weather = tmp_path / "gen.csv", tmp_path / "weather.csv"
+    # Weather is ahead of generation, as when one feed lags the other.
+    _write(gen, TIMES[:5], GEN)
+    _write(weather, TIMES[:7], WEATHER)
+    sources = csv_sources(gen, weather, csv_sizes(gen, weather))
+    _append(gen, TIMES[5:], GEN)
+    _append(weather, TIMES[7:], WEATHER)
+
+    offsets = resume_offsets({"sources": sources}, gen, weather)
+    assert offsets is not None
+    resumed = load_generation_and_weather(gen, weather, chunksize=4, offsets=offsets)
+    # From the last timestamp both files had reached, including the
+    # generation rows whose weather was read by the earlier run.
+    assert resumed["DATE_TIME"].min() == TIMES[4]
+    assert len(resumed) == 2 * len(TIMES[4:])
+
+
+def test_row_still_being_written_is_not_resumed_past(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Small scan blocks, so rows span block boundaries.
+    monkeypatch.setattr(data_loader, "_SCAN_BLOCK", 7)
+    gen, weather = tmp_path / "gen.csv", tmp_path / "weather.csv"
+    _write(gen, TIMES[:5], GEN)
+    _write(weather, TIMES[:5], WEATHER)
+    with open(gen, "a") as handle:
+        handle.write(f"{TIMES[5]},A,0.1")
+
+    offsets = data_loader.csv_resume_offsets(gen, weather, csv_sizes(gen, weather))
+    for path, offset in zip((gen, weather), offsets):
+        with open(path) as handle:
+            handle.seek(offset)
+            assert handle.readline().startswith(f"{TIMES[4]},A,")
+
+
+def test_rewritten_file_is_read_in_full(tmp_path: Path) -> None:
+    gen, weather = tmp_path / "gen.csv", tmp_path / "weather.csv"
+    _write(gen, TIMES[:5], GEN)
+    _write(weather, TIMES[:5], WEATHER)
+    sources = csv_sources(gen, weather, csv_sizes(gen, weather))
+    _write(gen, TIMES[1:], GEN)
+
+    assert resume_offsets({"sources": sources}, gen, weather) is None
+    assert resume_offsets({"sources": None}, gen, weather) is None
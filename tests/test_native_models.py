@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from ml.classifier_model import FailureRiskClassifier
+from ml.efficiency_model import EfficiencyRegressor
+from ml.incremental import continue_boosting
+
+
+def _data() -> tuple:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 3)).astype(np.float32)
+    return X, X[:, 0] - X[:, 1], (X[:, 0] > 0).astype(int) + (X[:, 2] > 1)
+
+
+def test_native_models_load_with_their_parameters(tmp_path: Path) -> None:
+    X, y_eff, y_risk = _data()
+    reg = EfficiencyRegressor(n_estimators=5, learning_rate=0.2, max_depth=3)
+    reg.model.fit(X, y_eff)
+    clf = FailureRiskClassifier(params={"n_estimators": 5, "max_depth": 2})
+    clf.model.fit(X, y_risk)
+    reg.save(tmp_path / "efficiency_model.ubj")
+    clf.save(tmp_path / "classifier_model.ubj")
+
+    loaded_reg = EfficiencyRegressor.load(tmp_path / "efficiency_model.ubj")
+    loaded_clf = FailureRiskClassifier.load(tmp_path / "classifier_model.ubj")
+    np.testing.assert_array_equal(loaded_reg.predict(X), reg.predict(X))
+    np.testing.assert_array_equal(loaded_clf.predict_proba(X), clf.predict_proba(X))
+    # Continuing to boost trains with the saved settings, not XGBoost's.
+    assert loaded_reg.model.get_xgb_params()["learning_rate"] == 0.2
+    assert loaded_clf.model.get_xgb_params()["max_depth"] == 2
+    continue_boosting(loaded_reg.model, X, y_eff, 2)
+    assert loaded_reg.model.get_booster().num_boosted_rounds() == 7
+
+
+def test_bundle_from_before_the_native_format_loads_its_pickle(
+    tmp_path: Path,
+) -> None:
+    X, y_eff, _ = _data()
+    reg = EfficiencyRegressor(n_estimators=5)
+    reg.model.fit(X, y_eff)
+    joblib.dump(reg.model, tmp_path / "efficiency_model.pkl")
+
+    loaded = EfficiencyRegressor.load(tmp_path / "efficiency_model.ubj")
+    np.testing.assert_array_equal(loaded.predict(X), reg.predict(X))
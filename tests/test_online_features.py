@@ -0,0 +1,109 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from ml.feature_engineering import (
+    FEATURE_COLUMNS,
+    add_engineered_features,
+    compute_online_features,
+    compute_online_features_batch,
+)
+from ml.predict import SolarInput
+from ml.preprocessing import (
+    apply_scaler,
+    basic_cleaning,
+    scale_features_inplace,
+    scaler_arrays,
+)
+
+
+def _random_inputs(n: int, seed: int = 0) -> List[SolarInput]:
+    rng = np.random.default_rng(seed)
+    ac = rng.uniform(0.0, 1500.0, n)
+    # Tiny values exercise the epsilon clipping of both ratios.
+    ac[::7] = 1e-8
+    irradiation = rng.uniform(1e-7, 1.2, n)
+    irradiation[::5] = 1e-7
+    ambient = rng.uniform(-10.0, 45.0, n)
+    return [
+        SolarInput(
+            dc_power=float(ac[i] * rng.uniform(1.0, 1.2)),
+            ac_power=float(ac[i]),
+            ambient_temperature=float(ambient[i]),
+            module_temperature=float(ambient[i] + rng.uniform(0.0, 35.0)),
+            irradiation=float(irradiation[i]),
+        )
+        for i in range(n)
+    ]
+
+
+def _pandas_features(solar_input: SolarInput) -> np.ndarray:
+    df = add_engineered_features(basic_cleaning(solar_input.to_dataframe()))
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)[0]
+
+
+def _bits(X: np.ndarray) -> np.ndarray:
+    return X.view(np.uint32)
+
+
+@pytest.fixture(scope="module")
+def inputs() -> List[SolarInput]:
+    return _random_inputs(200)
+
+
+@pytest.fixture(scope="module")
+def scaler() -> StandardScaler:
+    rng = np.random.default_rng(1)
+    frame = pd.DataFrame(
+        rng.normal(100.0, 50.0, (500, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS
+    )
+    return StandardScaler().fit(frame.astype("float32"))
+
+
+def test_single_reading_matches_pandas_bit_for_bit(
+    inputs: List[SolarInput],
+) -> None:
+    for solar_input in inputs:
+        online = compute_online_features(*solar_input.values())
+        np.testing.assert_array_equal(
+            _bits(online), _bits(_pandas_features(solar_input))
+        )
+
+
+def test_batch_matches_single_readings_bit_for_bit(
+    inputs: List[SolarInput],
+) -> None:
+    batch = compute_online_features_batch([i.values() for i in inputs])
+    single = np.vstack([compute_online_features(*i.values()) for i in inputs])
+    np.testing.assert_array_equal(_bits(batch), _bits(single))
+
+
+def test_batch_with_rolling_features_matches_single_readings(
+    inputs: List[SolarInput],
+) -> None:
+    rolling = np.random.default_rng(2).uniform(0.0, 1500.0, (len(inputs), 3))
+    batch = compute_online_features_batch([i.values() for i in inputs], rolling)
+    single = np.vstack(
+        [
+            compute_online_features(*i.values(), rolling=tuple(r))
+            for i, r in zip(inputs, rolling)
+        ]
+    )
+    np.testing.assert_array_equal(_bits(batch), _bits(single))
+
+
+def test_scaled_features_match_apply_scaler_bit_for_bit(
+    inputs: List[SolarInput], scaler: StandardScaler
+) -> None:
+    X = compute_online_features_batch([i.values() for i in inputs])
+    scale_features_inplace(X, *scaler_arrays(scaler))
+
+    frame = pd.concat(
+        [add_engineered_features(basic_cleaning(i.to_dataframe())) for i in inputs],
+        ignore_index=True,
+    )
+    expected = apply_scaler(frame, FEATURE_COLUMNS, scaler)[FEATURE_COLUMNS]
+    np.testing.assert_array_equal(_bits(X), _bits(expected.to_numpy(dtype=np.float32)))
@@ -0,0 +1,36 @@
+from ml.result_cache import ResultCache
+
+
+def test_results_are_keyed_by_the_scoring_bundle() -> None:
+    cache = ResultCache(max_entries=8, ttl_seconds=0)
+    cache.set_version("v1")
+    key = cache.make_key("v1", (1.0, 2.0))
+    cache.put(key, {"efficiency_prediction": 0.9})
+
+    assert cache.get(key) == {"efficiency_prediction": 0.9}
+    assert cache.get(cache.make_key("v2", (1.0, 2.0))) is None
+
+
+def test_result_scored_by_a_replaced_bundle_is_not_stored() -> None:
+    cache = ResultCache(max_entries=8, ttl_seconds=0)
+    cache.set_version("v1")
+    stale_key = cache.make_key("v1", (1.0, 2.0))
+
+    # A reload swaps in v2 while a request is still scoring with v1.
+    cache.set_version("v2")
+    cache.put(stale_key, {"efficiency_prediction": 0.1})
+
+    assert len(cache) == 0
+    assert cache.get(cache.make_key("v2", (1.0, 2.0))) is None
+
+
+def test_set_version_drops_entries_of_other_versions() -> None:
+    cache = ResultCache(max_entries=8, ttl_seconds=0)
+    cache.set_version("v1")
+    cache.put(cache.make_key("v1", (1.0,)), {"anomaly_score": 0.2})
+    cache.set_version("v1")
+    assert len(cache) == 1
+
+    cache.set_version("v2")
+    assert len(cache) == 0
+    assert cache.stats()["invalidations"] == 1
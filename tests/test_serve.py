@@ -0,0 +1,18 @@
+from backend.serve import _RestartPolicy
+
+
+def test_fast_failures_back_off_then_give_up() -> None:
+    policy = _RestartPolicy(
+        min_uptime=10.0, backoff=0.5, max_backoff=1.5, max_fast_failures=4
+    )
+    assert [policy.delay(0, 1.0) for _ in range(4)] == [0.5, 1.0, 1.5, None]
+
+
+def test_long_running_worker_resets_its_failures() -> None:
+    policy = _RestartPolicy(min_uptime=10.0, backoff=0.5, max_fast_failures=2)
+    assert policy.delay(0, 1.0) == 0.5
+    assert policy.delay(0, 60.0) == 0.0
+    assert policy.delay(0, 1.0) == 0.5
+    # Failures are counted per worker.
+    assert policy.delay(1, 1.0) == 0.5
+    assert policy.delay(0, 1.0) is None
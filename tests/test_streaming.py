@@ -0,0 +1,66 @@
+from typing import Any, Dict, List
+
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from backend.streaming import PredictionStream
+from ml.predict import SolarInput
+
+
+async def _run_batch(solar_inputs: List[SolarInput]) -> List[Dict[str, Any]]:
+    return [{"efficiency_prediction": 1.0} for _ in solar_inputs]
+
+
+def _parse(reading: Any) -> SolarInput:
+    if not isinstance(reading, dict):
+        raise ValueError("reading must be an object")
+    return SolarInput(**reading)
+
+
+def _client(stream: PredictionStream) -> TestClient:
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def ws(websocket: WebSocket) -> None:
+        await stream.serve(websocket)
+
+    return TestClient(app)
+
+
+def test_deeply_nested_json_gets_an_error_reply() -> None:
+    stream = PredictionStream(_run_batch, _parse)
+    with _client(stream).websocket_connect("/ws") as websocket:
+        websocket.send_text("[" * 100_000 + "]" * 100_000)
+        reply = websocket.receive_json()
+        assert reply["seq"] == 0
+        assert reply["error"].startswith("Invalid JSON")
+
+        websocket.send_text("{}")
+        assert websocket.receive_json()["seq"] == 1
+    assert stream.stats()["active"] == 0
+
+
+def test_unexpected_parse_error_is_answered() -> None:
+    def parse(reading: Any) -> SolarInput:
+        raise RuntimeError("boom")
+
+    stream = PredictionStream(_run_batch, parse)
+    with _client(stream).websocket_connect("/ws") as websocket:
+        websocket.send_text("{}")
+        assert websocket.receive_json() == {"seq": 0, "error": "Invalid reading"}
+
+
+def test_failed_receiver_closes_the_session() -> None:
+    stream = PredictionStream(_run_batch, _parse)
+
+    async def broken(*args: Any) -> None:
+        raise KeyError("receive")
+
+    stream._read = broken  # type: ignore[method-assign]
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with _client(stream).websocket_connect("/ws") as websocket:
+            websocket.receive_json()
+    assert exc_info.value.code == 1011
+    assert stream.stats()["active"] == 0
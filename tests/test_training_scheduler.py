@@ -0,0 +1,50 @@
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml import training_scheduler
+from ml.feature_engineering import FEATURE_COLUMNS
+
+
+def _engineered(inverters: List[str], periods: int) -> pd.DataFrame:
+    times = pd.date_range("2020-05-15", periods=periods, freq="15min")
+    frame = pd.DataFrame(
+        {
+            "SOURCE_KEY": np.repeat(inverters, periods),
+            "DATE_TIME": np.tile(times, len(inverters)),
+        }
+    )
+    for column in FEATURE_COLUMNS:
+        frame[column] = 1.0
+    # The target encodes the timestamp, so a shard's rows show their order.
+    frame["efficiency_target"] = frame["DATE_TIME"].dt.minute / 60.0 + (
+        frame["DATE_TIME"].dt.hour
+    )
+    return frame
+
+
+def test_cluster_shard_rows_are_in_time_order(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    seen: Dict[str, np.ndarray] = {}
+
+    def record(
+        shard: str, data_dir: str, start: int, stop: int, *args: Any
+    ) -> Dict[str, Any]:
+        seen[shard] = np.load(Path(data_dir) / "y_eff.npy")[start:stop]
+        return {"shard": shard, "rows": stop - start, "rmse": None, "seconds": 0.0}
+
+    monkeypatch.setattr(training_scheduler, "_fit_shard", record)
+    df = _engineered(["A", "B", "C"], periods=8)
+    routes = {"A": "cluster-0", "B": "cluster-1", "C": "cluster-0"}
+    training_scheduler.fit_shards(df, routes, tmp_path, "cluster", cores=1)
+
+    for shard, inverters in (("cluster-0", 2), ("cluster-1", 1)):
+        y = seen[shard]
+        assert len(y) == 8 * inverters
+        # Time order, so the 80/20 split holds out the latest readings of
+        # every inverter rather than all readings of the last ones.
+        assert (np.diff(y) >= 0).all()